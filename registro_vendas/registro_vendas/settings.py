@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -20,13 +22,22 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
+# Produção: DJANGO_PRODUCAO=1 desliga o DEBUG, lê a chave e os hosts do
+# ambiente e mantém as conexões com o banco abertas entre requisições
+PRODUCAO = os.environ.get('DJANGO_PRODUCAO') == '1'
+
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-zkhamy=@z8$%vs(86ac+o697es(e)n=eurs+ab&=fc1nn0=giu'
+SECRET_KEY = os.environ.get(
+    'DJANGO_SECRET_KEY', 'django-insecure-zkhamy=@z8$%vs(86ac+o697es(e)n=eurs+ab&=fc1nn0=giu'
+)
+if PRODUCAO and 'DJANGO_SECRET_KEY' not in os.environ:
+    raise ImproperlyConfigured('Defina DJANGO_SECRET_KEY para rodar com DJANGO_PRODUCAO=1')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = not PRODUCAO
 
-ALLOWED_HOSTS = []
+# Ex.: DJANGO_ALLOWED_HOSTS=vendas.exemplo.com.br,10.0.0.5
+ALLOWED_HOSTS = [host for host in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',') if host]
 
 
 # Application definition
@@ -43,6 +54,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Compacta respostas grandes (JSON dos relatórios, páginas) com gzip
+    'django.middleware.gzip.GZipMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -76,13 +89,85 @@ WSGI_APPLICATION = 'registro_vendas.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Segundos que uma conexão fica aberta entre requisições (0 abre e fecha uma
+# por requisição). Com CONN_HEALTH_CHECKS, uma conexão reaproveitada que caiu
+# é trocada antes do uso em vez de derrubar a requisição
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 600 if PRODUCAO else 0))
+
+if os.environ.get('POSTGRES_DB'):
+    # PostgreSQL (psycopg 3): POSTGRES_DB, POSTGRES_USER, POSTGRES_PASSWORD,
+    # POSTGRES_HOST e POSTGRES_PORT
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ['POSTGRES_DB'],
+            'USER': os.environ.get('POSTGRES_USER', ''),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+    }
+    if os.environ.get('POSTGRES_POOL_MAX'):
+        # Pool do psycopg (psycopg[pool]) compartilhado pelas threads do
+        # worker; substitui as conexões persistentes (o Django exige
+        # CONN_MAX_AGE=0 com pool) e só devolve conexões saudáveis
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('POSTGRES_POOL_MIN', 2)),
+            'max_size': int(os.environ['POSTGRES_POOL_MAX']),
+            'timeout': 10,
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+    if PRODUCAO:
+        # WAL: leituras não esperam as escritas; transações IMMEDIATE e
+        # timeout esperam a vez em vez de "database is locked" quando dois
+        # workers gravam juntos
+        DATABASES['default']['OPTIONS'] = {
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL',
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        }
+
+
+# Cache
+# Versões e resultados em cache (ranking, comparativos, painel ao vivo)
+# precisam ser os mesmos em todos os workers: uma devolução atendida por um
+# processo invalida o ranking dos outros e uma venda chega aos painéis
+# ligados em qualquer um. REDIS_URL (redis-py) serve para vários servidores;
+# sem ele, em produção, um diretório compartilhado pelos workers do host.
+# O LocMemCache é de cada processo e só serve ao runserver
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+elif PRODUCAO:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('DJANGO_CACHE_DIR', BASE_DIR / 'cache'),
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
     }
-}
-
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -121,6 +206,15 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
+# Tempo (em segundos) que rankings e comparativos de períodos encerrados
+# ficam no cache do servidor; devoluções e correções invalidam antes
+RELATORIOS_CACHE_PERIODO_FECHADO = 60 * 60 * 24 * 30
+
+# Itens de venda de meses anteriores a este horizonte (em meses) podem ser
+# movidos para o arquivo morto com `manage.py arquivar_itens`
+ARQUIVO_ITENS_MESES = 24
+ARQUIVO_ITENS_PATH = BASE_DIR / 'arquivo_itens.sqlite3'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
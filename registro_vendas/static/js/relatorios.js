@@ -12,18 +12,23 @@ document.addEventListener('DOMContentLoaded', function() {
     const fecharModalBtn = document.getElementById('fechar-modal');
     const cancelarModalBtn = document.getElementById('cancelar-modal');
     const downloadModalBtn = document.getElementById('download-modal');
+    const rankingCriterio = document.getElementById('ranking-criterio');
+    const mapaCalorPeriodo = document.getElementById('mapa-calor-periodo');
     
     // Dados para modal
     let modalData = null;
     
     // Carregar estatísticas rápidas
     carregarEstatisticasRapidas();
+    carregarAlertasEstoque();
     
     // Carregar relatórios do mês atual
     buscarRelatorios();
     
     // Event Listeners
     buscarBtn.addEventListener('click', buscarRelatorios);
+    rankingCriterio.addEventListener('change', carregarRanking);
+    mapaCalorPeriodo.addEventListener('change', carregarMapaCalor);
     
     // Buscar ao pressionar Enter
     anoSelect.addEventListener('keypress', function(e) {
@@ -58,31 +63,93 @@ document.addEventListener('DOMContentLoaded', function() {
                     console.error('Erro ao carregar estatísticas:', data.erro);
                     return;
                 }
+                mostrarEstatisticas(data);
+            })
+            .catch(error => {
+                console.error('Erro ao carregar estatísticas:', error);
+            });
+    }
+    
+    // Estatísticas ao vivo: o servidor envia os totais a cada venda. Sem
+    // suporte a EventSource, ou se o servidor recusar (204 fora do ASGI),
+    // volta a consultar a cada 5 minutos
+    let intervaloEstatisticas = null;
+    
+    function acompanharEstatisticas() {
+        if (!window.EventSource) {
+            intervaloEstatisticas = setInterval(carregarEstatisticasRapidas, 300000);
+            return;
+        }
+        
+        const eventos = new EventSource('/vendas/eventos-estatisticas/');
+        eventos.addEventListener('estatisticas', evento => {
+            if (intervaloEstatisticas) {
+                clearInterval(intervaloEstatisticas);
+                intervaloEstatisticas = null;
+            }
+            mostrarEstatisticas(JSON.parse(evento.data));
+        });
+        eventos.onerror = () => {
+            // O navegador reconecta sozinho; enquanto isso (ou se desistiu) consulta por tempo
+            if (!intervaloEstatisticas) {
+                intervaloEstatisticas = setInterval(carregarEstatisticasRapidas, 300000);
+            }
+            if (eventos.readyState === EventSource.CLOSED) {
+                carregarEstatisticasRapidas();
+            }
+        };
+    }
+    
+    function mostrarEstatisticas(data) {
+        document.getElementById('vendas-hoje').textContent = `R$ ${data.hoje.total.toFixed(2)}`;
+        document.getElementById('vendas-mes').textContent = `R$ ${data.mes_atual.total.toFixed(2)}`;
+        
+        // Comparativo (as cores trocam a cada atualização ao vivo)
+        const comparativo = data.comparativo.diferenca;
+        const comparativoEl = document.getElementById('comparativo');
+        const cartao = comparativoEl.closest('.rounded-lg');
+        const cor = comparativo > 0 ? 'green' : comparativo < 0 ? 'red' : 'purple';
+        
+        if (comparativo > 0) {
+            comparativoEl.textContent = `+R$ ${comparativo.toFixed(2)}`;
+        } else if (comparativo < 0) {
+            comparativoEl.textContent = `R$ ${comparativo.toFixed(2)}`;
+        } else {
+            comparativoEl.textContent = 'R$ 0,00';
+        }
+        comparativoEl.className = comparativoEl.className.replace(/text-(purple|green|red)-900/, `text-${cor}-900`);
+        cartao.className = cartao.className
+            .replace(/bg-(purple|green|red)-50/, `bg-${cor}-50`)
+            .replace(/border-(purple|green|red)-200/, `border-${cor}-200`);
+    }
+    
+    function carregarAlertasEstoque() {
+        fetch('/vendas/alertas-estoque/?limite=10')
+            .then(response => response.json())
+            .then(data => {
+                if (data.erro || data.alertas.length === 0) return;
                 
-                // Atualizar elementos
-                document.getElementById('vendas-hoje').textContent = `R$ ${data.hoje.total.toFixed(2)}`;
-                document.getElementById('vendas-mes').textContent = `R$ ${data.mes_atual.total.toFixed(2)}`;
-                
-                // Comparativo
-                const comparativo = data.comparativo.diferenca;
-                const comparativoEl = document.getElementById('comparativo');
+                const rotulos = {
+                    ruptura: ['Sem estoque', 'bg-red-100 text-red-800'],
+                    critico: ['Crítico', 'bg-orange-100 text-orange-800'],
+                    atencao: ['Atenção', 'bg-yellow-100 text-yellow-800']
+                };
                 
-                if (comparativo > 0) {
-                    comparativoEl.textContent = `+R$ ${comparativo.toFixed(2)}`;
-                    comparativoEl.className = comparativoEl.className.replace('text-purple-900', 'text-green-900');
-                    comparativoEl.parentElement.parentElement.className = 
-                        comparativoEl.parentElement.parentElement.className.replace('bg-purple-50 border-purple-200', 'bg-green-50 border-green-200');
-                } else if (comparativo < 0) {
-                    comparativoEl.textContent = `R$ ${comparativo.toFixed(2)}`;
-                    comparativoEl.className = comparativoEl.className.replace('text-purple-900', 'text-red-900');
-                    comparativoEl.parentElement.parentElement.className = 
-                        comparativoEl.parentElement.parentElement.className.replace('bg-purple-50 border-purple-200', 'bg-red-50 border-red-200');
-                } else {
-                    comparativoEl.textContent = 'R$ 0,00';
-                }
+                document.getElementById('lista-alertas-estoque').innerHTML = data.alertas.map(alerta => `
+                    <li class="py-2 flex justify-between items-center">
+                        <span>
+                            <span class="px-2 py-0.5 rounded text-xs ${rotulos[alerta.nivel][1]}">${rotulos[alerta.nivel][0]}</span>
+                            <span class="ml-2 text-gray-900">${alerta.produto}</span>
+                        </span>
+                        <span class="text-gray-600">
+                            ${alerta.estoque_atual} em estoque · acaba em ~${alerta.dias_ate_ruptura.toFixed(1)} dias · repor ${alerta.quantidade_sugerida}
+                        </span>
+                    </li>
+                `).join('');
+                document.getElementById('alertas-estoque').classList.remove('hidden');
             })
             .catch(error => {
-                console.error('Erro ao carregar estatísticas:', error);
+                console.error('Erro ao carregar alertas de estoque:', error);
             });
     }
     
@@ -94,8 +161,12 @@ document.addEventListener('DOMContentLoaded', function() {
         loading.classList.remove('hidden');
         relatoriosContainer.innerHTML = '';
         
+        carregarRanking();
+        carregarMapaCalor();
+        carregarComparativoMeses();
+        
         // Fazer requisição
-        fetch(`/vendas/buscar-relatorios-mes/?ano=${ano}&mes=${mes}`)
+        fetch(`/vendas/buscar-relatorios-mes/?ano=${ano}&mes=${mes}&formato=compacto`)
             .then(response => response.json())
             .then(data => {
                 loading.classList.add('hidden');
@@ -105,7 +176,7 @@ document.addEventListener('DOMContentLoaded', function() {
                     return;
                 }
                 
-                renderizarRelatorios(data);
+                renderizarRelatorios(expandirFormatoCompacto(data));
             })
             .catch(error => {
                 loading.classList.add('hidden');
@@ -114,6 +185,156 @@ document.addEventListener('DOMContentLoaded', function() {
             });
     }
     
+    // Converte a resposta compacta (arrays por coluna) em um objeto por dia
+    function expandirFormatoCompacto(data) {
+        if (data.formato !== 'compacto') return data;
+        
+        const mesNumero = String(getMesNumero(data.mes_nome)).padStart(2, '0');
+        data.relatorios_diarios = [];
+        
+        for (let i = 0; i < data.dias; i++) {
+            const dia = i + 1;
+            const produtosResumo = {};
+            (data.produtos[dia] || []).forEach(([nome, quantidade, total]) => {
+                produtosResumo[nome] = { quantidade, total };
+            });
+            
+            data.relatorios_diarios.push({
+                dia: dia,
+                data: `${String(dia).padStart(2, '0')}/${mesNumero}/${data.ano}`,
+                total: data.totais[i],
+                numero_vendas: data.vendas[i],
+                tem_vendas: data.vendas[i] > 0,
+                produtos_resumo: produtosResumo
+            });
+        }
+        
+        return data;
+    }
+    
+    function carregarRanking() {
+        const ano = anoSelect.value;
+        const mes = mesSelect.value.padStart(2, '0');
+        const ultimoDia = new Date(ano, mesSelect.value, 0).getDate();
+        const tabela = document.getElementById('ranking-produtos');
+        const resumoAbc = document.getElementById('ranking-abc');
+        
+        fetch(`/vendas/ranking-produtos/?inicio=${ano}-${mes}-01&fim=${ano}-${mes}-${ultimoDia}&criterio=${rankingCriterio.value}&limite=10`)
+            .then(response => response.json())
+            .then(data => {
+                if (data.erro) {
+                    console.error('Erro ao carregar ranking:', data.erro);
+                    return;
+                }
+                
+                const coresClasse = { A: 'bg-green-100 text-green-800', B: 'bg-yellow-100 text-yellow-800', C: 'bg-gray-100 text-gray-700' };
+                
+                resumoAbc.innerHTML = ['A', 'B', 'C'].map(classe =>
+                    `<span class="px-2 py-1 rounded ${coresClasse[classe]}">Classe ${classe}: ${data.abc[classe].produtos} produtos (${data.abc[classe].participacao.toFixed(1)}%)</span>`
+                ).join('');
+                
+                if (data.produtos.length === 0) {
+                    tabela.innerHTML = '<tr><td colspan="6" class="py-4 text-center text-gray-500">Nenhuma venda no período</td></tr>';
+                    return;
+                }
+                
+                tabela.innerHTML = data.produtos.map(produto => `
+                    <tr>
+                        <td class="py-2 text-gray-500">${produto.posicao}</td>
+                        <td class="py-2 text-gray-900">${produto.nome}</td>
+                        <td class="py-2 text-right">${produto.quantidade}</td>
+                        <td class="py-2 text-right">R$ ${produto.receita.toFixed(2)}</td>
+                        <td class="py-2 text-right">${produto.participacao.toFixed(1)}</td>
+                        <td class="py-2 text-center"><span class="px-2 py-0.5 rounded text-xs ${coresClasse[produto.classe]}">${produto.classe}</span></td>
+                    </tr>
+                `).join('');
+            })
+            .catch(error => {
+                console.error('Erro ao carregar ranking:', error);
+            });
+    }
+    
+    function carregarComparativoMeses() {
+        const grafico = document.getElementById('comparativo-meses');
+        
+        fetch(`/vendas/comparativo-vendas/?tipo=serie&ano=${anoSelect.value}&mes=${mesSelect.value}&meses=24`)
+            .then(response => response.json())
+            .then(data => {
+                if (data.erro) {
+                    console.error('Erro ao carregar comparativo:', data.erro);
+                    return;
+                }
+                
+                const maximo = Math.max(...data.meses.map(m => Math.max(m.total, m.total_ano_anterior)), 0.01);
+                
+                grafico.innerHTML = data.meses.map(m => {
+                    const variacao = m.variacao_pct === null ? '' : ` (${m.variacao_pct > 0 ? '+' : ''}${m.variacao_pct.toFixed(1)}%)`;
+                    return `
+                        <div class="flex-1 flex items-end gap-px h-full" title="${m.rotulo}: R$ ${m.total.toFixed(2)} | ano anterior R$ ${m.total_ano_anterior.toFixed(2)}${variacao}">
+                            <div class="flex-1 bg-gray-300 rounded-t" style="height: ${(m.total_ano_anterior / maximo * 100).toFixed(1)}%;"></div>
+                            <div class="flex-1 bg-blue-600 rounded-t" style="height: ${(m.total / maximo * 100).toFixed(1)}%;"></div>
+                        </div>
+                    `;
+                }).join('');
+            })
+            .catch(error => {
+                console.error('Erro ao carregar comparativo:', error);
+            });
+    }
+    
+    function carregarMapaCalor() {
+        const tabela = document.getElementById('mapa-calor');
+        const pico = document.getElementById('mapa-calor-pico');
+        let url = '/vendas/mapa-calor-vendas/';
+        
+        if (mapaCalorPeriodo.value === 'mes') {
+            const ano = anoSelect.value;
+            const mes = mesSelect.value.padStart(2, '0');
+            const ultimoDia = new Date(ano, mesSelect.value, 0).getDate();
+            url += `?inicio=${ano}-${mes}-01&fim=${ano}-${mes}-${ultimoDia}`;
+        }
+        
+        fetch(url)
+            .then(response => response.json())
+            .then(data => {
+                if (data.erro) {
+                    console.error('Erro ao carregar mapa de calor:', data.erro);
+                    return;
+                }
+                
+                if (data.hora_pico === null) {
+                    pico.textContent = `Nenhuma venda entre ${data.inicio} e ${data.fim}`;
+                } else {
+                    const hora = String(data.hora_pico).padStart(2, '0');
+                    pico.textContent = `Pico entre ${data.inicio} e ${data.fim}: ${hora}h (R$ ${data.por_hora.totais[data.hora_pico].toFixed(2)})`;
+                }
+                
+                // Intensidade da cor proporcional ao maior total do período
+                const maximo = Math.max(...data.totais.flat(), 0.01);
+                const horas = [...Array(24).keys()];
+                
+                let html = '<tr><td></td>' + horas.map(hora =>
+                    `<td class="text-center text-gray-500 w-6">${String(hora).padStart(2, '0')}</td>`
+                ).join('') + '</tr>';
+                
+                html += data.dias_semana.map((dia, i) => '<tr>' +
+                    `<td class="pr-2 text-gray-600">${dia.slice(0, 3)}</td>` +
+                    horas.map(hora => {
+                        const total = data.totais[i][hora];
+                        const alfa = (total / maximo).toFixed(2);
+                        return `<td class="h-6 w-6 rounded" style="background-color: rgba(37, 99, 235, ${alfa});" ` +
+                            `title="${dia} ${hora}h: ${data.vendas[i][hora]} vendas, R$ ${total.toFixed(2)}"></td>`;
+                    }).join('') +
+                    '</tr>'
+                ).join('');
+                
+                tabela.innerHTML = html;
+            })
+            .catch(error => {
+                console.error('Erro ao carregar mapa de calor:', error);
+            });
+    }
+    
     function renderizarRelatorios(data) {
         relatoriosContainer.innerHTML = '';
         
@@ -236,6 +457,12 @@ document.addEventListener('DOMContentLoaded', function() {
                 >
                     📄 PDF
                 </button>
+                <button 
+                    onclick="downloadRelatorio(${ano}, ${mes}, ${dia}, 'xlsx')"
+                    class="flex-1 text-xs bg-green-600 text-white px-2 py-1 rounded hover:bg-green-700 transition-colors"
+                >
+                    📊 XLSX
+                </button>
             </div>
         `;
         
@@ -263,19 +490,20 @@ document.addEventListener('DOMContentLoaded', function() {
             });
     };
     
-    window.downloadRelatorio = function(ano, mes, dia) {
-        mostrarNotificacao('Gerando PDF...', 'info');
+    window.downloadRelatorio = function(ano, mes, dia, formato = 'pdf') {
+        const nome = formato.toUpperCase();
+        mostrarNotificacao(`Gerando ${nome}...`, 'info');
         
         // Criar link temporário para download
         const link = document.createElement('a');
-        link.href = `/vendas/download-relatorio-diario/${ano}/${mes}/${dia}/`;
-        link.download = `relatorio_${dia}_${mes}_${ano}.pdf`;
+        link.href = `/vendas/download-relatorio-diario/${ano}/${mes}/${dia}/?formato=${formato}`;
+        link.download = `relatorio_${dia}_${mes}_${ano}.${formato}`;
         document.body.appendChild(link);
         link.click();
         document.body.removeChild(link);
         
         setTimeout(() => {
-            mostrarNotificacao('PDF baixado com sucesso!', 'success');
+            mostrarNotificacao(`${nome} baixado com sucesso!`, 'success');
         }, 1000);
     };
     
@@ -379,6 +607,6 @@ document.addEventListener('DOMContentLoaded', function() {
         }, 4000);
     }
     
-    // Atualizar estatísticas a cada 5 minutos
-    setInterval(carregarEstatisticasRapidas, 300000);
+    // Atualizar estatísticas a cada venda (ou a cada 5 minutos, sem SSE)
+    acompanharEstatisticas();
 });
@@ -402,6 +402,9 @@ document.addEventListener('DOMContentLoaded', function() {
                         <p><strong>Total:</strong> <span class="text-green-600 font-semibold">R$ ${dadosVenda.total.toFixed(2)}</span></p>
                     </div>
                     
+                    <!-- Cupom (texto da impressora térmica) -->
+                    ${dadosVenda.cupom ? `<pre class="text-left text-xs font-mono bg-gray-50 border rounded p-2 mb-4 max-h-48 overflow-auto">${escaparHtml(dadosVenda.cupom)}</pre>` : ''}
+                    
                     <!-- Botões -->
                     <div class="flex space-x-3">
                         <button 
@@ -411,7 +414,7 @@ document.addEventListener('DOMContentLoaded', function() {
                             Nova Venda
                         </button>
                         <button 
-                            onclick="window.print(); fecharModalSucesso();"
+                            onclick="${dadosVenda.cupom_pdf ? `window.open('${dadosVenda.cupom_pdf}', '_blank')` : 'window.print()'}; fecharModalSucesso();"
                             class="flex-1 bg-gray-600 hover:bg-gray-700 text-white py-2 px-4 rounded-md transition-colors"
                         >
                             Imprimir
@@ -435,6 +438,12 @@ document.addEventListener('DOMContentLoaded', function() {
         }, 5000);
     }
 
+    function escaparHtml(texto) {
+        const div = document.createElement('div');
+        div.textContent = texto;
+        return div.innerHTML;
+    }
+
     // Função para fechar modal de sucesso
     function fecharModalSucesso() {
         const modal = document.getElementById('modal-sucesso-venda');
@@ -1,8 +1,266 @@
-from django.contrib import admin
-from .models import Produto, ItemVenda, Venda, RelatorioDiario, RelatorioMensal
-
-admin.site.register(Produto)
-admin.site.register(ItemVenda)
-admin.site.register(Venda)
-admin.site.register(RelatorioDiario)
-admin.site.register(RelatorioMensal)
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Max, Sum
+from django.utils.functional import cached_property
+
+from .models import (
+  Produto, ItemVenda, Venda, RelatorioDiario, RelatorioMensal, AlertaEstoque, Loja, EstoqueLoja, SessaoCaixa,
+  VendasPorHora, Devolucao, SnapshotLeitura, HistoricoPreco
+)
+from .utils.devolucoes import cancelar_venda
+
+
+class PaginadorEstimado(Paginator):
+  """Paginador que estima o total de tabelas grandes quando não há filtro
+
+  COUNT(*) percorre a tabela inteira; sem filtro, acima de LIMITE_EXATO
+  linhas usa a estatística do PostgreSQL (reltuples) ou, nos outros bancos,
+  o maior id (lido direto do índice da chave primária).
+  """
+  LIMITE_EXATO = 10000
+
+  @cached_property
+  def count(self):
+      query = getattr(self.object_list, 'query', None)
+      if query is None or query.where:
+          return super().count
+
+      estimativa = self._estimar(self.object_list.model)
+      if estimativa is None or estimativa < self.LIMITE_EXATO:
+          return super().count
+      return estimativa
+
+  def _estimar(self, modelo):
+      if connection.vendor == 'postgresql':
+          with connection.cursor() as cursor:
+              cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [modelo._meta.db_table])
+              linha = cursor.fetchone()
+          if linha and linha[0] > 0:
+              return linha[0]
+      return modelo._default_manager.aggregate(maior=Max('pk'))['maior']
+
+
+class TabelaGrandeAdmin(admin.ModelAdmin):
+  """Base dos changelists de tabelas que crescem sem limite
+
+  Contagem estimada, sem o segundo COUNT do total geral, e `totais_lista`
+  ({rótulo: agregação}) somados sobre o filtro atual em uma consulta só.
+  Sem filtro, numa tabela grande, os totais ficam de fora: a soma leria a
+  tabela inteira, que é o que o PaginadorEstimado evita.
+  """
+  paginator = PaginadorEstimado
+  show_full_result_count = False
+  list_per_page = 50
+  change_list_template = 'admin/vendas/change_list_totais.html'
+  totais_lista = {}
+
+  def changelist_view(self, request, extra_context=None):
+      resposta = super().changelist_view(request, extra_context)
+      contexto = getattr(resposta, 'context_data', None)
+      if self.totais_lista and contexto and 'cl' in contexto:
+          lista = contexto['cl']
+          if not lista.queryset.query.where and lista.result_count >= PaginadorEstimado.LIMITE_EXATO:
+              contexto['totais_sem_filtro'] = True
+              return resposta
+          totais = lista.queryset.order_by().aggregate(**{
+              f'total_{posicao}': agregacao for posicao, agregacao in enumerate(self.totais_lista.values())
+          })
+          contexto['totais_lista'] = [
+              (rotulo, totais[f'total_{posicao}'] or 0) for posicao, rotulo in enumerate(self.totais_lista)
+          ]
+      return resposta
+
+
+@admin.register(Loja)
+class LojaAdmin(admin.ModelAdmin):
+  list_display = ['codigo', 'nome']
+  search_fields = ['codigo', 'nome']
+
+
+@admin.register(Produto)
+class ProdutoAdmin(TabelaGrandeAdmin):
+  list_display = ['nome', 'codigo', 'preco', 'quantidade_estoque', 'quantidade_vendidos']
+  search_fields = ['nome', 'codigo']
+  totais_lista = {'Itens em estoque': Sum('quantidade_estoque')}
+
+
+class ItemVendaInline(admin.TabularInline):
+  model = ItemVenda
+  extra = 0
+  can_delete = False
+  readonly_fields = ['produto', 'quantidade', 'preco_unitario', 'subtotal']
+
+  # Mudar um item deixaria estoque, turno e relatórios errados; devoluções e
+  # cancelamentos passam por utils/devolucoes.py, que aplica os deltas
+  def has_add_permission(self, request, obj=None):
+      return False
+
+  def has_change_permission(self, request, obj=None):
+      return False
+
+  def has_delete_permission(self, request, obj=None):
+      return False
+
+
+@admin.register(Venda)
+class VendaAdmin(TabelaGrandeAdmin):
+  list_display = ['id', 'data_venda', 'loja', 'total', 'finalizada', 'cancelada']
+  list_filter = ['finalizada', 'cancelada', 'loja']
+  list_select_related = ['loja']
+  date_hierarchy = 'data_venda'
+  # Total, situação, data, loja e turno entram nos relatórios, no estoque e
+  # nos contadores do turno: só mudam pelo cancelamento abaixo ou pelas
+  # devoluções (utils/devolucoes.py)
+  readonly_fields = ['data_venda', 'loja', 'sessao', 'total', 'finalizada', 'cancelada', 'itens_arquivados',
+                     'created_at']
+  inlines = [ItemVendaInline]
+  actions = ['cancelar_vendas']
+  totais_lista = {'Total': Sum('total')}
+
+  def has_add_permission(self, request):
+      # Vendas entram por finalizar_venda, que baixa o estoque e soma os rollups
+      return False
+
+  def has_delete_permission(self, request, obj=None):
+      # Apagar uma venda deixaria estoque e relatórios errados; use o cancelamento
+      return False
+
+  @admin.action(description='Cancelar vendas selecionadas (devolve estoque e corrige relatórios)')
+  def cancelar_vendas(self, request, queryset):
+      canceladas = 0
+      for venda in queryset.filter(finalizada=True, itens_arquivados=False):
+          cancelar_venda(venda.id, motivo=f'Cancelada no admin por {request.user}')
+          canceladas += 1
+      self.message_user(request, f'{canceladas} venda(s) cancelada(s)', messages.SUCCESS)
+      arquivadas = queryset.filter(finalizada=True, itens_arquivados=True).count()
+      if arquivadas:
+          self.message_user(request, f'{arquivadas} venda(s) com itens arquivados não podem ser canceladas',
+                            messages.WARNING)
+
+
+@admin.register(ItemVenda)
+class ItemVendaAdmin(TabelaGrandeAdmin):
+  list_display = ['venda', 'produto', 'quantidade', 'preco_unitario', 'subtotal']
+  # __str__ do item e da venda leem o produto e a venda
+  list_select_related = ['venda', 'produto']
+  readonly_fields = ['venda', 'produto', 'quantidade', 'preco_unitario', 'subtotal']
+  totais_lista = {'Quantidade': Sum('quantidade'), 'Total': Sum('subtotal')}
+
+  # Só consulta, como no ItemVendaInline
+  def has_add_permission(self, request):
+      return False
+
+  def has_change_permission(self, request, obj=None):
+      return False
+
+  def has_delete_permission(self, request, obj=None):
+      return False
+
+
+@admin.register(RelatorioDiario)
+class RelatorioDiarioAdmin(TabelaGrandeAdmin):
+  list_display = ['data', 'loja', 'total_vendido', 'numero_vendas', 'total_itens', 'gerado_em']
+  list_filter = ['loja']
+  list_select_related = ['loja']
+  date_hierarchy = 'data'
+  totais_lista = {'Total': Sum('total_vendido'), 'Vendas': Sum('numero_vendas')}
+  # Gerado das vendas (gerar_resumo) e corrigido pelas devoluções; apagar
+  # um relatório só faz a próxima consulta regenerá-lo
+  readonly_fields = ['loja', 'data', 'total_vendido', 'total_itens', 'numero_vendas', 'resumo_produtos',
+                     'gerado_em', 'vendas_ate_id']
+
+  def has_add_permission(self, request):
+      return False
+
+
+@admin.register(RelatorioMensal)
+class RelatorioMensalAdmin(admin.ModelAdmin):
+  list_display = ['ano', 'mes', 'loja', 'total_mensal', 'dias_com_vendas']
+  list_filter = ['ano', 'loja']
+  list_select_related = ['loja']
+  # Soma dos diários (gerar_consolidacao), como no RelatorioDiarioAdmin
+  readonly_fields = ['loja', 'ano', 'mes', 'total_mensal', 'dias_com_vendas']
+
+  def has_add_permission(self, request):
+      return False
+
+
+@admin.register(AlertaEstoque)
+class AlertaEstoqueAdmin(TabelaGrandeAdmin):
+  list_display = ['produto', 'nivel', 'estoque_atual', 'vendas_por_dia', 'dias_ate_ruptura', 'quantidade_sugerida']
+  list_filter = ['nivel']
+  list_select_related = ['produto']
+  raw_id_fields = ['produto']
+  totais_lista = {'Reposição sugerida': Sum('quantidade_sugerida')}
+
+
+@admin.register(EstoqueLoja)
+class EstoqueLojaAdmin(TabelaGrandeAdmin):
+  list_display = ['loja', 'produto', 'quantidade']
+  list_filter = ['loja']
+  list_select_related = ['loja', 'produto']
+  autocomplete_fields = ['loja', 'produto']
+  search_fields = ['produto__nome', 'produto__codigo']
+
+
+@admin.register(SessaoCaixa)
+class SessaoCaixaAdmin(admin.ModelAdmin):
+  list_display = ['caixa', 'operador', 'loja', 'aberta_em', 'fechada_em', 'numero_vendas', 'total_vendido']
+  list_filter = ['loja']
+  list_select_related = ['loja']
+  autocomplete_fields = ['loja']
+  # Contadores somados por finalizar_venda e descontados pelas devoluções;
+  # o turno fecha por fechar_caixa
+  readonly_fields = ['fechada_em', 'numero_vendas', 'total_itens', 'total_vendido']
+
+
+@admin.register(VendasPorHora)
+class VendasPorHoraAdmin(TabelaGrandeAdmin):
+  list_display = ['data', 'hora', 'loja', 'numero_vendas', 'total_itens', 'total']
+  list_filter = ['loja']
+  list_select_related = ['loja']
+  date_hierarchy = 'data'
+  totais_lista = {'Vendas': Sum('numero_vendas'), 'Total': Sum('total')}
+  # Rollup das vendas (VendasPorHora.registrar): só consulta
+  readonly_fields = ['data', 'hora', 'dia_semana', 'loja', 'numero_vendas', 'total_itens', 'total']
+
+  def has_add_permission(self, request):
+      return False
+
+
+@admin.register(Devolucao)
+class DevolucaoAdmin(TabelaGrandeAdmin):
+  list_display = ['criado_em', 'venda', 'item', 'quantidade', 'valor', 'cancelamento', 'motivo']
+  list_filter = ['cancelamento']
+  # __str__ do item lê o produto
+  list_select_related = ['venda', 'item__produto']
+  totais_lista = {'Itens': Sum('quantidade'), 'Valor': Sum('valor')}
+  # Registro dos estornos já aplicados (utils/devolucoes.py)
+  readonly_fields = ['venda', 'item', 'quantidade', 'valor', 'cancelamento', 'motivo', 'criado_em']
+
+  def has_add_permission(self, request):
+      return False
+
+  def has_delete_permission(self, request, obj=None):
+      return False
+
+
+@admin.register(HistoricoPreco)
+class HistoricoPrecoAdmin(TabelaGrandeAdmin):
+  list_display = ['produto', 'preco', 'inicio', 'fim']
+  list_select_related = ['produto']
+  date_hierarchy = 'inicio'
+  search_fields = ['produto__nome', 'produto__codigo']
+  # Gravado pelas mudanças de Produto.preco (utils/precos.py)
+  readonly_fields = ['produto', 'preco', 'inicio', 'fim']
+
+  def has_add_permission(self, request):
+      return False
+
+
+@admin.register(SnapshotLeitura)
+class SnapshotLeituraAdmin(admin.ModelAdmin):
+  list_display = ['chave', 'atualizado_em']
+  search_fields = ['chave']
+  readonly_fields = ['chave', 'conteudo', 'atualizado_em']
@@ -0,0 +1,85 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from django import forms
+from django.core import exceptions
+from django.db import models
+from django.db.models import ExpressionWrapper, F, Value
+
+CENTAVO = Decimal('0.01')
+# Maior valor de uma coluna BIGINT (centavos e ids)
+MAXIMO_BIGINT = 2 ** 63 - 1
+
+
+def para_centavos(valor):
+  """Converte reais (Decimal, int, float ou str) em inteiro de centavos"""
+  if not isinstance(valor, Decimal):
+      valor = Decimal(str(valor))
+  return int((valor * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def de_centavos(centavos):
+  """Inteiro de centavos para Decimal com duas casas (ex.: 1250 -> 12.50)"""
+  return Decimal(centavos).scaleb(-2)
+
+
+def somar_centavos(campo, valor):
+  """Expressão F(campo) + valor (em reais) para update() atômico de um CentavosField
+
+  Ex.: Venda.objects.filter(id=1).update(total=somar_centavos('total', Decimal('-2.50')))
+  """
+  return ExpressionWrapper(F(campo) + Value(para_centavos(valor)), output_field=CentavosField())
+
+
+class CentavosField(models.Field):
+  """Valor em reais guardado como inteiro de centavos
+
+  No banco é um BIGINT, então SUM/AVG rodam sobre inteiros e são exatos; no
+  Python continua se comportando como um DecimalField de duas casas
+  (atribuição e leitura em Decimal, filtros com valores em reais).
+  Para somar os centavos crus sem criar Decimals, use
+  Sum('campo', output_field=models.BigIntegerField()).
+  """
+  description = "Valor monetário em centavos"
+
+  def get_internal_type(self):
+    return 'BigIntegerField'
+
+  def from_db_value(self, value, expression, connection):
+    if value is None:
+        return value
+    return de_centavos(int(value))
+
+  def to_python(self, value):
+    """Decimal de duas casas; ValidationError para texto, NaN, infinito e
+    valores que não cabem num BIGINT de centavos"""
+    if value is None:
+        return value
+    try:
+        valor = value if isinstance(value, Decimal) else Decimal(str(value))
+        if not valor.is_finite():
+            raise ValueError
+        valor = valor.quantize(CENTAVO, rounding=ROUND_HALF_UP)
+        if abs(para_centavos(valor)) > MAXIMO_BIGINT:
+            raise ValueError
+        return valor
+    except (InvalidOperation, ValueError):
+        raise exceptions.ValidationError(
+            '“%(value)s” não é um valor monetário válido.',
+            code='invalid',
+            params={'value': value},
+        )
+
+  def get_prep_value(self, value):
+    # Valores inválidos saem como ValidationError (e não InvalidOperation do
+    # decimal), como no DecimalField
+    value = self.to_python(super().get_prep_value(value))
+    if value is None:
+        return None
+    return para_centavos(value)
+
+  def formfield(self, **kwargs):
+    return super().formfield(**{
+        'form_class': forms.DecimalField,
+        'decimal_places': 2,
+        **kwargs,
+    })
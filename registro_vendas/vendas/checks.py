@@ -0,0 +1,30 @@
+# checks.py
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Caches que cada processo tem só para si
+CACHES_POR_PROCESSO = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches)
+def cache_compartilhado(app_configs, **kwargs):
+  """Em produção o cache padrão precisa ser o mesmo para todos os workers
+
+  As versões do ranking, dos comparativos e do painel ao vivo ficam nele:
+  num cache por processo, uma devolução não invalida o ranking dos outros
+  workers e uma venda não chega aos painéis ligados em outro processo.
+  """
+  if not getattr(settings, 'PRODUCAO', False):
+      return []
+  backend = settings.CACHES.get('default', {}).get('BACKEND')
+  if backend not in CACHES_POR_PROCESSO:
+      return []
+  return [Error(
+      f'O cache padrão ({backend.rsplit(".", 1)[-1]}) é de cada processo',
+      hint='Use REDIS_URL ou o FileBasedCache de settings.py. Com um único processo, '
+           'silencie com SILENCED_SYSTEM_CHECKS = ["vendas.E001"]',
+      id='vendas.E001',
+  )]
@@ -0,0 +1,76 @@
+# management/commands/arquivar_itens.py
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from vendas.models import Devolucao, Venda
+from vendas.utils.arquivo import arquivar_mes, caminho_arquivo, horizonte, meses_arquivados
+from vendas.utils.periodos import intervalo_do_dia
+
+class Command(BaseCommand):
+    help = 'Move os itens de venda de meses antigos para o arquivo morto (os relatórios continuam)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--meses',
+            type=int,
+            default=None,
+            help='Meses mantidos no banco principal, além do atual (padrão: ARQUIVO_ITENS_MESES)'
+        )
+        parser.add_argument(
+            '--simular',
+            action='store_true',
+            help='Só lista os meses que seriam arquivados'
+        )
+        parser.add_argument(
+            '--vacuum',
+            action='store_true',
+            help='No SQLite, roda VACUUM no final para devolver o espaço ao disco'
+        )
+        parser.add_argument(
+            '--listar',
+            action='store_true',
+            help='Lista os meses já arquivados e sai'
+        )
+
+    def handle(self, *args, **options):
+        if options['listar']:
+            for ano, mes, itens, arquivado_em in meses_arquivados():
+                self.stdout.write(f'{mes:02d}/{ano}: {itens} itens (arquivado em {arquivado_em[:19]})')
+            return
+
+        if options['meses'] is not None and options['meses'] < 1:
+            raise CommandError('--meses precisa ser pelo menos 1')
+
+        limite = horizonte(options['meses'])
+        # Vendas com devolução nunca são arquivadas; não fazem o mês voltar
+        meses = Venda.objects.filter(
+            finalizada=True, itens_arquivados=False, data_venda__lt=intervalo_do_dia(limite)[0]
+        ).exclude(id__in=Devolucao.objects.values('venda_id')).dates('data_venda', 'month')
+
+        if not meses:
+            self.stdout.write(f'Nada a arquivar antes de {limite:%m/%Y}')
+            return
+
+        total = 0
+        for inicio_mes in meses:
+            if options['simular']:
+                self.stdout.write(f'{inicio_mes:%m/%Y} seria arquivado')
+                continue
+            itens = arquivar_mes(inicio_mes.year, inicio_mes.month)
+            total += itens
+            self.stdout.write(f'{inicio_mes:%m/%Y}: {itens} itens arquivados')
+
+        if options['simular']:
+            return
+
+        if options['vacuum'] and connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('VACUUM')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ {total} itens movidos para {caminho_arquivo()}')
+        )
+
+# Exemplo de uso (agendar mensalmente, depois do fechamento do mês):
+# python manage.py arquivar_itens --simular
+# python manage.py arquivar_itens --meses 24 --vacuum
+# python manage.py arquivar_itens --listar
@@ -0,0 +1,43 @@
+# management/commands/benchmark.py
+from django.core.management.base import BaseCommand, CommandError
+from vendas.utils import benchmarks
+
+class Command(BaseCommand):
+    help = 'Executa cenários de benchmark com dados sintéticos (desfeitos ao final)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'cenarios',
+            nargs='*',
+            help=f'Cenários a executar (padrão: todos). Disponíveis: {", ".join(sorted(benchmarks.CENARIOS))}'
+        )
+        parser.add_argument(
+            '--opcao',
+            action='append',
+            default=[],
+            metavar='NOME=VALOR',
+            help='Parâmetro inteiro repassado aos cenários (ex.: --opcao produtos=1000)'
+        )
+    
+    def handle(self, *args, **options):
+        nomes = options['cenarios'] or sorted(benchmarks.CENARIOS)
+        desconhecidos = [nome for nome in nomes if nome not in benchmarks.CENARIOS]
+        if desconhecidos:
+            raise CommandError(f'Cenário(s) desconhecido(s): {", ".join(desconhecidos)}')
+        
+        opcoes = {}
+        for opcao in options['opcao']:
+            try:
+                chave, valor = opcao.split('=', 1)
+                opcoes[chave] = int(valor)
+            except ValueError:
+                raise CommandError(f'Opção inválida: {opcao} (use NOME=VALOR inteiro)')
+        
+        for nome in nomes:
+            self.stdout.write(self.style.MIGRATE_HEADING(f'== {nome}'))
+            for descricao, valor in benchmarks.executar(nome, **opcoes):
+                self.stdout.write(f'  {descricao:<45} {valor}')
+
+# Exemplo de uso:
+# python manage.py benchmark
+# python manage.py benchmark relatorios_mes --opcao produtos=1000
@@ -0,0 +1,55 @@
+# management/commands/calcular_alertas_estoque.py
+from django.core.management.base import BaseCommand, CommandError
+from vendas.utils.estoque import calcular_alertas_estoque
+
+class Command(BaseCommand):
+    help = 'Calcula a previsão de ruptura de estoque de todos os produtos e grava os alertas'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--janela',
+            type=int,
+            default=30,
+            help='Dias de histórico de vendas usados para calcular a velocidade (padrão: 30)'
+        )
+        parser.add_argument(
+            '--horizonte',
+            type=int,
+            default=14,
+            help='Alertar produtos que acabam em até N dias (padrão: 14)'
+        )
+        parser.add_argument(
+            '--criticos',
+            type=int,
+            default=3,
+            help='Produtos que acabam em até N dias são críticos (padrão: 3)'
+        )
+        parser.add_argument(
+            '--cobertura',
+            type=int,
+            default=30,
+            help='Dias de venda que a reposição sugerida deve cobrir (padrão: 30)'
+        )
+    
+    def handle(self, *args, **options):
+        if options['janela'] < 1:
+            raise CommandError('--janela precisa ser pelo menos 1')
+
+        resultado = calcular_alertas_estoque(
+            janela_dias=options['janela'],
+            horizonte_dias=options['horizonte'],
+            dias_criticos=options['criticos'],
+            cobertura_dias=options['cobertura']
+        )
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✅ {resultado["produtos"]} produtos analisados em {resultado["segundos"]:.2f}s: '
+                f'{resultado["ruptura"]} sem estoque, {resultado["critico"]} críticos, '
+                f'{resultado["atencao"]} em atenção'
+            )
+        )
+
+# Exemplo de uso (agendar diariamente, ex.: cron):
+# python manage.py calcular_alertas_estoque
+# python manage.py calcular_alertas_estoque --janela 60 --horizonte 7
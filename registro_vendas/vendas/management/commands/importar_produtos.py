@@ -0,0 +1,55 @@
+# management/commands/importar_produtos.py
+from django.core.management.base import BaseCommand, CommandError
+from vendas.utils.importacao import ImportadorProdutos
+
+class Command(BaseCommand):
+    help = 'Importa (cria ou atualiza) produtos em massa a partir de um arquivo CSV'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'arquivo',
+            type=str,
+            help='Arquivo CSV com as colunas codigo, nome, preco e estoque'
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=ImportadorProdutos.TAMANHO_LOTE,
+            help='Quantidade de linhas validadas e gravadas por transação'
+        )
+        parser.add_argument(
+            '--somar-estoque',
+            action='store_true',
+            help='Soma a coluna estoque ao estoque atual (entrada de mercadoria) em vez de substituir'
+        )
+    
+    def handle(self, *args, **options):
+        importador = ImportadorProdutos(
+            tamanho_lote=options['lote'],
+            somar_estoque=options['somar_estoque']
+        )
+        
+        try:
+            with open(options['arquivo'], 'rb') as arquivo:
+                resultado = importador.importar(arquivo)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Erro ao importar produtos: {e}')
+        
+        for erro in resultado['erros']:
+            self.stdout.write(self.style.WARNING(f'⚠️  {erro}'))
+        omitidos = resultado['total_erros'] - len(resultado['erros'])
+        if omitidos:
+            self.stdout.write(self.style.WARNING(f'⚠️  ... e mais {omitidos} linhas com erro'))
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✅ {resultado["linhas"]} linhas em {resultado["segundos"]:.2f}s '
+                f'({resultado["linhas_por_segundo"]} linhas/s): '
+                f'{resultado["criados"]} criados, {resultado["atualizados"]} atualizados, '
+                f'{resultado["total_erros"]} com erro'
+            )
+        )
+
+# Exemplo de uso:
+# python manage.py importar_produtos catalogo.csv
+# python manage.py importar_produtos entrada.csv --somar-estoque
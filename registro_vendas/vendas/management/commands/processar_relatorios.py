@@ -1,8 +1,10 @@
 # management/commands/processar_relatorios.py
+from contextlib import nullcontext
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from datetime import date, timedelta, datetime
-from vendas.utils.relatorios import processar_vendas_do_dia, processar_vendas_do_mes
+from vendas.utils.relatorios import GeradorRelatorios
+from vendas.utils.perfil import PerfilRelatorio
 
 class Command(BaseCommand):
     help = 'Processa relatórios diários e mensais automaticamente'
@@ -33,10 +35,30 @@ class Command(BaseCommand):
             action='store_true',
             help='Processar relatório do mês atual'
         )
+        parser.add_argument(
+            '--pdf',
+            action='store_true',
+            help='Gerar também o PDF de cada relatório (descartado; útil com --perfil)'
+        )
+        parser.add_argument(
+            '--perfil',
+            metavar='DESTINO',
+            help='Perfilar o processamento: grava DESTINO.folded (pilhas para flamegraph) '
+                 'e DESTINO.prof (cProfile) e mostra o tempo de cada fase'
+        )
     
     def handle(self, *args, **options):
         hoje = date.today()
+        self.gerar_pdf = options['pdf']
+        perfil = PerfilRelatorio() if options['perfil'] else None
+        
+        with perfil or nullcontext():
+            self.processar(hoje, options)
         
+        if perfil is not None:
+            self.mostrar_perfil(perfil, options['perfil'])
+    
+    def processar(self, hoje, options):
         try:
             if options['data']:
                 # Data específica
@@ -78,7 +100,9 @@ class Command(BaseCommand):
         self.stdout.write(f'Processando relatório do dia {data.strftime("%d/%m/%Y")}...')
         
         try:
-            relatorio = processar_vendas_do_dia(data)
+            relatorio = GeradorRelatorios.processar_vendas_do_dia(data)
+            if self.gerar_pdf:
+                GeradorRelatorios.pdf_diario(data)
             
             if relatorio.numero_vendas > 0:
                 self.stdout.write(
@@ -104,7 +128,9 @@ class Command(BaseCommand):
         self.stdout.write(f'Processando relatório mensal de {meses[mes]} {ano}...')
         
         try:
-            relatorio = processar_vendas_do_mes(ano, mes)
+            relatorio = GeradorRelatorios.processar_vendas_do_mes(ano, mes)
+            if self.gerar_pdf:
+                GeradorRelatorios.pdf_mensal(ano, mes)
             
             self.stdout.write(
                 self.style.SUCCESS(
@@ -118,8 +144,24 @@ class Command(BaseCommand):
                 self.style.ERROR(f'❌ Erro ao processar {meses[mes]} {ano}: {str(e)}')
             )
 
+    def mostrar_perfil(self, perfil, destino):
+        with open(f'{destino}.folded', 'w', encoding='utf-8') as arquivo:
+            arquivo.write(perfil.colapsado())
+        perfil.salvar_cprofile(f'{destino}.prof')
+        
+        resumo = perfil.resumo()
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Perfil: {resumo["total_ms"]:.1f} ms, {resumo["amostras"]} amostras'))
+        for nome, dados in resumo['fases'].items():
+            self.stdout.write(
+                f'  {nome:<14} {dados["ms"]:>10.1f} ms  {dados["consultas"]:>5} consultas '
+                f'({dados["ms_consultas"]:.1f} ms)'
+            )
+        self.stdout.write(f'Pilhas: {destino}.folded (flamegraph.pl, speedscope) | cProfile: {destino}.prof')
+
 # Exemplo de uso:
 # python manage.py processar_relatorios --ontem
 # python manage.py processar_relatorios --data 2025-08-12
 # python manage.py processar_relatorios --mes 2025-08
-# python manage.py processar_relatorios --mes-atual
\ No newline at end of file
+# python manage.py processar_relatorios --mes-atual
+# python manage.py processar_relatorios --mes 2025-08 --pdf --perfil /tmp/mensal
+#   flamegraph.pl /tmp/mensal.folded > mensal.svg
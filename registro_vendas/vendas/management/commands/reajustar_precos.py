@@ -0,0 +1,43 @@
+# management/commands/reajustar_precos.py
+from decimal import Decimal, InvalidOperation
+from django.core.management.base import BaseCommand, CommandError
+from vendas.models import Produto
+from vendas.utils.precos import reajustar_precos
+
+class Command(BaseCommand):
+    help = 'Reajusta em lote o preço dos produtos e grava a mudança no histórico de preços'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'percentual',
+            type=str,
+            help='Reajuste em porcentagem (ex.: 5, 7.5 ou -10)'
+        )
+        parser.add_argument(
+            '--codigos',
+            type=str,
+            help='Códigos dos produtos separados por vírgula (padrão: todos)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            percentual = Decimal(options['percentual'].replace(',', '.'))
+        except InvalidOperation:
+            raise CommandError('Percentual inválido')
+        if percentual <= -100:
+            raise CommandError('O reajuste precisa ser maior que -100%')
+
+        produtos = Produto.objects.all()
+        if options['codigos']:
+            codigos = [codigo.strip() for codigo in options['codigos'].split(',') if codigo.strip()]
+            produtos = produtos.filter(codigo__in=codigos)
+            faltando = set(codigos) - set(produtos.values_list('codigo', flat=True))
+            if faltando:
+                raise CommandError(f'Códigos não encontrados: {", ".join(sorted(faltando))}')
+
+        alterados = reajustar_precos(produtos, percentual)
+        self.stdout.write(self.style.SUCCESS(f'✅ {alterados} produtos com preço reajustado em {percentual}%'))
+
+# Exemplo de uso:
+# python manage.py reajustar_precos 5
+# python manage.py reajustar_precos -10 --codigos CAFE01,ACUCAR02
@@ -0,0 +1,40 @@
+# management/commands/reconstruir_vendas_por_hora.py
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from vendas.utils.mapa_calor import reconstruir_vendas_por_hora
+
+class Command(BaseCommand):
+    help = 'Recalcula as vendas agregadas por hora (mapa de calor) a partir das vendas'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--inicio',
+            type=str,
+            help='Primeiro dia a recalcular (formato: YYYY-MM-DD). Sem datas recalcula tudo'
+        )
+        parser.add_argument(
+            '--fim',
+            type=str,
+            help='Último dia a recalcular (formato: YYYY-MM-DD)'
+        )
+    
+    def handle(self, *args, **options):
+        try:
+            data_inicio = date.fromisoformat(options['inicio']) if options['inicio'] else None
+            data_fim = date.fromisoformat(options['fim']) if options['fim'] else None
+        except ValueError:
+            raise CommandError('Datas inválidas. Use o formato YYYY-MM-DD')
+        
+        if bool(data_inicio) != bool(data_fim):
+            raise CommandError('Informe --inicio e --fim juntos')
+        
+        baldes = reconstruir_vendas_por_hora(data_inicio, data_fim)
+        
+        periodo = f'de {data_inicio:%d/%m/%Y} a {data_fim:%d/%m/%Y}' if data_inicio else 'de todo o histórico'
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ {baldes} horas com vendas recalculadas {periodo}')
+        )
+
+# Exemplo de uso (uma vez, para preencher o histórico anterior ao mapa de calor):
+# python manage.py reconstruir_vendas_por_hora
+# python manage.py reconstruir_vendas_por_hora --inicio 2025-01-01 --fim 2025-01-31
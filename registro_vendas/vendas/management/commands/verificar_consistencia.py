@@ -0,0 +1,80 @@
+# management/commands/verificar_consistencia.py
+import time
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from vendas.utils.consistencia import corrigir, intervalo_verificavel, verificar
+
+class Command(BaseCommand):
+    help = ('Confere relatórios diários, mensais e Produto.quantidade_vendidos contra as vendas '
+            '(dias e meses encerrados) e, com --corrigir, grava os valores recalculados')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--inicio',
+            type=str,
+            help='Primeiro dia a conferir (formato: YYYY-MM-DD; vale o mês inteiro). Padrão: primeira venda'
+        )
+        parser.add_argument(
+            '--fim',
+            type=str,
+            help='Último dia a conferir (formato: YYYY-MM-DD; vale o mês inteiro). Padrão: ontem'
+        )
+        parser.add_argument(
+            '--corrigir',
+            action='store_true',
+            help='Grava os valores recalculados em lote (e cria os relatórios que faltam)'
+        )
+        parser.add_argument(
+            '--sem-produtos',
+            action='store_true',
+            help='Não confere Produto.quantidade_vendidos (que cobre todo o histórico)'
+        )
+        parser.add_argument(
+            '--limite',
+            type=int,
+            default=50,
+            help='Divergências listadas (as demais só entram na contagem)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            data_inicio = date.fromisoformat(options['inicio']) if options['inicio'] else None
+            data_fim = date.fromisoformat(options['fim']) if options['fim'] else None
+        except ValueError:
+            raise CommandError('Datas inválidas. Use o formato YYYY-MM-DD')
+
+        if data_inicio and data_fim and data_inicio > data_fim:
+            raise CommandError('--inicio depois de --fim')
+
+        inicio = time.perf_counter()
+        divergencias, correcoes = verificar(data_inicio, data_fim, produtos=not options['sem_produtos'])
+        segundos = time.perf_counter() - inicio
+
+        intervalo = intervalo_verificavel(data_inicio, data_fim)
+        if intervalo:
+            self.stdout.write(f'Relatórios de {intervalo[0]:%d/%m/%Y} a {intervalo[1]:%d/%m/%Y} conferidos em {segundos:.2f}s')
+        else:
+            self.stdout.write(f'Nenhum dia encerrado com vendas no intervalo (conferido em {segundos:.2f}s)')
+
+        for divergencia in divergencias[:options['limite']]:
+            self.stdout.write(f'  {divergencia}')
+        if len(divergencias) > options['limite']:
+            self.stdout.write(f'  ... e mais {len(divergencias) - options["limite"]}')
+
+        if not divergencias:
+            self.stdout.write(self.style.SUCCESS('✅ Agregados consistentes com as vendas'))
+            return
+
+        resumo = (f'{len(correcoes["diarios"])} relatórios diários, {len(correcoes["mensais"])} mensais '
+                  f'e {len(correcoes["produtos"])} produtos')
+        if not options['corrigir']:
+            self.stdout.write(self.style.WARNING(f'⚠️ {len(divergencias)} divergências: {resumo} (use --corrigir)'))
+            return
+
+        corrigir(correcoes)
+        self.stdout.write(self.style.SUCCESS(f'✅ Corrigidos: {resumo}'))
+
+# Exemplo de uso (agendar toda noite, depois de processar_relatorios --ontem):
+# python manage.py verificar_consistencia
+# python manage.py verificar_consistencia --inicio 2025-01-01 --fim 2025-12-31 --corrigir
+# python manage.py verificar_consistencia --sem-produtos --limite 10
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendas', '0004_alter_venda_options_itemvenda_subtotal_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produto',
+            name='codigo',
+            field=models.CharField(blank=True, max_length=50, null=True, unique=True),
+        ),
+    ]
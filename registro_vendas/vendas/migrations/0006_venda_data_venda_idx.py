@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendas', '0005_produto_codigo'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='venda',
+            index=models.Index(fields=['data_venda'], name='venda_data_venda_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendas', '0006_venda_data_venda_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertaEstoque',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nivel', models.CharField(choices=[('ruptura', 'Sem estoque'), ('critico', 'Crítico'), ('atencao', 'Atenção')], max_length=10)),
+                ('estoque_atual', models.PositiveIntegerField()),
+                ('vendas_por_dia', models.FloatField()),
+                ('dias_ate_ruptura', models.FloatField()),
+                ('quantidade_sugerida', models.PositiveIntegerField(default=0)),
+                ('gerado_em', models.DateTimeField(auto_now=True)),
+                ('produto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='alerta_estoque', to='vendas.produto')),
+            ],
+            options={
+                'verbose_name': 'Alerta de Estoque',
+                'verbose_name_plural': 'Alertas de Estoque',
+                'ordering': ['dias_ate_ruptura'],
+            },
+        ),
+    ]
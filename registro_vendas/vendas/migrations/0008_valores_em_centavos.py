@@ -0,0 +1,74 @@
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Cast, Round
+
+import vendas.campos
+
+# (modelo, campo, definição original do DecimalField, default)
+CAMPOS_MONETARIOS = [
+    ('produto', 'preco', (100, 2), None),
+    ('venda', 'total', (10, 2), 0),
+    ('itemvenda', 'preco_unitario', (8, 2), None),
+    ('itemvenda', 'subtotal', (10, 2), 0),
+    ('relatoriodiario', 'total_vendido', (10, 2), 0),
+    ('relatoriomensal', 'total_mensal', (12, 2), 0),
+]
+
+
+def _kwargs(default):
+    return {} if default is None else {'default': default}
+
+
+def _alterar(campo_novo):
+    """AlterField de todos os campos monetários para o tipo devolvido por campo_novo"""
+    return [
+        migrations.AlterField(
+            model_name=modelo,
+            name=campo,
+            field=campo_novo(digitos, default),
+        )
+        for modelo, campo, digitos, default in CAMPOS_MONETARIOS
+    ]
+
+
+def _decimal_largo(digitos, default):
+    # Largo o bastante para guardar os valores já multiplicados por 100
+    return models.DecimalField(max_digits=max(digitos[0], 10) + 4, decimal_places=2, **_kwargs(default))
+
+
+def _decimal_original(digitos, default):
+    return models.DecimalField(max_digits=digitos[0], decimal_places=digitos[1], **_kwargs(default))
+
+
+def _centavos(digitos, default):
+    return vendas.campos.CentavosField(**_kwargs(default))
+
+
+def reais_para_centavos(apps, schema_editor):
+    for modelo, campo, _, _ in CAMPOS_MONETARIOS:
+        apps.get_model('vendas', modelo).objects.update(**{campo: Round(F(campo) * 100)})
+
+
+def centavos_para_reais(apps, schema_editor):
+    for modelo, campo, _, _ in CAMPOS_MONETARIOS:
+        # Cast para não cair em divisão inteira
+        apps.get_model('vendas', modelo).objects.update(**{campo: Cast(F(campo), models.FloatField()) / 100})
+
+
+class Migration(migrations.Migration):
+    """Guarda os valores monetários como inteiros de centavos
+
+    Em três passos para não perder os centavos em nenhum banco: alarga os
+    DecimalFields, multiplica por 100 (com arredondamento) e só então muda a
+    coluna para inteiro, quando a conversão já é exata.
+    """
+
+    dependencies = [
+        ('vendas', '0007_alertaestoque'),
+    ]
+
+    operations = (
+        _alterar(_decimal_largo)
+        + [migrations.RunPython(reais_para_centavos, centavos_para_reais)]
+        + _alterar(_centavos)
+    )
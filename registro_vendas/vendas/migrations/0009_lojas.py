@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendas', '0008_valores_em_centavos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Loja',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('codigo', models.CharField(max_length=20, unique=True)),
+                ('nome', models.CharField(max_length=100)),
+            ],
+            options={
+                'ordering': ['nome'],
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='relatoriomensal',
+            unique_together=set(),
+        ),
+        migrations.AlterField(
+            model_name='relatoriodiario',
+            name='data',
+            field=models.DateField(),
+        ),
+        migrations.CreateModel(
+            name='EstoqueLoja',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantidade', models.PositiveIntegerField(default=0)),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='estoques_loja', to='vendas.produto')),
+                ('loja', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='estoques', to='vendas.loja')),
+            ],
+            options={
+                'verbose_name': 'Estoque da Loja',
+                'verbose_name_plural': 'Estoques das Lojas',
+            },
+        ),
+        migrations.AddField(
+            model_name='relatoriodiario',
+            name='loja',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='relatorios_diarios', to='vendas.loja'),
+        ),
+        migrations.AddField(
+            model_name='relatoriomensal',
+            name='loja',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='relatorios_mensais', to='vendas.loja'),
+        ),
+        migrations.AddField(
+            model_name='venda',
+            name='loja',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='vendas', to='vendas.loja'),
+        ),
+        migrations.AddIndex(
+            model_name='venda',
+            index=models.Index(fields=['loja', 'data_venda'], name='venda_loja_data_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='relatoriodiario',
+            constraint=models.UniqueConstraint(fields=('loja', 'data'), name='relatorio_diario_loja_data_unico'),
+        ),
+        migrations.AddConstraint(
+            model_name='relatoriodiario',
+            constraint=models.UniqueConstraint(condition=models.Q(('loja__isnull', True)), fields=('data',), name='relatorio_diario_consolidado_unico'),
+        ),
+        migrations.AddConstraint(
+            model_name='relatoriomensal',
+            constraint=models.UniqueConstraint(fields=('loja', 'ano', 'mes'), name='relatorio_mensal_loja_mes_unico'),
+        ),
+        migrations.AddConstraint(
+            model_name='relatoriomensal',
+            constraint=models.UniqueConstraint(condition=models.Q(('loja__isnull', True)), fields=('ano', 'mes'), name='relatorio_mensal_consolidado_unico'),
+        ),
+        migrations.AddConstraint(
+            model_name='estoqueloja',
+            constraint=models.UniqueConstraint(fields=('loja', 'produto'), name='estoque_loja_produto_unico'),
+        ),
+    ]
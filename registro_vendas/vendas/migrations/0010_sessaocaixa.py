@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:56
+
+import django.db.models.deletion
+import django.utils.timezone
+import vendas.campos
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendas', '0009_lojas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessaoCaixa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('caixa', models.CharField(default='1', max_length=20)),
+                ('operador', models.CharField(max_length=100)),
+                ('aberta_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('fechada_em', models.DateTimeField(blank=True, null=True)),
+                ('valor_abertura', vendas.campos.CentavosField(default=0)),
+                ('valor_contado', vendas.campos.CentavosField(blank=True, null=True)),
+                ('numero_vendas', models.IntegerField(default=0)),
+                ('total_itens', models.IntegerField(default=0)),
+                ('total_vendido', vendas.campos.CentavosField(default=0)),
+                ('loja', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='sessoes_caixa', to='vendas.loja')),
+            ],
+            options={
+                'verbose_name': 'Sessão de Caixa',
+                'verbose_name_plural': 'Sessões de Caixa',
+                'ordering': ['-aberta_em'],
+            },
+        ),
+        migrations.AddField(
+            model_name='venda',
+            name='sessao',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='vendas', to='vendas.sessaocaixa'),
+        ),
+        migrations.AddConstraint(
+            model_name='sessaocaixa',
+            constraint=models.UniqueConstraint(condition=models.Q(('fechada_em__isnull', True)), fields=('loja', 'caixa'), name='sessao_caixa_aberta_unica'),
+        ),
+    ]
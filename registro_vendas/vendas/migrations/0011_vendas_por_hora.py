@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:59
+
+import django.db.models.deletion
+import vendas.campos
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendas', '0010_sessaocaixa'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VendasPorHora',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField()),
+                ('hora', models.PositiveSmallIntegerField()),
+                ('dia_semana', models.PositiveSmallIntegerField()),
+                ('numero_vendas', models.IntegerField(default=0)),
+                ('total_itens', models.IntegerField(default=0)),
+                ('total', vendas.campos.CentavosField(default=0)),
+                ('loja', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='vendas_por_hora', to='vendas.loja')),
+            ],
+            options={
+                'verbose_name': 'Vendas por Hora',
+                'verbose_name_plural': 'Vendas por Hora',
+                'ordering': ['data', 'hora'],
+                'indexes': [models.Index(fields=['data'], name='vendas_hora_data_idx')],
+                'constraints': [models.UniqueConstraint(fields=('loja', 'data', 'hora'), name='vendas_hora_loja_unico'), models.UniqueConstraint(condition=models.Q(('loja__isnull', True)), fields=('data', 'hora'), name='vendas_hora_sem_loja_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:00
+
+import django.db.models.deletion
+import django.utils.timezone
+import vendas.campos
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendas', '0011_vendas_por_hora'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venda',
+            name='cancelada',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='Devolucao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantidade', models.PositiveIntegerField()),
+                ('valor', vendas.campos.CentavosField()),
+                ('cancelamento', models.BooleanField(default=False)),
+                ('motivo', models.CharField(blank=True, max_length=200)),
+                ('criado_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='devolucoes', to='vendas.itemvenda')),
+                ('venda', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='devolucoes', to='vendas.venda')),
+            ],
+            options={
+                'verbose_name': 'Devolução',
+                'verbose_name_plural': 'Devoluções',
+                'ordering': ['-criado_em'],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:10
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def marcar_vendas_ate(apps, schema_editor):
+    # A ligação com as vendas some; o último momento conhecido em que o
+    # relatório foi gravado passa a marcar até onde ele contém vendas
+    RelatorioDiario = apps.get_model('vendas', 'RelatorioDiario')
+    RelatorioDiario.objects.update(vendas_ate=F('gerado_em'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendas', '0012_devolucoes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='relatoriodiario',
+            name='vendas_ate',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(marcar_vendas_ate, migrations.RunPython.noop),
+        # Membros agora saem do intervalo de datas (índices em data_venda e data)
+        migrations.RemoveField(
+            model_name='relatoriodiario',
+            name='vendas_do_dia',
+        ),
+        migrations.RemoveField(
+            model_name='relatoriomensal',
+            name='relatorios_diarios',
+        ),
+    ]
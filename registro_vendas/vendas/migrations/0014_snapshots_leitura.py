@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendas', '0013_relatorios_sem_tabelas_de_ligacao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotLeitura',
+            fields=[
+                ('chave', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('conteudo', models.BinaryField()),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Snapshot de Leitura',
+                'verbose_name_plural': 'Snapshots de Leitura',
+            },
+        ),
+    ]
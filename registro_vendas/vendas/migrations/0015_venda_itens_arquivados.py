@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendas', '0014_snapshots_leitura'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venda',
+            name='itens_arquivados',
+            field=models.BooleanField(default=False),
+        ),
+    ]
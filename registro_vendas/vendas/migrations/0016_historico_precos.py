@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:32
+
+import django.db.models.deletion
+import vendas.campos
+from django.db import migrations, models
+
+
+def abrir_historico(apps, schema_editor):
+    """Preço atual de cada produto vigente desde o cadastro (os anteriores
+    só existem em ItemVenda.preco_unitario)"""
+    Produto = apps.get_model('vendas', 'Produto')
+    HistoricoPreco = apps.get_model('vendas', 'HistoricoPreco')
+    HistoricoPreco.objects.bulk_create(
+        (
+            HistoricoPreco(produto_id=produto_id, preco=preco, inicio=data_cadastro)
+            for produto_id, preco, data_cadastro in
+            Produto.objects.values_list('id', 'preco', 'data_cadastro').iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendas', '0015_venda_itens_arquivados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoricoPreco',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('preco', vendas.campos.CentavosField()),
+                ('inicio', models.DateTimeField()),
+                ('fim', models.DateTimeField(blank=True, null=True)),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='historico_precos', to='vendas.produto')),
+            ],
+            options={
+                'verbose_name': 'Histórico de Preço',
+                'verbose_name_plural': 'Histórico de Preços',
+                'ordering': ['produto', 'inicio'],
+                'indexes': [models.Index(fields=['produto', 'inicio'], name='historico_preco_produto_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('fim__isnull', True)), fields=('produto',), name='historico_preco_vigente_unico')],
+            },
+        ),
+        migrations.RunPython(abrir_historico, migrations.RunPython.noop),
+    ]
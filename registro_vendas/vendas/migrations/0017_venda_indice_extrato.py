@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendas', '0016_historico_precos'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='venda',
+            name='venda_data_venda_idx',
+        ),
+        migrations.AddIndex(
+            model_name='venda',
+            index=models.Index(fields=['data_venda', 'id'], name='venda_data_id_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:02
+
+from django.db import migrations, models
+from django.db.models import Max
+
+from vendas.utils.periodos import intervalo_do_dia
+
+
+def marcar_vendas_ate_id(apps, schema_editor):
+    # O marco passa a ser o maior id lido pela agregação; para os relatórios
+    # já gravados, o maior id entre as vendas finalizadas do dia criadas até
+    # vendas_ate (as mesmas que vendas_do_dia soma)
+    RelatorioDiario = apps.get_model('vendas', 'RelatorioDiario')
+    Venda = apps.get_model('vendas', 'Venda')
+    for relatorio in RelatorioDiario.objects.filter(vendas_ate__isnull=False).iterator():
+        inicio, fim = intervalo_do_dia(relatorio.data)
+        vendas = Venda.objects.filter(
+            data_venda__gte=inicio, data_venda__lt=fim, finalizada=True, created_at__lte=relatorio.vendas_ate
+        )
+        if relatorio.loja_id is not None:
+            vendas = vendas.filter(loja_id=relatorio.loja_id)
+        relatorio.vendas_ate_id = vendas.aggregate(ultima=Max('id'))['ultima']
+        relatorio.save(update_fields=['vendas_ate_id'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendas', '0017_venda_indice_extrato'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='relatoriodiario',
+            name='vendas_ate_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(marcar_vendas_ate_id, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='relatoriodiario',
+            name='vendas_ate',
+        ),
+    ]
@@ -1,11 +1,27 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.utils import timezone
 from datetime import date
 
+from .campos import CentavosField, somar_centavos
+from .utils.periodos import intervalo_do_dia, intervalo_do_mes
+
+
+class Loja(models.Model):
+  """Ponto de venda. Vendas e relatórios sem loja são da loja única (legado)"""
+  codigo = models.CharField(max_length=20, unique=True)
+  nome = models.CharField(max_length=100)
+  
+  class Meta:
+      ordering = ['nome']
+  
+  def __str__(self):
+      return self.nome
 
 class Produto(models.Model):
+  # Código do produto (SKU) usado como chave na importação em massa
+  codigo = models.CharField(max_length=50, unique=True, null=True, blank=True)
   nome = models.CharField(max_length=100)
-  preco = models.DecimalField(max_digits=100, decimal_places=2)
+  preco = CentavosField()
   quantidade_estoque = models.PositiveIntegerField()
   quantidade_vendidos = models.PositiveIntegerField(default=0)
   data_cadastro = models.DateTimeField(auto_now_add=True)
@@ -13,15 +29,220 @@ class Produto(models.Model):
   def __str__(self):
     return self.nome
 
+  @classmethod
+  def from_db(cls, db, field_names, values):
+    produto = super().from_db(db, field_names, values)
+    # Preço como está no banco: save() só grava histórico quando ele muda
+    produto._preco_gravado = produto.__dict__.get('preco')
+    return produto
+
+  def save(self, *args, **kwargs):
+    from .utils.precos import registrar_precos
+
+    campos = kwargs.get('update_fields')
+    mudou_preco = (
+        (self._state.adding or self.preco != getattr(self, '_preco_gravado', None))
+        and (campos is None or 'preco' in campos)
+        and 'preco' not in self.get_deferred_fields()
+    )
+    if not mudou_preco:
+        return super().save(*args, **kwargs)
+    with transaction.atomic():
+        super().save(*args, **kwargs)
+        registrar_precos({self.id: self.preco})
+    self._preco_gravado = self.preco
+
+class HistoricoPreco(models.Model):
+  """Preço de tabela de um produto num intervalo [inicio, fim)
+
+  O intervalo vigente tem fim vazio (só um por produto). "Preço do produto
+  X no momento T" é a última linha de X com inicio <= T, lida pelo índice
+  (produto, inicio). Gravado por utils/precos.py.
+  """
+  produto = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name='historico_precos')
+  preco = CentavosField()
+  inicio = models.DateTimeField()
+  fim = models.DateTimeField(null=True, blank=True)
+
+  class Meta:
+      ordering = ['produto', 'inicio']
+      constraints = [
+          models.UniqueConstraint(fields=['produto'], condition=models.Q(fim__isnull=True),
+                                  name='historico_preco_vigente_unico'),
+      ]
+      indexes = [
+          models.Index(fields=['produto', 'inicio'], name='historico_preco_produto_idx'),
+      ]
+      verbose_name = "Histórico de Preço"
+      verbose_name_plural = "Histórico de Preços"
+
+  def __str__(self):
+      fim = timezone.localtime(self.fim).strftime('%d/%m/%Y') if self.fim else 'hoje'
+      return f"{self.produto.nome}: R$ {self.preco} de {timezone.localtime(self.inicio).strftime('%d/%m/%Y')} a {fim}"
+
+class AlertaEstoque(models.Model):
+  """Previsão de ruptura de estoque, recalculada em lote (calcular_alertas_estoque)"""
+  NIVEIS = [
+      ('ruptura', 'Sem estoque'),
+      ('critico', 'Crítico'),
+      ('atencao', 'Atenção'),
+  ]
+  
+  produto = models.OneToOneField(Produto, on_delete=models.CASCADE, related_name='alerta_estoque')
+  nivel = models.CharField(max_length=10, choices=NIVEIS)
+  estoque_atual = models.PositiveIntegerField()
+  vendas_por_dia = models.FloatField()
+  dias_ate_ruptura = models.FloatField()
+  quantidade_sugerida = models.PositiveIntegerField(default=0)
+  gerado_em = models.DateTimeField(auto_now=True)
+  
+  class Meta:
+      ordering = ['dias_ate_ruptura']
+      verbose_name = "Alerta de Estoque"
+      verbose_name_plural = "Alertas de Estoque"
+  
+  def __str__(self):
+      return f"{self.produto.nome} - {self.get_nivel_display()} ({self.dias_ate_ruptura:.1f} dias)"
+
+class EstoqueLoja(models.Model):
+  """Parte do estoque de um produto que está em uma loja
+
+  Produto.quantidade_estoque continua sendo o total de todas as lojas.
+  """
+  loja = models.ForeignKey(Loja, on_delete=models.CASCADE, related_name='estoques')
+  produto = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name='estoques_loja')
+  quantidade = models.PositiveIntegerField(default=0)
+  
+  class Meta:
+      constraints = [
+          models.UniqueConstraint(fields=['loja', 'produto'], name='estoque_loja_produto_unico'),
+      ]
+      verbose_name = "Estoque da Loja"
+      verbose_name_plural = "Estoques das Lojas"
+  
+  def __str__(self):
+      return f"{self.loja} - {self.produto.nome}: {self.quantidade}"
+
+class SessaoCaixa(models.Model):
+  """Turno de um caixa (abertura até o fechamento)
+
+  Os contadores são incrementados a cada venda finalizada no turno, então o
+  fechamento é só a leitura desta linha; reconciliar() confere com as vendas.
+  """
+  loja = models.ForeignKey(Loja, on_delete=models.PROTECT, null=True, blank=True, related_name='sessoes_caixa')
+  caixa = models.CharField(max_length=20, default='1')
+  operador = models.CharField(max_length=100)
+  aberta_em = models.DateTimeField(default=timezone.now)
+  fechada_em = models.DateTimeField(null=True, blank=True)
+  valor_abertura = CentavosField(default=0)
+  valor_contado = CentavosField(null=True, blank=True)
+  
+  numero_vendas = models.IntegerField(default=0)
+  total_itens = models.IntegerField(default=0)
+  total_vendido = CentavosField(default=0)
+  
+  class Meta:
+      ordering = ['-aberta_em']
+      constraints = [
+          # Um caixa só pode ter um turno aberto por vez
+          models.UniqueConstraint(fields=['loja', 'caixa'], condition=models.Q(fechada_em__isnull=True),
+                                  name='sessao_caixa_aberta_unica'),
+      ]
+      verbose_name = "Sessão de Caixa"
+      verbose_name_plural = "Sessões de Caixa"
+  
+  def __str__(self):
+      return f"Caixa {self.caixa} - {self.operador} ({timezone.localtime(self.aberta_em).strftime('%d/%m/%Y %H:%M')})"
+  
+  @property
+  def aberta(self):
+      return self.fechada_em is None
+  
+  def registrar_venda(self, total, itens, vendas=1):
+      """Soma uma venda aos contadores do turno (update atômico, sem ler a linha)
+
+      Estornos passam valores negativos (vendas=-1 no cancelamento).
+      """
+      SessaoCaixa.objects.filter(id=self.id).update(
+          numero_vendas=models.F('numero_vendas') + vendas,
+          total_itens=models.F('total_itens') + itens,
+          total_vendido=somar_centavos('total_vendido', total)
+      )
+  
+  def fechar(self, valor_contado=None):
+      self.fechada_em = timezone.now()
+      self.valor_contado = valor_contado
+      self.save(update_fields=['fechada_em', 'valor_contado'])
+  
+  def fechamento(self):
+      """Dados do fechamento lidos dos contadores acumulados"""
+      esperado = self.valor_abertura + self.total_vendido
+      return {
+          'sessao_id': self.id,
+          'loja': self.loja.nome if self.loja_id else None,
+          'caixa': self.caixa,
+          'operador': self.operador,
+          'aberta_em': timezone.localtime(self.aberta_em).strftime('%d/%m/%Y %H:%M'),
+          'fechada_em': timezone.localtime(self.fechada_em).strftime('%d/%m/%Y %H:%M') if self.fechada_em else None,
+          'numero_vendas': self.numero_vendas,
+          'total_itens': self.total_itens,
+          'total_vendido': float(self.total_vendido),
+          'valor_abertura': float(self.valor_abertura),
+          'valor_esperado': float(esperado),
+          'valor_contado': float(self.valor_contado) if self.valor_contado is not None else None,
+          'diferenca_caixa': float(self.valor_contado - esperado) if self.valor_contado is not None else None
+      }
+  
+  def reconciliar(self):
+      """Recalcula os totais a partir das vendas do turno e aponta divergências
+
+      Devoluções feitas depois do fechamento não entram nos contadores do
+      turno (utils/devolucoes.py), então são somadas de volta aqui.
+      """
+      vendas = self.vendas.filter(finalizada=True)
+      reais = vendas.aggregate(numero_vendas=models.Count('id'), total_vendido=models.Sum('total'))
+      reais['total_itens'] = (
+          ItemVenda.objects.filter(venda__in=vendas).aggregate(total=models.Sum('quantidade'))['total'] or 0
+      )
+      reais['total_vendido'] = reais['total_vendido'] or 0
+      if self.fechada_em is not None:
+          depois = Devolucao.objects.filter(venda__sessao=self, criado_em__gt=self.fechada_em).aggregate(
+              numero_vendas=models.Count('venda', distinct=True, filter=models.Q(cancelamento=True)),
+              total_itens=models.Sum('quantidade'),
+              total_vendido=models.Sum('valor'),
+          )
+          for campo, valor in depois.items():
+              reais[campo] += valor or 0
+      
+      divergencias = {
+          campo: {'acumulado': float(getattr(self, campo)), 'vendas': float(valor)}
+          for campo, valor in reais.items()
+          if getattr(self, campo) != valor
+      }
+      return {'conferido': not divergencias, 'divergencias': divergencias}
+
 class Venda(models.Model):
   """Modelo principal de vendas"""
+  loja = models.ForeignKey(Loja, on_delete=models.PROTECT, null=True, blank=True, related_name='vendas')
+  sessao = models.ForeignKey(SessaoCaixa, on_delete=models.PROTECT, null=True, blank=True, related_name='vendas')
   data_venda = models.DateTimeField(default=timezone.now)
-  total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+  total = CentavosField(default=0)
   finalizada = models.BooleanField(default=False)
+  # Venda cancelada deixa de ser finalizada e sai de todos os relatórios
+  cancelada = models.BooleanField(default=False)
+  # Itens movidos para o arquivo morto (utils/arquivo.py)
+  itens_arquivados = models.BooleanField(default=False)
   created_at = models.DateTimeField(default=timezone.now)
   
   class Meta:
       ordering = ['-data_venda']
+      indexes = [
+          # Consultas de relatórios filtram por intervalo de data_venda; o id
+          # desempata a ordem do extrato (paginação por chave, utils/extrato.py)
+          models.Index(fields=['data_venda', 'id'], name='venda_data_id_idx'),
+          # Relatórios por loja: o índice começa pela loja
+          models.Index(fields=['loja', 'data_venda'], name='venda_loja_data_idx'),
+      ]
   
   def __str__(self):
       return f"Venda {self.id} - {self.data_venda.strftime('%d/%m/%Y')}"
@@ -32,8 +253,8 @@ class ItemVenda(models.Model):
   venda = models.ForeignKey(Venda, on_delete=models.CASCADE, related_name='itens')
   produto = models.ForeignKey('Produto', on_delete=models.CASCADE)
   quantidade = models.IntegerField()
-  preco_unitario = models.DecimalField(max_digits=8, decimal_places=2)
-  subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+  preco_unitario = CentavosField()
+  subtotal = CentavosField(default=0)
   
   def save(self, *args, **kwargs):
       self.subtotal = self.quantidade * self.preco_unitario
@@ -42,11 +263,107 @@ class ItemVenda(models.Model):
   def __str__(self):
       return f"{self.quantidade:02d} {self.produto.nome} - R$ {self.subtotal:.2f}"
 
+class Devolucao(models.Model):
+  """Registro de cada item devolvido (ou estornado no cancelamento da venda)
+
+  A venda e seus itens já refletem a devolução; aqui fica o histórico.
+  """
+  venda = models.ForeignKey(Venda, on_delete=models.PROTECT, related_name='devolucoes')
+  item = models.ForeignKey(ItemVenda, on_delete=models.PROTECT, related_name='devolucoes')
+  quantidade = models.PositiveIntegerField()
+  valor = CentavosField()
+  cancelamento = models.BooleanField(default=False)
+  motivo = models.CharField(max_length=200, blank=True)
+  criado_em = models.DateTimeField(default=timezone.now)
+  
+  class Meta:
+      ordering = ['-criado_em']
+      verbose_name = "Devolução"
+      verbose_name_plural = "Devoluções"
+  
+  def __str__(self):
+      tipo = "Cancelamento" if self.cancelamento else "Devolução"
+      return f"{tipo} venda {self.venda_id}: {self.quantidade:02d} {self.item.produto.nome} - R$ {self.valor:.2f}"
+
+
+class VendasPorHora(models.Model):
+  """Vendas agregadas por hora do fuso local (base do mapa de calor)
+
+  Cada venda finalizada soma no balde da sua hora, então consultas por hora
+  ou dia da semana leem no máximo 24 linhas por dia (por loja), qualquer que
+  seja o volume de vendas. Vendas sem loja ficam com loja vazia; o
+  consolidado é a soma de todas as linhas.
+  """
+  DIAS_SEMANA = ['Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado', 'Domingo']
+  
+  loja = models.ForeignKey(Loja, on_delete=models.CASCADE, null=True, blank=True, related_name='vendas_por_hora')
+  data = models.DateField()
+  hora = models.PositiveSmallIntegerField()
+  # 0 = segunda (date.weekday()), guardado para agrupar sem funções de data do banco
+  dia_semana = models.PositiveSmallIntegerField()
+  numero_vendas = models.IntegerField(default=0)
+  total_itens = models.IntegerField(default=0)
+  total = CentavosField(default=0)
+  
+  class Meta:
+      ordering = ['data', 'hora']
+      constraints = [
+          models.UniqueConstraint(fields=['loja', 'data', 'hora'], name='vendas_hora_loja_unico'),
+          models.UniqueConstraint(fields=['data', 'hora'], condition=models.Q(loja__isnull=True),
+                                  name='vendas_hora_sem_loja_unico'),
+      ]
+      indexes = [
+          # O mapa consolidado filtra só pelo intervalo de datas
+          models.Index(fields=['data'], name='vendas_hora_data_idx'),
+      ]
+      verbose_name = "Vendas por Hora"
+      verbose_name_plural = "Vendas por Hora"
+  
+  def __str__(self):
+      loja = f" ({self.loja})" if self.loja_id else ""
+      return f"{self.data.strftime('%d/%m/%Y')} {self.hora:02d}h{loja} - R$ {self.total}"
+  
+  @classmethod
+  def registrar(cls, venda, itens, total=None, vendas=1):
+      """Soma uma venda (ou, com valores negativos, desconta) no balde da sua hora
+
+      Update atômico com F(); a linha só é criada na primeira venda da hora.
+      """
+      momento = timezone.localtime(venda.data_venda)
+      chave = {'loja_id': venda.loja_id, 'data': momento.date(), 'hora': momento.hour}
+      total = venda.total if total is None else total
+      
+      def somar():
+          return cls.objects.filter(**chave).update(
+              numero_vendas=models.F('numero_vendas') + vendas,
+              total_itens=models.F('total_itens') + itens,
+              total=somar_centavos('total', total)
+          )
+      
+      if somar():
+          return
+      try:
+          with transaction.atomic():
+              cls.objects.create(
+                  dia_semana=chave['data'].weekday(),
+                  numero_vendas=vendas,
+                  total_itens=itens,
+                  total=total,
+                  **chave
+              )
+      except IntegrityError:
+          # Outra venda da mesma hora criou a linha antes
+          somar()
+
+
 class RelatorioDiario(models.Model):
-  """Consolidação diária das vendas - formato caderno do seu pai"""
-  data = models.DateField(unique=True)
-  vendas_do_dia = models.ManyToManyField(Venda, related_name='relatorio_diario')
-  total_vendido = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+  """Consolidação diária das vendas - formato caderno do seu pai
+
+  Com loja vazia o relatório consolida todas as lojas do dia.
+  """
+  loja = models.ForeignKey(Loja, on_delete=models.CASCADE, null=True, blank=True, related_name='relatorios_diarios')
+  data = models.DateField()
+  total_vendido = CentavosField(default=0)
   total_itens = models.IntegerField(default=0)
   numero_vendas = models.IntegerField(default=0)
   
@@ -55,99 +372,168 @@ class RelatorioDiario(models.Model):
   # Exemplo: {"parafuso": {"quantidade": 15, "total": 2.25}, "porca": {"quantidade": 8, "total": 1.60}}
   
   gerado_em = models.DateTimeField(auto_now=True)
+  # Maior id de venda que a última agregação leu: vendas de id maior ainda
+  # não estão nos totais (gerado_em muda também a cada devolução descontada)
+  vendas_ate_id = models.BigIntegerField(null=True, blank=True)
   
   class Meta:
       ordering = ['-data']
+      constraints = [
+          models.UniqueConstraint(fields=['loja', 'data'], name='relatorio_diario_loja_data_unico'),
+          models.UniqueConstraint(fields=['data'], condition=models.Q(loja__isnull=True),
+                                  name='relatorio_diario_consolidado_unico'),
+      ]
       verbose_name = "Relatório Diário"
       verbose_name_plural = "Relatórios Diários"
   
   def __str__(self):
-      return f"Relatório {self.data.strftime('%d/%m/%Y')} - R$ {self.total_vendido}"
+      loja = f" ({self.loja})" if self.loja_id else ""
+      return f"Relatório {self.data.strftime('%d/%m/%Y')}{loja} - R$ {self.total_vendido}"
+
+  @property
+  def vendas_do_dia(self):
+      """Vendas finalizadas do dia (e da loja), pelo intervalo em data_venda
+
+      Derivado do índice (loja, data_venda) em vez de guardado numa tabela de
+      ligação, então regenerar o relatório não reescreve uma linha por venda.
+      """
+      inicio, fim = intervalo_do_dia(self.data)
+      vendas = Venda.objects.filter(data_venda__gte=inicio, data_venda__lt=fim, finalizada=True)
+      if self.loja_id is not None:
+          vendas = vendas.filter(loja_id=self.loja_id)
+      return vendas
+
+  def contem_venda(self, venda):
+      """A venda está nos totais do relatório?
+
+      Decidido pelo maior id que a agregação leu, não por horário: uma venda
+      criada antes da geração, mas confirmada depois por outro worker, tem
+      created_at anterior e ainda assim não foi somada. Vale porque o id só
+      fica visível com o commit da venda e os commits de escrita no SQLite
+      são em série (ids confirmados em ordem).
+      """
+      return (
+          self.vendas_ate_id is not None
+          and venda.id <= self.vendas_ate_id
+          and timezone.localdate(venda.data_venda) == self.data
+          and (self.loja_id is None or self.loja_id == venda.loja_id)
+      )
   
   def gerar_resumo(self):
-      """Gera resumo no formato do caderno"""
-      vendas = self.vendas_do_dia.filter(finalizada=True)
+      """Gera resumo no formato do caderno
+
+      Tudo é agregado no banco (somas de centavos inteiros), em vez de
+      percorrer cada venda e cada item no Python.
+      """
+      vendas = self.vendas_do_dia
+      # Itens devolvidos por inteiro ficam com quantidade zero
+      itens = ItemVenda.objects.filter(venda__in=vendas, quantidade__gt=0)
       produtos_resumo = {}
       
-      for venda in vendas:
-          for item in venda.itens.all():
-              nome_produto = item.produto.nome
-              
-              if nome_produto not in produtos_resumo:
-                  produtos_resumo[nome_produto] = {
-                      'quantidade': 0,
-                      'total': 0.0
-                  }
-              
-              produtos_resumo[nome_produto]['quantidade'] += item.quantidade
-              produtos_resumo[nome_produto]['total'] += float(item.subtotal)
+      # As duas leituras na mesma transação: o maior id lido vale para as duas
+      with transaction.atomic():
+          totais = vendas.aggregate(total=models.Sum('total'), numero=models.Count('id'), ultima=models.Max('id'))
+          linhas = list(
+              itens.filter(venda_id__lte=totais['ultima'] or 0)
+              .values('produto__nome')
+              .annotate(quantidade=models.Sum('quantidade'),
+                        centavos=models.Sum('subtotal', output_field=models.BigIntegerField()))
+              .order_by('produto__nome')
+          )
+      for linha in linhas:
+          produtos_resumo[linha['produto__nome']] = {
+              'quantidade': linha['quantidade'],
+              # Soma exata em centavos; o float só aparece na conversão final
+              'total': linha['centavos'] / 100
+          }
       
       # Atualizar campos
+      self.vendas_ate_id = totais['ultima']
       self.resumo_produtos = produtos_resumo
-      self.total_vendido = sum(venda.total for venda in vendas)
-      self.numero_vendas = vendas.count()
-      self.total_itens = sum(
-          sum(item.quantidade for item in venda.itens.all()) 
-          for venda in vendas
-      )
+      self.total_vendido = totais['total'] or 0
+      self.numero_vendas = totais['numero']
+      self.total_itens = sum(dados['quantidade'] for dados in produtos_resumo.values())
       self.save()
       
       return produtos_resumo
   
   def formato_caderno(self):
       """Retorna texto formatado como no caderno do seu pai"""
-      linhas = []
-      linhas.append(f"Em {self.data.strftime('%d de %B de %Y')}")
-      linhas.append("-" * 40)
-      
-      for produto, dados in self.resumo_produtos.items():
-          linhas.append(f"{dados['quantidade']:02d} {produto}  total - R$ {dados['total']:.2f}")
-      
-      linhas.append("-" * 40)
-      linhas.append(f"TOTAL DO DIA: R$ {self.total_vendido:.2f}")
-      linhas.append(f"Número de vendas: {self.numero_vendas}")
-      
-      return "\n".join(linhas)
+      from .utils.formatos import DadosDia, texto_diario
+      return texto_diario(DadosDia.do_relatorio(self)).decode('utf-8')
 
 class RelatorioMensal(models.Model):
-  """Consolidação mensal"""
+  """Consolidação mensal (de uma loja ou, com loja vazia, de todas)"""
+  loja = models.ForeignKey(Loja, on_delete=models.CASCADE, null=True, blank=True, related_name='relatorios_mensais')
   ano = models.IntegerField()
   mes = models.IntegerField()
-  relatorios_diarios = models.ManyToManyField(RelatorioDiario)
-  total_mensal = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+  total_mensal = CentavosField(default=0)
   dias_com_vendas = models.IntegerField(default=0)
   
   class Meta:
-      unique_together = ['ano', 'mes']
       ordering = ['-ano', '-mes']
+      constraints = [
+          models.UniqueConstraint(fields=['loja', 'ano', 'mes'], name='relatorio_mensal_loja_mes_unico'),
+          models.UniqueConstraint(fields=['ano', 'mes'], condition=models.Q(loja__isnull=True),
+                                  name='relatorio_mensal_consolidado_unico'),
+      ]
       verbose_name = "Relatório Mensal"
       verbose_name_plural = "Relatórios Mensais"
   
   def __str__(self):
       meses = ['', 'Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
               'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
-      return f"{meses[self.mes]} {self.ano} - R$ {self.total_mensal}"
+      loja = f" ({self.loja})" if self.loja_id else ""
+      return f"{meses[self.mes]} {self.ano}{loja} - R$ {self.total_mensal}"
   
+  @property
+  def relatorios_diarios(self):
+      """Relatórios diários do mês (da mesma loja ou consolidados)"""
+      inicio, fim = intervalo_do_mes(self.ano, self.mes)
+      relatorios = RelatorioDiario.objects.filter(data__gte=inicio, data__lte=fim)
+      if self.loja_id is None:
+          return relatorios.filter(loja__isnull=True)
+      return relatorios.filter(loja_id=self.loja_id)
+
   def gerar_consolidacao(self):
-      """Consolida todos os relatórios diários do mês"""
-      from calendar import monthrange
-      
-      dias_no_mes = monthrange(self.ano, self.mes)[1]
-      relatorios = []
-      
-      for dia in range(1, dias_no_mes + 1):
-          try:
-              relatorio_dia = RelatorioDiario.objects.get(
-                  data=date(self.ano, self.mes, dia)
-              )
-              relatorios.append(relatorio_dia)
-          except RelatorioDiario.DoesNotExist:
-              continue
-      
-      # Atualizar relacionamentos
-      self.relatorios_diarios.set(relatorios)
+      """Consolida todos os relatórios diários do mês (uma consulta)"""
+      relatorios = list(self.relatorios_diarios.order_by('data'))
       self.total_mensal = sum(r.total_vendido for r in relatorios)
-      self.dias_com_vendas = len(relatorios)
+      # Relatórios de dias sem vendas (gerados por uma consulta ou zerados
+      # por cancelamentos) não contam
+      self.dias_com_vendas = sum(1 for r in relatorios if r.numero_vendas > 0)
       self.save()
       
-      return relatorios
\ No newline at end of file
+      return relatorios
+
+class SnapshotLeitura(models.Model):
+  """Modelo de leitura pré-calculado: JSON compacto pronto para enviar
+
+  Gravado quando os relatórios são materializados; páginas e APIs leem por
+  chave, sem consultar Venda nem remontar o JSON a cada acesso.
+  """
+  chave = models.CharField(max_length=100, primary_key=True)
+  conteudo = models.BinaryField()
+  atualizado_em = models.DateTimeField(auto_now=True)
+
+  class Meta:
+      verbose_name = "Snapshot de Leitura"
+      verbose_name_plural = "Snapshots de Leitura"
+
+  def __str__(self):
+      return self.chave
+
+  @classmethod
+  def ler(cls, chave):
+      """Bytes do snapshot ou None"""
+      conteudo = cls.objects.filter(chave=chave).values_list('conteudo', flat=True).first()
+      return bytes(conteudo) if conteudo is not None else None
+
+  @classmethod
+  def gravar(cls, chave, conteudo):
+      cls.objects.update_or_create(chave=chave, defaults={'conteudo': conteudo})
+
+  @classmethod
+  def descartar(cls, prefixo):
+      """Apaga os snapshots cuja chave começa com o prefixo"""
+      cls.objects.filter(chave__startswith=prefixo).delete()
@@ -1,3 +1,1301 @@
-from django.test import TestCase
+import io
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import zipfile
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+from xml.etree import ElementTree
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.checks import Tags, run_checks
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .campos import de_centavos, para_centavos, somar_centavos
+from .models import (
+  AlertaEstoque, Devolucao, EstoqueLoja, HistoricoPreco, ItemVenda, Loja, Produto, RelatorioDiario,
+  RelatorioMensal, SessaoCaixa, SnapshotLeitura, Venda, VendasPorHora
+)
+from . import checks
+from .admin import PaginadorEstimado
+from .utils import ao_vivo, arquivo, consistencia, cupons, extrato, formatos, precos, snapshots
+from .utils.devolucoes import cancelar_venda, devolver_itens
+from .utils.estoque import calcular_alertas_estoque
+from .utils.formatos import DadosDia, LinhaProduto
+from .utils.importacao import ImportadorProdutos
+from .utils.mapa_calor import reconstruir_vendas_por_hora
+from .utils.perfil import PerfilRelatorio, fase
+from .utils.relatorios import GeradorRelatorios
+
+
+class ImportacaoTests(TestCase):
+  """O CSV cria ou atualiza pelo código; linhas inválidas não param o lote"""
+
+  def test_upsert_pelo_codigo(self):
+      Produto.objects.create(codigo='A1', nome='Café', preco='12.90', quantidade_estoque=10)
+      csv = ('codigo;nome;preco;estoque\n'
+             'A1;Café 500g;"1.234,56";7\nB2;Açúcar;4,50;3\nC3;Sal;abc;1\nB2;Açúcar 1kg;4,75;5\n')
+
+      resultado = ImportadorProdutos().importar(csv.encode())
+
+      self.assertEqual((resultado['linhas'], resultado['criados'], resultado['atualizados']), (4, 1, 1))
+      self.assertEqual(resultado['erros'], ['Linha 4: preço inválido'])
+      self.assertEqual(
+          set(Produto.objects.values_list('codigo', 'nome', 'preco', 'quantidade_estoque')),
+          {('A1', 'Café 500g', Decimal('1234.56'), 7), ('B2', 'Açúcar 1kg', Decimal('4.75'), 5)}
+      )
+      # Produto novo e preço alterado abrem um intervalo no histórico
+      self.assertEqual(HistoricoPreco.objects.filter(fim__isnull=True).count(), 2)
+
+  def test_somar_estoque(self):
+      Produto.objects.create(codigo='A1', nome='Café', preco='12.90', quantidade_estoque=10)
+      csv = 'codigo,nome,preco,estoque\nA1,Café,12.90,5\nA1,Café,12.90,-3\nB2,Açúcar,4.50,-2\n'
+
+      resultado = ImportadorProdutos(somar_estoque=True).importar(csv.encode())
+
+      self.assertEqual(resultado['erros'], [])
+      # Entradas repetidas somam; a saída nunca deixa o estoque negativo
+      self.assertEqual(dict(Produto.objects.values_list('codigo', 'quantidade_estoque')), {'A1': 12, 'B2': 0})
+      self.assertEqual(HistoricoPreco.objects.filter(produto__codigo='A1').count(), 1)
+
+      with self.assertRaises(ValueError):
+          ImportadorProdutos().importar(b'codigo,nome\nA1,Cafe\n')
+
+  def test_consultas_por_codigo_em_partes_e_erros_limitados(self):
+      Produto.objects.create(codigo='P0', nome='Produto 0', preco='1.00', quantidade_estoque=1)
+      csv = 'codigo,nome,preco,estoque\n' + ''.join(f'P{n},Produto {n},2.00,1\n' for n in range(5)) + 'X,,1,1\n' * 3
+
+      with mock.patch.multiple(ImportadorProdutos, CODIGOS_POR_CONSULTA=2, MAXIMO_ERROS=1):
+          with CaptureQueriesContext(connection) as consultas:
+              resultado = ImportadorProdutos().importar(csv.encode())
+
+      self.assertEqual((resultado['criados'], resultado['atualizados'], resultado['total_erros']), (4, 1, 3))
+      self.assertEqual(resultado['erros'], ['Linha 7: nome inválido'])
+      self.assertEqual(HistoricoPreco.objects.filter(fim__isnull=True).count(), 5)
+      lookups = [c['sql'] for c in consultas if '"codigo" IN' in c['sql']]
+      self.assertTrue(lookups)
+      self.assertTrue(all(sql.count("'P") <= 2 for sql in lookups))
+
+
+class AlertaEstoqueTests(TestCase):
+  """A previsão de ruptura usa a média diária da janela"""
+
+  def test_niveis_e_janela_invalida(self):
+      cafe = Produto.objects.create(nome='Café', preco='12.90', quantidade_estoque=6)
+      pao = Produto.objects.create(nome='Pão', preco='0.50', quantidade_estoque=0)
+      Produto.objects.create(nome='Sal', preco='2.00', quantidade_estoque=1)
+      venda = Venda.objects.create(data_venda=timezone.now() - timedelta(days=1), total='0', finalizada=True)
+      ItemVenda.objects.create(venda=venda, produto=cafe, quantidade=20, preco_unitario=Decimal('12.90'))
+      ItemVenda.objects.create(venda=venda, produto=pao, quantidade=10, preco_unitario=Decimal('0.50'))
+
+      resultado = calcular_alertas_estoque(janela_dias=10, cobertura_dias=10)
+
+      self.assertEqual((resultado['produtos'], resultado['ruptura'], resultado['critico']), (3, 1, 1))
+      alerta = AlertaEstoque.objects.get(produto=cafe)
+      self.assertEqual((alerta.vendas_por_dia, alerta.dias_ate_ruptura, alerta.quantidade_sugerida), (2.0, 3.0, 14))
+
+      with self.assertRaises(ValueError):
+          calcular_alertas_estoque(janela_dias=0)
+      with self.assertRaises(CommandError):
+          call_command('calcular_alertas_estoque', janela=0)
+      for limite in ('-1', '0', '1001', 'abc'):
+          self.assertEqual(self.client.get(f'/alertas-estoque/?limite={limite}').status_code, 400)
+      self.assertEqual(len(self.client.get('/alertas-estoque/?limite=1').json()['alertas']), 1)
+
+
+class CentavosFieldTests(TestCase):
+  """Dinheiro em centavos: arredondamento, ida e volta e validação"""
+
+  def test_para_centavos_arredonda_meio_para_cima(self):
+      self.assertEqual(para_centavos(Decimal('12.345')), 1235)
+      self.assertEqual(para_centavos(Decimal('-12.345')), -1235)
+      self.assertEqual(para_centavos(0.1 + 0.2), 30)
+      self.assertEqual(para_centavos('7'), 700)
+      self.assertEqual(de_centavos(1250), Decimal('12.50'))
+
+  def test_ida_e_volta_e_soma_atomica(self):
+      produto = Produto.objects.create(nome='Café', preco=Decimal('12.905'), quantidade_estoque=1)
+      produto.refresh_from_db()
+      self.assertEqual(produto.preco, Decimal('12.91'))
+      self.assertEqual(Produto.objects.filter(preco__gt='12.90').count(), 1)
+
+      Produto.objects.filter(id=produto.id).update(preco=somar_centavos('preco', Decimal('-0.41')))
+      self.assertEqual(Produto.objects.values_list('preco', flat=True).get(id=produto.id), Decimal('12.50'))
+      with connection.cursor() as cursor:
+          cursor.execute('SELECT preco FROM vendas_produto WHERE id = %s', [produto.id])
+          self.assertEqual(cursor.fetchone()[0], 1250)
+
+  def test_valores_invalidos_sao_validation_error(self):
+      campo = Produto._meta.get_field('preco')
+      self.assertEqual(campo.to_python('3.5'), Decimal('3.50'))
+      for valor in ('abc', 'Infinity', '-inf', 'NaN', Decimal('sNaN')):
+          with self.assertRaises(ValidationError):
+              campo.to_python(valor)
+          with self.assertRaises(ValidationError):
+              Produto.objects.filter(preco=valor).exists()
+
+
+class CentavosMigracaoTests(TransactionTestCase):
+  """A migração 0008 converte reais em centavos e volta sem perder nada"""
+
+  ANTES = [('vendas', '0007_alertaestoque')]
+  DEPOIS = [('vendas', '0008_valores_em_centavos')]
+
+  def tearDown(self):
+      executor = MigrationExecutor(connection)
+      executor.loader.build_graph()
+      executor.migrate(executor.loader.graph.leaf_nodes())
+
+  def _migrar(self, alvo):
+      executor = MigrationExecutor(connection)
+      executor.loader.build_graph()
+      executor.migrate(alvo)
+      return executor.loader.project_state(alvo).apps
+
+  def _colunas(self):
+      with connection.cursor() as cursor:
+          cursor.execute('SELECT preco FROM vendas_produto')
+          precos = [linha[0] for linha in cursor.fetchall()]
+          cursor.execute('SELECT total FROM vendas_venda')
+          totais = [linha[0] for linha in cursor.fetchall()]
+      return precos, totais
+
+  def test_ida_e_volta(self):
+      apps = self._migrar(self.ANTES)
+      produto = apps.get_model('vendas', 'Produto').objects.create(
+          nome='Café', preco=Decimal('12.90'), quantidade_estoque=1
+      )
+      venda = apps.get_model('vendas', 'Venda').objects.create(total=Decimal('1234.56'))
+      apps.get_model('vendas', 'ItemVenda').objects.create(
+          venda_id=venda.id, produto_id=produto.id, quantidade=1, preco_unitario=Decimal('0.01'), subtotal=Decimal('0.01')
+      )
+
+      self._migrar(self.DEPOIS)
+      self.assertEqual(self._colunas(), ([1290], [123456]))
+
+      self._migrar(self.ANTES)
+      precos, totais = self._colunas()
+      self.assertEqual([Decimal(str(preco)) for preco in precos], [Decimal('12.90')])
+      self.assertEqual([Decimal(str(total)) for total in totais], [Decimal('1234.56')])
+
+
+class LojasTests(TestCase):
+  """Vendas de uma loja baixam o estoque dela e entram só nos relatórios dela"""
+
+  def setUp(self):
+      self.centro = Loja.objects.create(codigo='L01', nome='Centro')
+      self.bairro = Loja.objects.create(codigo='L02', nome='Bairro')
+      self.cafe = Produto.objects.create(nome='Café', preco='12.90', quantidade_estoque=100)
+      EstoqueLoja.objects.create(loja=self.centro, produto=self.cafe, quantidade=3)
+
+  def _vender(self, loja, quantidade):
+      dados = {'itens': [{'produto_id': self.cafe.id, 'quantidade': quantidade}], 'loja_id': loja.id}
+      return self.client.post('/finalizar-venda/', json.dumps(dados), content_type='application/json')
+
+  def test_estoque_e_relatorios_por_loja(self):
+      self.assertEqual(self._vender(self.centro, 2).status_code, 200)
+      self.assertEqual(self._vender(self.centro, 2).status_code, 400)
+      self.assertEqual(self._vender(self.bairro, 1).status_code, 200)
+
+      self.assertEqual(EstoqueLoja.objects.get(loja=self.centro).quantidade, 1)
+      self.assertEqual(Produto.objects.get(id=self.cafe.id).quantidade_estoque, 97)
+
+      hoje = timezone.localdate()
+      # Cada loja tem o próprio relatório (o consolidado só é regenerado de hora em hora)
+      totais = dict(
+          RelatorioDiario.objects.filter(data=hoje, loja__isnull=False).values_list('loja__codigo', 'total_vendido')
+      )
+      self.assertEqual(totais, {'L01': Decimal('25.80'), 'L02': Decimal('12.90')})
+
+      resumo = self.client.get(f'/resumo-lojas/?ano={hoje.year}&mes={hoje.month}').json()
+      self.assertEqual([(loja['loja'], loja['total']) for loja in resumo['lojas']], [('Centro', 25.8), ('Bairro', 12.9)])
+      self.assertEqual(resumo['total_geral'], 38.7)
+
+
+class CaixaTests(TestCase):
+  """O turno acumula os totais a cada venda; o fechamento só lê os contadores"""
+
+  def setUp(self):
+      self.cafe = Produto.objects.create(nome='Café', preco='12.90', quantidade_estoque=100)
+      self.client.force_login(User.objects.create_user('Ana'))
+
+  def _abrir(self, **dados):
+      return self.client.post('/abrir-caixa/', json.dumps({'operador': 'Ana', **dados}), content_type='application/json')
+
+  def test_abertura_vendas_e_fechamento(self):
+      sessao_id = self._abrir(valor_abertura='50.00').json()['sessao_id']
+      self.assertEqual(self._abrir().status_code, 400)
+      for quantidade in (2, 1):
+          dados = {'itens': [{'produto_id': self.cafe.id, 'quantidade': quantidade}], 'sessao_id': sessao_id}
+          self.client.post('/finalizar-venda/', json.dumps(dados), content_type='application/json')
+
+      resposta = self.client.post(f'/fechar-caixa/{sessao_id}/', json.dumps({'valor_contado': '88.00'}),
+                                  content_type='application/json').json()
+
+      fechamento = resposta['fechamento']
+      self.assertEqual((fechamento['numero_vendas'], fechamento['total_itens'], fechamento['total_vendido']), (2, 3, 38.7))
+      self.assertEqual((fechamento['valor_esperado'], fechamento['diferenca_caixa']), (88.7, -0.7))
+      self.assertTrue(resposta['conferencia']['conferido'])
+      self.assertEqual(self.client.post(f'/fechar-caixa/{sessao_id}/').status_code, 400)
+      # Fechado, o caixa pode abrir de novo
+      self.assertEqual(self._abrir().status_code, 200)
+
+  def test_devolucao_depois_do_fechamento_nao_muda_o_turno(self):
+      sessao_id = self._abrir().json()['sessao_id']
+      venda_ids = []
+      for quantidade in (2, 1):
+          dados = {'itens': [{'produto_id': self.cafe.id, 'quantidade': quantidade}], 'sessao_id': sessao_id}
+          venda_ids.append(self.client.post('/finalizar-venda/', json.dumps(dados),
+                                            content_type='application/json').json()['venda_id'])
+      fechamento = self.client.post(f'/fechar-caixa/{sessao_id}/', '{}',
+                                    content_type='application/json').json()['fechamento']
+
+      venda = Venda.objects.get(id=venda_ids[0])
+      devolver_itens(venda.id, {venda.itens.get().id: 1})
+      cancelar_venda(venda_ids[1])
+
+      resposta = self.client.get(f'/fechamento-caixa/{sessao_id}/?conferir=1').json()
+      self.assertEqual(resposta['fechamento'], fechamento)
+      self.assertTrue(resposta['conferencia']['conferido'])
+
+  def test_exige_login_e_o_operador_do_turno(self):
+      sessao_id = self._abrir().json()['sessao_id']
+
+      def fechar():
+          return self.client.post(f'/fechar-caixa/{sessao_id}/', '{}', content_type='application/json')
+
+      self.client.force_login(User.objects.create_user('Bia'))
+      self.assertEqual(fechar().status_code, 403)
+      self.assertEqual(self._abrir(operador='', caixa='2').json()['mensagem'], 'Caixa 2 aberto')
+      self.assertEqual(SessaoCaixa.objects.get(caixa='2').operador, 'Bia')
+
+      self.client.logout()
+      self.assertEqual(self._abrir(caixa='3').status_code, 401)
+      self.assertEqual(fechar().status_code, 401)
+      self.client.force_login(User.objects.create_user('gerente', is_staff=True))
+      self.assertEqual(fechar().status_code, 200)
+
+  def test_valores_invalidos(self):
+      for valor in ('abc', 'Infinity', [1], '-50', '1e400'):
+          self.assertEqual(self._abrir(valor_abertura=valor).status_code, 400)
+      self.assertEqual(self._abrir(caixa='x' * 21).status_code, 400)
+      self.assertEqual(self._abrir(operador='x' * 101).status_code, 400)
+      self.assertFalse(SessaoCaixa.objects.exists())
+
+      sessao_id = self._abrir().json()['sessao_id']
+      for valor in ('abc', '-1'):
+          resposta = self.client.post(f'/fechar-caixa/{sessao_id}/', json.dumps({'valor_contado': valor}),
+                                      content_type='application/json')
+          self.assertEqual(resposta.status_code, 400)
+      self.assertTrue(SessaoCaixa.objects.get(id=sessao_id).aberta)
+
+
+class RelatoriosMesTests(TestCase):
+  """buscar_relatorios_mes nos dois formatos e o cache HTTP dos relatórios"""
+
+  def setUp(self):
+      self.cafe = Produto.objects.create(nome='Café', preco='12.90', quantidade_estoque=100, quantidade_vendidos=4)
+      # Dois dias do mês passado, já encerrado
+      self.dia = timezone.localdate().replace(day=1) - timedelta(days=1)
+      self.vendas = []
+      for dia in (self.dia, self.dia.replace(day=1)):
+          venda = Venda.objects.create(data_venda=timezone.make_aware(datetime.combine(dia, time(10))),
+                                       total='25.80', finalizada=True)
+          ItemVenda.objects.create(venda=venda, produto=self.cafe, quantidade=2, preco_unitario=Decimal('12.90'))
+          GeradorRelatorios.gerar_relatorio_diario(dia)
+          self.vendas.append(venda)
+      self.url_mes = f'/buscar-relatorios-mes/?ano={self.dia.year}&mes={self.dia.month}'
+
+  def test_formato_compacto(self):
+      completo = self.client.get(self.url_mes).json()
+      compacto = self.client.get(self.url_mes + '&formato=compacto').json()
+
+      self.assertEqual(compacto['formato'], 'compacto')
+      self.assertEqual(compacto['dias'], len(completo['relatorios_diarios']))
+      self.assertEqual(compacto['totais'], [dia['total'] for dia in completo['relatorios_diarios']])
+      self.assertEqual(compacto['vendas'], [dia['numero_vendas'] for dia in completo['relatorios_diarios']])
+      self.assertEqual(compacto['produtos'], {'1': [['Café', 2, 25.8]], str(self.dia.day): [['Café', 2, 25.8]]})
+      self.assertEqual(compacto['total_mensal'], completo['total_mensal'])
+
+  def test_periodo_fechado_responde_304_antes_da_view(self):
+      url = f'/download-relatorio-diario/{self.dia.year}/{self.dia.month}/{self.dia.day}/?formato=csv'
+      resposta = self.client.get(url)
+      # Devoluções ainda mudam dias fechados: sempre revalida, sem max-age
+      self.assertEqual(resposta['Cache-Control'], 'no-cache, public')
+
+      # Só a consulta da versão: nada é regenerado
+      with self.assertNumQueries(1):
+          self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=resposta['ETag']).status_code, 304)
+      self.assertEqual(self.client.get(url.replace('csv', 'txt'), HTTP_IF_NONE_MATCH=resposta['ETag']).status_code, 200)
+
+      mensal = self.client.get(self.url_mes)
+      self.assertEqual(mensal['Cache-Control'], 'no-cache, public')
+      self.assertEqual(self.client.get(self.url_mes, HTTP_IF_NONE_MATCH=mensal['ETag']).status_code, 304)
+
+      # Uma devolução muda o dia fechado: a revalidação traz a versão nova
+      devolver_itens(self.vendas[0].id, {self.vendas[0].itens.get().id: 1})
+      self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=resposta['ETag']).status_code, 200)
+      self.assertEqual(self.client.get(self.url_mes, HTTP_IF_NONE_MATCH=mensal['ETag']).status_code, 200)
+
+  def test_mes_com_dia_gerado_antes_do_fim_nao_fecha(self):
+      # Diário gerado às 10h do próprio dia: ele (e o mês) ainda podem mudar
+      RelatorioDiario.objects.filter(data=self.dia).update(
+          gerado_em=timezone.make_aware(datetime.combine(self.dia, time(10)))
+      )
+      mensal = self.client.get(self.url_mes)
+      self.assertEqual(mensal['Cache-Control'], 'no-cache')
+
+      url = f'/download-relatorio-mensal/{self.dia.year}/{self.dia.month}/?formato=csv'
+      self.assertEqual(self.client.get(url)['Cache-Control'], 'no-cache')
+
+  def test_dia_aberto_sempre_revalida(self):
+      dados = {'itens': [{'produto_id': self.cafe.id, 'quantidade': 1}]}
+      self.client.post('/finalizar-venda/', json.dumps(dados), content_type='application/json')
+      hoje = timezone.localdate()
+      url = f'/preview-relatorio-diario/{hoje.year}/{hoje.month}/{hoje.day}/'
+
+      resposta = self.client.get(url)
+      self.assertEqual(resposta['Cache-Control'], 'no-cache')
+      self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=resposta['ETag']).status_code, 304)
+
+      # Nova venda: o relatório de hoje só é regenerado de hora em hora
+      RelatorioDiario.objects.filter(data=hoje).update(gerado_em=timezone.now() - timedelta(hours=2))
+      self.client.post('/finalizar-venda/', json.dumps(dados), content_type='application/json')
+      self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=resposta['ETag']).status_code, 200)
+
+
+class RankingTests(TestCase):
+  """Rankings de períodos encerrados ficam em cache até uma devolução"""
+
+  def setUp(self):
+      # O LocMemCache dos testes sobrevive entre um teste e outro
+      cache.clear()
+      self.cafe = Produto.objects.create(nome='Café', preco=Decimal('12.90'), quantidade_estoque=100,
+                                        quantidade_vendidos=2)
+      self.pao = Produto.objects.create(nome='Pão', preco=Decimal('0.50'), quantidade_estoque=100,
+                                       quantidade_vendidos=30)
+      self.dia = timezone.localdate() - timedelta(days=1)
+      self.vendas = []
+      for produto, quantidade in ((self.cafe, 2), (self.pao, 30)):
+          venda = Venda.objects.create(data_venda=timezone.make_aware(datetime.combine(self.dia, time(10))),
+                                       total=produto.preco * quantidade, finalizada=True)
+          ItemVenda.objects.create(venda=venda, produto=produto, quantidade=quantidade, preco_unitario=produto.preco)
+          self.vendas.append(venda)
+      self.url = f'/ranking-produtos/?inicio={self.dia}&fim={self.dia}'
+
+  def test_cache_invalidado_pela_devolucao(self):
+      resposta = self.client.get(self.url).json()
+      self.assertEqual([produto['nome'] for produto in resposta['produtos']], ['Café', 'Pão'])
+      self.assertEqual(resposta['total'], 40.8)
+
+      with self.assertNumQueries(0):
+          self.assertEqual(self.client.get(self.url).json(), resposta)
+
+      cancelar_venda(self.vendas[0].id)
+      resposta = self.client.get(self.url).json()
+      self.assertEqual([produto['nome'] for produto in resposta['produtos']], ['Pão'])
+      self.assertEqual(resposta['total'], 15.0)
+
+
+class MapaCalorTests(TestCase):
+  """O mapa de calor sai dos baldes por hora, reconstruídos das vendas"""
+
+  def test_baldes_e_hora_de_pico(self):
+      cafe = Produto.objects.create(nome='Café', preco='12.90', quantidade_estoque=100)
+      dia = timezone.localdate() - timedelta(days=3)
+      for hora, quantidade in ((9, 1), (18, 2), (18, 3)):
+          venda = Venda.objects.create(data_venda=timezone.make_aware(datetime.combine(dia, time(hora, 30))),
+                                       total=Decimal('12.90') * quantidade, finalizada=True)
+          ItemVenda.objects.create(venda=venda, produto=cafe, quantidade=quantidade, preco_unitario=Decimal('12.90'))
+
+      self.assertEqual(reconstruir_vendas_por_hora(), 2)
+      self.assertEqual(VendasPorHora.objects.get(hora=18).total_itens, 5)
+
+      resposta = self.client.get(f'/mapa-calor-vendas/?inicio={dia}&fim={dia}').json()
+      self.assertEqual(resposta['hora_pico'], 18)
+      self.assertEqual(resposta['vendas'][dia.weekday()][18], 2)
+      self.assertEqual(resposta['totais'][dia.weekday()][9], 12.9)
+      self.assertEqual(sum(resposta['por_hora']['vendas']), 3)
+
+  def test_datas_nos_extremos(self):
+      # Sem inicio, o padrão (364 dias antes do fim) sairia do calendário
+      self.assertEqual(self.client.get('/mapa-calor-vendas/?fim=0001-01-01').status_code, 400)
+      self.assertEqual(self.client.get('/mapa-calor-vendas/?inicio=9999-12-31&fim=9999-12-31').status_code, 200)
+
+
+class DevolucaoTests(TestCase):
+  """Cancelamentos e devoluções corrigem os rollups por deltas; o resultado
+  tem que ser igual ao de recalcular tudo do zero"""
+
+  def setUp(self):
+      self.loja = Loja.objects.create(codigo='L01', nome='Loja 1')
+      self.parafuso = Produto.objects.create(nome='Parafuso', preco='0.15', quantidade_estoque=100)
+      self.porca = Produto.objects.create(nome='Porca', preco='0.20', quantidade_estoque=100)
+      EstoqueLoja.objects.create(loja=self.loja, produto=self.parafuso, quantidade=50)
+      self.sessao = SessaoCaixa.objects.create(loja=self.loja, operador='Ana')
+      self.hoje = timezone.localdate()
+
+      self.venda_a = self._vender({self.parafuso: 10, self.porca: 4})
+      self.venda_b = self._vender({self.parafuso: 3})
+      self.venda_c = self._vender({self.porca: 7}, sessao=False)
+      # O relatório de hoje só é regenerado de hora em hora; parte de um
+      # estado completo para comparar só o efeito das devoluções
+      self._recalcular()
+
+  def _vender(self, itens, sessao=True):
+      dados = {'itens': [{'produto_id': produto.id, 'quantidade': q} for produto, q in itens.items()]}
+      if sessao:
+          dados['sessao_id'] = self.sessao.id
+      resposta = self.client.post('/finalizar-venda/', json.dumps(dados), content_type='application/json')
+      self.assertEqual(resposta.status_code, 200, resposta.content)
+      return Venda.objects.get(id=resposta.json()['venda_id'])
+
+  def _item(self, venda, produto):
+      return venda.itens.get(produto=produto)
+
+  def _rollups(self):
+      """Estado de todos os agregados mantidos incrementalmente"""
+      diarios = {
+          relatorio.loja_id: (relatorio.total_vendido, relatorio.total_itens, relatorio.numero_vendas,
+                              relatorio.resumo_produtos, set(relatorio.vendas_do_dia.values_list('id', flat=True)))
+          for relatorio in RelatorioDiario.objects.filter(data=self.hoje)
+      }
+      mensais = dict(
+          RelatorioMensal.objects.filter(ano=self.hoje.year, mes=self.hoje.month)
+          .values_list('loja_id', 'total_mensal')
+      )
+      por_hora = set(VendasPorHora.objects.values_list('loja_id', 'data', 'hora', 'numero_vendas', 'total_itens', 'total'))
+      return diarios, mensais, por_hora
+
+  def _recalcular(self):
+      """Os mesmos agregados recalculados do zero a partir das vendas"""
+      RelatorioDiario.objects.all().delete()
+      RelatorioMensal.objects.all().delete()
+      for loja in (None, self.loja):
+          GeradorRelatorios.gerar_relatorio_diario(self.hoje, loja)
+          GeradorRelatorios.gerar_relatorio_mensal(self.hoje.year, self.hoje.month, loja)
+      reconstruir_vendas_por_hora()
+      return self._rollups()
+
+  def _assert_rollups_iguais_ao_recalculo(self):
+      incremental = self._rollups()
+      self.assertEqual(incremental, self._recalcular())
+
+      for produto in Produto.objects.all():
+          vendidos = sum(
+              ItemVenda.objects.filter(produto=produto, venda__finalizada=True).values_list('quantidade', flat=True)
+          )
+          self.assertEqual(produto.quantidade_vendidos, vendidos)
+          self.assertEqual(produto.quantidade_estoque + vendidos, 100)
+
+      self.sessao.refresh_from_db()
+      self.assertTrue(self.sessao.reconciliar()['conferido'])
+
+  def test_cancelamento(self):
+      cancelar_venda(self.venda_a.id, motivo='Cliente desistiu')
+
+      self.venda_a.refresh_from_db()
+      self.assertTrue(self.venda_a.cancelada)
+      self.assertFalse(self.venda_a.finalizada)
+      self.assertEqual(Devolucao.objects.filter(venda=self.venda_a, cancelamento=True).count(), 2)
+      self.assertEqual(EstoqueLoja.objects.get(produto=self.parafuso).quantidade, 47)
+      self._assert_rollups_iguais_ao_recalculo()
+
+  def test_devolucao_parcial(self):
+      devolver_itens(self.venda_a.id, {self._item(self.venda_a, self.parafuso).id: 4})
+
+      self.venda_a.refresh_from_db()
+      self.assertTrue(self.venda_a.finalizada)
+      self.assertEqual(self.venda_a.total, Decimal('1.70'))
+      self.assertEqual(self._item(self.venda_a, self.parafuso).subtotal, Decimal('0.90'))
+      self._assert_rollups_iguais_ao_recalculo()
+
+  def test_devolucao_do_produto_inteiro_some_do_resumo(self):
+      devolver_itens(self.venda_c.id, {self._item(self.venda_c, self.porca).id: 3})
+      devolver_itens(self.venda_a.id, {self._item(self.venda_a, self.porca).id: 4})
+
+      resumo = RelatorioDiario.objects.get(data=self.hoje, loja=self.loja).resumo_produtos
+      self.assertNotIn('Porca', resumo)
+      self._assert_rollups_iguais_ao_recalculo()
+
+  def test_devolver_tudo_cancela_a_venda(self):
+      devolver_itens(self.venda_b.id, {self._item(self.venda_b, self.parafuso).id: 1})
+      resultado = devolver_itens(self.venda_b.id, {self._item(self.venda_b, self.parafuso).id: 2})
+
+      self.assertTrue(resultado['cancelada'])
+      self.venda_b.refresh_from_db()
+      self.assertTrue(self.venda_b.cancelada)
+      self._assert_rollups_iguais_ao_recalculo()
+
+  def test_devolucao_invalida_e_cancelamento_repetido(self):
+      antes = self._rollups()
+      item = self._item(self.venda_b, self.parafuso)
+
+      with self.assertRaises(ValueError):
+          devolver_itens(self.venda_b.id, {item.id: 4})
+      with self.assertRaises(ValueError):
+          devolver_itens(self.venda_b.id, {self._item(self.venda_a, self.porca).id: 1})
+
+      cancelar_venda(self.venda_b.id)
+      with self.assertRaises(ValueError):
+          cancelar_venda(self.venda_b.id)
+
+      self.assertNotEqual(antes, self._rollups())
+      self._assert_rollups_iguais_ao_recalculo()
+
+  def test_venda_posterior_ao_relatorio_nao_e_descontada(self):
+      # Relatório gerado antes da venda d; a devolução da venda a grava o
+      # relatório de novo, mas d continua fora dos totais
+      venda_d = self._vender({self.parafuso: 2})
+      devolver_itens(self.venda_a.id, {self._item(self.venda_a, self.porca).id: 1})
+      antes = RelatorioDiario.objects.get(data=self.hoje, loja=None).total_vendido
+
+      cancelar_venda(venda_d.id)
+
+      self.assertEqual(RelatorioDiario.objects.get(data=self.hoje, loja=None).total_vendido, antes)
+      self._assert_rollups_iguais_ao_recalculo()
+
+  def test_endpoints_exigem_staff(self):
+      url = f'/cancelar-venda/{self.venda_a.id}/'
+      self.assertEqual(self.client.post(url).status_code, 302)
+
+      User.objects.create_user('admin', password='x', is_staff=True)
+      self.client.login(username='admin', password='x')
+      item = self._item(self.venda_a, self.porca)
+      resposta = self.client.post(
+          f'/devolver-itens/{self.venda_a.id}/',
+          json.dumps({'itens': [{'item_id': item.id, 'quantidade': 1}]}),
+          content_type='application/json'
+      )
+      self.assertEqual(resposta.json()['valor_devolvido'], 0.2)
+
+      resposta = self.client.post(url, json.dumps({'motivo': 'Teste'}), content_type='application/json')
+      self.assertTrue(resposta.json()['cancelada'])
+      self.assertEqual(self.client.post(url).status_code, 400)
+      self._assert_rollups_iguais_ao_recalculo()
+
+
+  def test_venda_confirmada_depois_da_geracao_nao_e_descontada(self):
+      # Venda criada antes do relatório, mas confirmada por outro worker
+      # depois que ele foi gerado: created_at anterior, fora dos totais
+      relatorio = RelatorioDiario.objects.get(data=self.hoje, loja=self.loja)
+      atrasada = Venda.objects.create(loja=self.loja, total='0.15', finalizada=True,
+                                      created_at=relatorio.gerado_em - timedelta(minutes=1))
+      ItemVenda.objects.create(venda=atrasada, produto=self.parafuso, quantidade=1, preco_unitario=Decimal('0.15'))
+      self.assertTrue(relatorio.contem_venda(self.venda_a))
+      self.assertFalse(relatorio.contem_venda(atrasada))
+
+      def totais():
+          diarios, mensais, _ = self._rollups()
+          return {loja_id: dados[:4] for loja_id, dados in diarios.items()}, mensais
+
+      antes = totais()
+      cancelar_venda(atrasada.id)
+      self.assertEqual(totais(), antes)
+
+  def test_admin_nao_altera_itens(self):
+      User.objects.create_superuser('admin', password='x')
+      self.client.login(username='admin', password='x')
+      item = self._item(self.venda_a, self.parafuso)
+      url = f'/admin/vendas/itemvenda/{item.id}/'
+
+      self.assertEqual(self.client.get(url + 'change/').status_code, 200)
+      self.assertEqual(self.client.post(url + 'change/', {'quantidade': 1}).status_code, 403)
+      self.assertEqual(self.client.post(url + 'delete/', {'post': 'yes'}).status_code, 403)
+      pagina = self.client.get(f'/admin/vendas/venda/{self.venda_a.id}/change/').content.decode()
+      self.assertNotIn('itens-0-DELETE', pagina)
+      self.assertNotIn('name="itens-0-quantidade"', pagina)
+
+      self.assertEqual(self._item(self.venda_a, self.parafuso).quantidade, 10)
+      self._assert_rollups_iguais_ao_recalculo()
+
+
+class PdfTests(TestCase):
+  """A tabela do relatório diário sai em blocos que cabem cada um numa página"""
+
+  def test_blocos_do_tamanho_da_pagina(self):
+      from reportlab.platypus import LongTable, Table
+      from .utils import pdf
+
+      linhas = [LinhaProduto(quantidade=1, nome=f'Produto {numero}', total=Decimal('1.50')) for numero in range(300)]
+      dados = DadosDia(data=timezone.localdate(), loja='', produtos=tuple(linhas), total=Decimal('450.00'),
+                       numero_vendas=300, total_itens=300)
+
+      blocos = []
+      pagina = {}
+      original = pdf.tabela_em_blocos
+
+      def tabela_em_blocos(doc, content, cabecalho, linhas):
+          blocos.extend(original(doc, content, cabecalho, linhas))
+          # Altura útil do Frame (6pt de padding em cima e embaixo) abaixo do título
+          pagina['livre'] = doc.height - 12 - pdf._altura_ocupada(doc, content)
+          pagina['largura'] = doc.width
+          return blocos
+
+      partes = []
+
+      def split(tabela, largura, altura):
+          resultado = Table.split(tabela, largura, altura)
+          partes.extend(resultado)
+          return resultado
+
+      with mock.patch.object(pdf, 'tabela_em_blocos', tabela_em_blocos), \
+           mock.patch.object(LongTable, 'split', split):
+          conteudo = pdf.desenhar_diario(dados).getvalue()
+
+      # O ReportLab só tenta encaixar um bloco no rodapé que sobrou da página
+      # anterior (e desiste); nenhum bloco é quebrado
+      self.assertEqual(partes, [])
+      self.assertTrue(conteudo.startswith(b'%PDF'))
+      self.assertGreater(len(blocos), 2)
+
+      # Todas as linhas, na ordem, com o cabeçalho no topo de cada bloco
+      self.assertEqual([linha for bloco in blocos for linha in bloco._cellvalues[1:]],
+                       [[f'{linha.quantidade:02d}', linha.nome, f'R$ {linha.total:.2f}'] for linha in linhas])
+      self.assertTrue(all(bloco._cellvalues[0] == ['Qtd', 'Produto', 'Total'] for bloco in blocos))
+
+      # O primeiro bloco ocupa o que sobra da primeira página; os outros, uma página
+      altura = lambda bloco: bloco.wrap(pagina['largura'], 0)[1]
+      self.assertLessEqual(altura(blocos[0]), pagina['livre'])
+      self.assertGreater(altura(blocos[0]) + pdf.ALTURA_LINHA, pagina['livre'])
+      por_pagina = len(blocos[1]._cellvalues)
+      self.assertTrue(all(len(bloco._cellvalues) == por_pagina for bloco in blocos[1:-1]))
+
+
+class PerfilTests(TestCase):
+  """?perfil= devolve o tempo e as consultas de cada fase, só para staff"""
+
+  def setUp(self):
+      cafe = Produto.objects.create(nome='Café', preco='12.90', quantidade_estoque=100, quantidade_vendidos=2)
+      self.dia = timezone.localdate() - timedelta(days=1)
+      venda = Venda.objects.create(data_venda=timezone.make_aware(datetime.combine(self.dia, time(10))),
+                                   total='25.80', finalizada=True)
+      ItemVenda.objects.create(venda=venda, produto=cafe, quantidade=2, preco_unitario=Decimal('12.90'))
+      self.url = f'/preview-relatorio-diario/{self.dia.year}/{self.dia.month}/{self.dia.day}/'
+
+  def test_fases_e_pilhas(self):
+      # Fora de um perfil a fase não faz nada
+      with fase('consulta'):
+          Produto.objects.count()
+
+      with PerfilRelatorio() as perfil:
+          with fase('consulta'):
+              Produto.objects.count()
+              with fase('layout'):
+                  sum(range(200000))
+
+      fases = perfil.resumo()['fases']
+      self.assertEqual(fases['consulta']['consultas'], 1)
+      self.assertEqual(fases['layout']['consultas'], 0)
+      self.assertGreater(fases['layout']['ms'], 0)
+      # Cada pilha amostrada começa pela fase em que estava
+      for linha in perfil.colapsado().splitlines():
+          self.assertIn(linha.split(';', 1)[0], ('consulta', 'layout', 'outros'))
+          self.assertTrue(linha.rsplit(' ', 1)[1].isdigit())
+      self.assertIn('function calls', perfil.estatisticas())
+
+  def test_perfil_so_para_staff(self):
+      self.client.force_login(User.objects.create_user('caixa'))
+      resposta = self.client.get(self.url + '?perfil=1').json()
+      self.assertTrue(resposta['sucesso'])
+      self.assertNotIn('fases', resposta)
+
+      self.client.force_login(User.objects.create_user('gerente', is_staff=True))
+      resposta = self.client.get(self.url + '?perfil=1').json()
+      self.assertEqual(resposta['status'], 200)
+      self.assertLessEqual({'consulta', 'serializacao'}, set(resposta['fases']))
+      self.assertGreater(resposta['fases']['consulta']['consultas'], 0)
+      self.assertEqual(self.client.get(self.url + '?perfil=colapsado')['Content-Type'], 'text/plain; charset=utf-8')
+
+
+class ComparativoTests(TestCase):
+  """Comparativos de dias encerrados ficam em cache até uma devolução"""
+
+  def setUp(self):
+      cache.clear()
+      cafe = Produto.objects.create(nome='Café', preco='12.90', quantidade_estoque=100, quantidade_vendidos=3)
+      self.ontem = timezone.localdate() - timedelta(days=1)
+      self.vendas = []
+      for dia, quantidade in ((self.ontem, 2), (self.ontem - timedelta(days=1), 1)):
+          venda = Venda.objects.create(data_venda=timezone.make_aware(datetime.combine(dia, time(10))),
+                                       total=Decimal('12.90') * quantidade, finalizada=True)
+          ItemVenda.objects.create(venda=venda, produto=cafe, quantidade=quantidade, preco_unitario=Decimal('12.90'))
+          self.vendas.append(venda)
+      reconstruir_vendas_por_hora()
+      self.url = f'/comparativo-vendas/?tipo=dia&data={self.ontem}'
+
+  def test_cache_invalidado_pela_devolucao(self):
+      resposta = self.client.get(self.url).json()
+      self.assertEqual(resposta['atual']['total'], 25.8)
+      self.assertEqual(resposta['comparacoes']['dia_anterior']['variacao_pct'], 100.0)
+      with self.assertNumQueries(0):
+          self.assertEqual(self.client.get(self.url).json(), resposta)
+
+      devolver_itens(self.vendas[0].id, {self.vendas[0].itens.get().id: 1})
+      resposta = self.client.get(self.url).json()
+      self.assertEqual(resposta['atual']['total'], 12.9)
+      self.assertEqual(resposta['comparacoes']['dia_anterior']['diferenca'], 0)
+
+  def test_datas_nos_extremos_sao_recusadas(self):
+      for parametros in ('tipo=dia&data=0001-01-01', 'tipo=janela&fim=0001-01-05',
+                         'tipo=mes&ano=1&mes=1', 'tipo=serie&ano=1&mes=6'):
+          self.assertEqual(self.client.get(f'/comparativo-vendas/?{parametros}').status_code, 400, parametros)
+
+
+class AdminTests(TestCase):
+  """O admin não edita o que os rollups mantêm em sincronia"""
+
+  def setUp(self):
+      self.admin = User.objects.create_superuser('admin', password='x')
+      self.client.force_login(self.admin)
+      cafe = Produto.objects.create(nome='Café', preco='12.90', quantidade_estoque=100, quantidade_vendidos=1)
+      self.sessao = SessaoCaixa.objects.create(operador='Ana')
+      self.venda = Venda.objects.create(total='12.90', finalizada=True, sessao=self.sessao)
+      ItemVenda.objects.create(venda=self.venda, produto=cafe, quantidade=1, preco_unitario=Decimal('12.90'))
+      self.sessao.registrar_venda(self.venda.total, 1)
+      GeradorRelatorios.processar_vendas_do_dia(timezone.localdate())
+
+  def test_campos_sincronizados_sao_somente_leitura(self):
+      request = RequestFactory().get('/')
+      request.user = self.admin
+      editaveis = {
+          modelo: set(admin.site._registry[modelo].get_form(request, modelo.objects.first()).base_fields)
+          for modelo in (Venda, SessaoCaixa, RelatorioDiario)
+      }
+      self.assertEqual(editaveis[Venda], set())
+      self.assertEqual(editaveis[SessaoCaixa], {'loja', 'caixa', 'operador', 'aberta_em', 'valor_abertura',
+                                                'valor_contado'})
+      self.assertEqual(editaveis[RelatorioDiario], set())
+
+      url = f'/admin/vendas/venda/{self.venda.id}/change/'
+      self.client.post(url, {'cancelada': 'on', 'itens_arquivados': 'on', 'total': '0',
+                             'itens-TOTAL_FORMS': 1, 'itens-INITIAL_FORMS': 1})
+      self.venda.refresh_from_db()
+      self.assertEqual((self.venda.finalizada, self.venda.cancelada, self.venda.itens_arquivados, self.venda.total),
+                       (True, False, False, Decimal('12.90')))
+      self.assertEqual(self.client.get('/admin/vendas/venda/add/').status_code, 403)
+      self.sessao.refresh_from_db()
+      self.assertTrue(self.sessao.reconciliar()['conferido'])
+
+  def test_totais_sem_filtro_nao_somam_a_tabela(self):
+      url = '/admin/vendas/venda/'
+      self.assertEqual(self.client.get(url).context['totais_lista'], [('Total', Decimal('12.90'))])
+
+      with mock.patch.object(PaginadorEstimado, 'LIMITE_EXATO', 1):
+          with CaptureQueriesContext(connection) as consultas:
+              resposta = self.client.get(url)
+          self.assertNotIn('totais_lista', resposta.context)
+          self.assertContains(resposta, 'Filtre a lista para ver os totais')
+          self.assertFalse([c for c in consultas if 'SUM(' in c['sql'] or 'COUNT(' in c['sql']])
+          # Com filtro, a soma é só das linhas filtradas
+          resposta = self.client.get(url + '?finalizada__exact=1')
+          self.assertEqual(resposta.context['totais_lista'], [('Total', Decimal('12.90'))])
+
+
+class RelatoriosMigracaoTests(TransactionTestCase):
+  """Depois da 0013 os membros dos relatórios saem dos intervalos de datas"""
+
+  ANTES = [('vendas', '0012_devolucoes')]
+
+  def tearDown(self):
+      executor = MigrationExecutor(connection)
+      executor.loader.build_graph()
+      executor.migrate(executor.loader.graph.leaf_nodes())
+
+  def _migrar(self, alvo):
+      executor = MigrationExecutor(connection)
+      executor.loader.build_graph()
+      executor.migrate(alvo)
+      return executor.loader.project_state(alvo).apps
+
+  def test_membros_pelo_intervalo(self):
+      apps = self._migrar(self.ANTES)
+      Loja = apps.get_model('vendas', 'Loja')
+      Venda = apps.get_model('vendas', 'Venda')
+      Diario = apps.get_model('vendas', 'RelatorioDiario')
+      loja, outra = Loja.objects.create(codigo='L01', nome='Loja 1'), Loja.objects.create(codigo='L02', nome='Loja 2')
+      dia = datetime(2025, 8, 10).date()
+      hora = lambda data, h: timezone.make_aware(datetime.combine(data, time(h)))
+      gerado_em = hora(dia, 20)
+
+      def venda(data=dia, **campos):
+          campos.setdefault('loja_id', loja.id)
+          campos.setdefault('finalizada', True)
+          campos.setdefault('created_at', hora(data, 10))
+          return Venda.objects.create(data_venda=hora(data, 10), total=100, **campos).id
+
+      somada = venda()
+      venda(finalizada=False)
+      venda(loja_id=outra.id)
+      venda(data=dia + timedelta(days=1))
+      # Criada depois da última gravação do relatório: do dia, mas fora dos totais
+      atrasada = venda(created_at=gerado_em + timedelta(minutes=1))
+
+      diarios = {}
+      for chave, loja_id, data in (('dia', loja.id, dia), ('outra', outra.id, dia),
+                                    ('setembro', loja.id, dia + timedelta(days=31))):
+          diarios[chave] = Diario.objects.create(loja_id=loja_id, data=data).id
+      Diario.objects.filter(id=diarios['dia']).update(gerado_em=gerado_em)
+      Diario.objects.get(id=diarios['dia']).vendas_do_dia.set([somada])
+      mensal = apps.get_model('vendas', 'RelatorioMensal').objects.create(loja_id=loja.id, ano=2025, mes=8)
+      mensal.relatorios_diarios.set([diarios['dia']])
+
+      self._migrar(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+      relatorio = RelatorioDiario.objects.get(id=diarios['dia'])
+      self.assertEqual(set(relatorio.vendas_do_dia.values_list('id', flat=True)), {somada, atrasada})
+      self.assertEqual(relatorio.vendas_ate_id, somada)
+      self.assertTrue(relatorio.contem_venda(Venda.objects.get(id=somada)))
+      self.assertFalse(relatorio.contem_venda(Venda.objects.get(id=atrasada)))
+
+      mensal = RelatorioMensal.objects.get(id=mensal.id)
+      self.assertEqual(list(mensal.relatorios_diarios.values_list('id', flat=True)), [diarios['dia']])
+      consolidado = RelatorioMensal.objects.create(ano=2025, mes=8)
+      self.assertFalse(consolidado.relatorios_diarios.exists())
+
+
+class AoVivoTests(TestCase):
+  """Cada venda confirmada grava uma versão nova do painel no cache"""
+
+  def setUp(self):
+      cache.clear()
+      self.loja = Loja.objects.create(codigo='L01', nome='Loja 1')
+      self.outra = Loja.objects.create(codigo='L02', nome='Loja 2')
+      self.cafe = Produto.objects.create(nome='Café', preco='12.90', quantidade_estoque=100)
+
+  def test_venda_publica_versao_nova(self):
+      antes = {loja_id: ao_vivo.versao(loja_id) for loja_id in (None, self.loja.id, self.outra.id)}
+      dados = {'itens': [{'produto_id': self.cafe.id, 'quantidade': 2}], 'loja_id': self.loja.id}
+      with self.captureOnCommitCallbacks(execute=True):
+          self.client.post('/finalizar-venda/', json.dumps(dados), content_type='application/json')
+
+      self.assertNotEqual(ao_vivo.versao(None), antes[None])
+      self.assertNotEqual(ao_vivo.versao(self.loja.id), antes[self.loja.id])
+      self.assertEqual(ao_vivo.versao(self.outra.id), antes[self.outra.id])
+
+      evento = ao_vivo.transmissor.payload(self.loja.id, ao_vivo.versao(self.loja.id)).decode()
+      self.assertIn('event: estatisticas', evento)
+      self.assertEqual(json.loads(evento.split('data: ')[1])['hoje'], {'total': 25.8, 'vendas': 1, 'itens': 2})
+
+  def test_producao_exige_cache_compartilhado(self):
+      locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+      with self.settings(PRODUCAO=True, CACHES=locmem):
+          self.assertEqual([erro.id for erro in checks.cache_compartilhado(None)], ['vendas.E001'])
+      with self.settings(PRODUCAO=False, CACHES=locmem):
+          self.assertEqual(checks.cache_compartilhado(None), [])
+
+
+class SnapshotTests(TestCase):
+  """A página de relatórios lê snapshots gravados na geração dos relatórios"""
+
+  def setUp(self):
+      self.cafe = Produto.objects.create(nome='Café', preco='12.90', quantidade_estoque=100, quantidade_vendidos=3)
+      # Um dia do mês passado e um do retrasado, já encerrados
+      self.dia = (timezone.localdate().replace(day=1) - timedelta(days=1)).replace(day=10)
+      self.outro_dia = (self.dia.replace(day=1) - timedelta(days=1)).replace(day=10)
+      for dia in (self.dia, self.outro_dia):
+          self._vender(dia)
+          GeradorRelatorios.gerar_relatorio_diario(dia)
+
+  def _vender(self, dia):
+      venda = Venda.objects.create(data_venda=timezone.make_aware(datetime.combine(dia, time(10))),
+                                   total='12.90', finalizada=True)
+      ItemVenda.objects.create(venda=venda, produto=self.cafe, quantidade=1, preco_unitario=Decimal('12.90'))
+
+  def _sem_consultar_vendas(self, consultas):
+      self.assertFalse([consulta['sql'] for consulta in consultas if 'vendas_venda' in consulta['sql']])
+
+  def test_gravado_na_geracao_e_descartado_quando_o_dia_muda(self):
+      for dia in (self.dia, self.outro_dia):
+          GeradorRelatorios.gerar_relatorio_mensal(dia.year, dia.month)
+      chaves = [snapshots.chave_mes(self.dia.year, self.dia.month, formato=formato) for formato in snapshots.FORMATOS]
+      outro_mes = snapshots.chave_mes(self.outro_dia.year, self.outro_dia.month)
+      self.assertTrue(all(SnapshotLeitura.ler(chave) for chave in chaves))
+
+      url = f'/buscar-relatorios-mes/?ano={self.dia.year}&mes={self.dia.month}'
+      with CaptureQueriesContext(connection) as consultas:
+          resposta = self.client.get(url)
+      self._sem_consultar_vendas(consultas)
+      self.assertEqual(resposta.content, SnapshotLeitura.ler(chaves[0]))
+      self.assertEqual(resposta.json()['total_mensal'], 12.9)
+
+      # Uma venda atrasada regenera o diário: as respostas daquele mês saem
+      self._vender(self.dia)
+      RelatorioDiario.objects.filter(data=self.dia).update(
+          gerado_em=timezone.make_aware(datetime.combine(self.dia, time(10)))
+      )
+      GeradorRelatorios.gerar_relatorio_diario(self.dia)
+      self.assertEqual([SnapshotLeitura.ler(chave) for chave in chaves], [None, None])
+      self.assertIsNotNone(SnapshotLeitura.ler(outro_mes))
+
+      # A próxima leitura gera e grava de novo
+      self.assertEqual(self.client.get(url).json()['total_mensal'], 25.8)
+      self.assertIsNotNone(SnapshotLeitura.ler(chaves[0]))
+
+  def test_periodos_sem_consultar_vendas(self):
+      meses = {}
+      for dia in (self.dia, self.outro_dia):
+          meses.setdefault(str(dia.year), []).append(dia.month)
+      with CaptureQueriesContext(connection) as consultas:
+          periodos = snapshots.periodos()
+      self._sem_consultar_vendas(consultas)
+      self.assertEqual(periodos['meses'], {ano: sorted(lista) for ano, lista in meses.items()})
+
+      # Um mês novo com vendas entra no snapshot quando seu diário é gerado
+      novo = (self.outro_dia.replace(day=1) - timedelta(days=1)).replace(day=10)
+      self._vender(novo)
+      GeradorRelatorios.gerar_relatorio_diario(novo)
+      with CaptureQueriesContext(connection) as consultas:
+          periodos = self.client.get('/periodos-disponiveis/').json()
+      self._sem_consultar_vendas(consultas)
+      self.assertIn(novo.month, periodos['meses'][str(novo.year)])
+      self.assertIn(novo.year, periodos['anos'])
+
+
+class ArquivoTests(TestCase):
+  """Itens arquivados continuam legíveis e a venda não pode mais ser devolvida"""
+
+  def setUp(self):
+      pasta = tempfile.mkdtemp()
+      self.addCleanup(shutil.rmtree, pasta)
+      self.enterContext(self.settings(ARQUIVO_ITENS_PATH=Path(pasta) / 'arquivo.sqlite3'))
+
+      self.cafe = Produto.objects.create(nome='Café', preco='12.90', quantidade_estoque=100, quantidade_vendidos=3)
+      self.dia = (timezone.localdate().replace(day=1) - timedelta(days=1)).replace(day=10)
+      self.vendas = []
+      for hora, quantidade in ((9, 2), (15, 1)):
+          venda = Venda.objects.create(data_venda=timezone.make_aware(datetime.combine(self.dia, time(hora))),
+                                       total=Decimal('12.90') * quantidade, finalizada=True)
+          ItemVenda.objects.create(venda=venda, produto=self.cafe, quantidade=quantidade, preco_unitario=Decimal('12.90'))
+          self.vendas.append(venda)
+      reconstruir_vendas_por_hora()
+      self.assertEqual(arquivo.arquivar_mes(self.dia.year, self.dia.month), 2)
+
+  def test_ida_e_volta(self):
+      self.assertFalse(ItemVenda.objects.exists())
+      venda = Venda.objects.get(id=self.vendas[0].id)
+      self.assertTrue(venda.itens_arquivados)
+      itens = arquivo.itens_da_venda(venda)
+      self.assertEqual([(item.produto_nome, item.quantidade, item.preco_unitario, item.subtotal) for item in itens],
+                       [('Café', 2, Decimal('12.90'), Decimal('25.80'))])
+      self.assertEqual(arquivo.por_produto(self.dia, self.dia), {self.cafe.id: ('Café', 3, 3870)})
+      self.assertEqual(arquivo.quantidades_por_hora(), {(None, self.dia, 9): 2, (None, self.dia, 15): 1})
+      # Os relatórios do mês foram completados antes de os itens saírem
+      self.assertEqual(RelatorioDiario.objects.get(data=self.dia, loja=None).total_vendido, Decimal('38.70'))
+      self.assertEqual(consistencia.verificar(self.dia, self.dia, produtos=False)[0], [])
+
+  def test_devolucao_de_venda_arquivada_e_recusada(self):
+      antes = (RelatorioDiario.objects.get(data=self.dia, loja=None).numero_vendas,
+               list(VendasPorHora.objects.values_list('numero_vendas', flat=True).order_by('hora')))
+
+      with self.assertRaises(ValueError):
+          cancelar_venda(self.vendas[0].id)
+      with self.assertRaises(ValueError):
+          devolver_itens(self.vendas[0].id, {1: 1})
+
+      self.assertTrue(Venda.objects.get(id=self.vendas[0].id).finalizada)
+      self.assertEqual(antes, (RelatorioDiario.objects.get(data=self.dia, loja=None).numero_vendas,
+                               list(VendasPorHora.objects.values_list('numero_vendas', flat=True).order_by('hora'))))
+
+  def test_venda_arquivada_cancelada_sai_das_leituras(self):
+      # Venda cancelada antes de o cancelamento de arquivadas ser recusado
+      Venda.objects.filter(id=self.vendas[1].id).update(finalizada=False, cancelada=True)
+
+      self.assertEqual(arquivo.por_produto(self.dia, self.dia), {self.cafe.id: ('Café', 2, 2580)})
+      self.assertEqual(arquivo.quantidades_por_hora(), {(None, self.dia, 9): 2})
+      self.assertEqual(arquivo.por_dia_e_produto(self.dia, self.dia), [(None, self.dia, 'Café', 2, 2580)])
+
+
+class ImportacaoPreguicosaTests(TestCase):
+  """Carregar as URLs (views, admin) não carrega o ReportLab"""
+
+  def test_views_sem_reportlab(self):
+      # Processo novo: neste aqui outros testes já geraram PDFs
+      codigo = (
+          'import sys, django; django.setup(); import registro_vendas.urls, vendas.views; '
+          'print(sorted(nome for nome in sys.modules if nome.startswith("reportlab")))'
+      )
+      saida = subprocess.run([sys.executable, '-c', codigo], cwd=settings.BASE_DIR,
+                             capture_output=True, text=True, check=True).stdout
+      self.assertEqual(saida.strip(), '[]')
+
+
+class CupomTests(TestCase):
+  """O cupom devolvido por finalizar_venda e a reimpressão saem iguais"""
+
+  def setUp(self):
+      self.loja = Loja.objects.create(codigo='L01', nome='Loja 1')
+      self.cafe = Produto.objects.create(nome='Café', preco='12.90', quantidade_estoque=100)
+
+  def _vender(self, quantidade):
+      dados = {'itens': [{'produto_id': self.cafe.id, 'quantidade': quantidade}], 'loja_id': self.loja.id}
+      resposta = self.client.post('/finalizar-venda/', json.dumps(dados), content_type='application/json')
+      return resposta.json()
+
+  def test_cupom_e_reimpressao(self):
+      primeira = self._vender(2)
+      segunda = self._vender(1)
+      self.assertIn('02 Café', primeira['cupom'])
+      self.assertIn('R$ 25.80', primeira['cupom'])
+
+      reimpresso = self.client.get(f'/cupom/{primeira["venda_id"]}/').content.decode()
+      self.assertEqual(reimpresso.replace(f'{"2ª via":^40}\n', ''), primeira['cupom'] + '\n')
+
+      devolver_itens(primeira['venda_id'], {ItemVenda.objects.get(venda_id=primeira['venda_id']).id: 1})
+      cancelar_venda(segunda['venda_id'])
+      lote = self.client.get('/reimprimir-cupons/').content.decode()
+      self.assertEqual(lote.count('2ª via'), 2)
+      self.assertIn('Devolvido' + '- R$ 12.90'.rjust(31), lote)
+      self.assertIn('VENDA CANCELADA', lote)
+      self.assertEqual(self.client.get(primeira['cupom_pdf'])['Content-Type'], 'application/pdf')
+
+  def test_lote_sem_lista_de_ids(self):
+      for _ in range(3):
+          self._vender(1)
+      hoje = timezone.localdate()
+      with CaptureQueriesContext(connection) as consultas:
+          cupons_do_dia = cupons.do_intervalo(hoje, hoje, self.loja)
+      self.assertEqual(len(cupons_do_dia), 3)
+      # Vendas, itens e devoluções; os dois últimos filtram pelo período, não por ids
+      self.assertEqual(len(consultas), 3)
+      self.assertFalse(any('"venda_id" IN (' in consulta['sql'] for consulta in consultas))
+
+
+class ConsistenciaTests(TestCase):
+  """verificar_consistencia acha os agregados que desviaram e os corrige"""
+
+  def setUp(self):
+      self.loja = Loja.objects.create(codigo='L01', nome='Loja 1')
+      self.cafe = Produto.objects.create(nome='Café', preco='12.90', quantidade_estoque=100, quantidade_vendidos=3)
+      # Dois dias encerrados do mês passado (o mês também está encerrado)
+      self.dia = timezone.localdate().replace(day=1) - timedelta(days=1)
+      for dia, loja in ((self.dia, self.loja), (self.dia - timedelta(days=1), None)):
+          venda = Venda.objects.create(loja=loja, data_venda=timezone.make_aware(datetime.combine(dia, time(10))),
+                                       total='25.80', finalizada=True)
+          ItemVenda.objects.create(venda=venda, produto=self.cafe, quantidade=2, preco_unitario=Decimal('12.90'))
+      for loja in (None, self.loja):
+          GeradorRelatorios.gerar_relatorio_diario(self.dia, loja)
+          GeradorRelatorios.gerar_relatorio_mensal(self.dia.year, self.dia.month, loja)
+
+  def test_divergencias_e_correcao(self):
+      RelatorioDiario.objects.filter(data=self.dia, loja=None).update(total_vendido='1.00', resumo_produtos={})
+      RelatorioMensal.objects.filter(loja=self.loja).update(dias_com_vendas=5)
+
+      divergencias, correcoes = consistencia.verificar()
+      self.assertEqual(
+          {(d.tipo, d.campo) for d in divergencias},
+          {('diario', 'total_vendido'), ('diario', 'resumo_produtos'), ('diario', 'relatorio'),
+           ('mensal', 'total_mensal'), ('mensal', 'dias_com_vendas'), ('produto', 'quantidade_vendidos')}
+      )
+      self.assertEqual({chave: len(valores) for chave, valores in correcoes.items()},
+                       {'diarios': 2, 'mensais': 2, 'produtos': 1})
+
+      consistencia.corrigir(correcoes)
+      self.assertEqual(consistencia.verificar(), ([], {'diarios': {}, 'mensais': {}, 'produtos': {}}))
+      relatorio = RelatorioDiario.objects.get(data=self.dia - timedelta(days=1), loja=None)
+      self.assertEqual(relatorio.resumo_produtos, {'Café': {'quantidade': 2, 'total': 25.8}})
+      self.assertEqual(RelatorioMensal.objects.get(loja=None).total_mensal, Decimal('51.60'))
+
+
+class ProducaoTests(TestCase):
+  """Verificação de saúde para o balanceador e o check do cache compartilhado"""
+
+  def test_saude_responde_503_sem_banco(self):
+      self.assertEqual(self.client.get('/saude/').json(), {'status': 'ok', 'banco': True})
+
+      with mock.patch.object(connection, 'cursor', side_effect=OperationalError('unable to open database file')):
+          resposta = self.client.get('/saude/')
+      self.assertEqual(resposta.status_code, 503)
+      self.assertEqual(resposta.json(), {'status': 'erro', 'banco': False})
+
+  def test_check_do_cache_registrado(self):
+      locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+      arquivos = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                              'LOCATION': tempfile.gettempdir()}}
+      # Como no manage.py check: os silenciados não contam
+      ids = lambda: [erro.id for erro in run_checks(tags=[Tags.caches]) if not erro.is_silenced()]
+
+      with self.settings(PRODUCAO=True, CACHES=locmem):
+          self.assertIn('vendas.E001', ids())
+      with self.settings(PRODUCAO=True, CACHES=locmem, SILENCED_SYSTEM_CHECKS=['vendas.E001']):
+          self.assertNotIn('vendas.E001', ids())
+      with self.settings(PRODUCAO=True, CACHES=arquivos):
+          self.assertNotIn('vendas.E001', ids())
+      with self.settings(PRODUCAO=False, CACHES=locmem):
+          self.assertNotIn('vendas.E001', ids())
+
+
+class HistoricoPrecoTests(TestCase):
+  """Cada mudança de preço abre um intervalo; vendas não mexem no histórico"""
+
+  def setUp(self):
+      self.cafe = Produto.objects.create(nome='Café', preco='12.90', quantidade_estoque=100)
+      self.acucar = Produto.objects.create(nome='Açúcar', preco='4.50', quantidade_estoque=100)
+
+  def test_mudancas_e_preco_no_momento(self):
+      antes = timezone.now()
+      dados = {'itens': [{'produto_id': self.cafe.id, 'quantidade': 2}]}
+      self.client.post('/finalizar-venda/', json.dumps(dados), content_type='application/json')
+      self.assertEqual(HistoricoPreco.objects.count(), 2)
+
+      cafe = Produto.objects.get(id=self.cafe.id)
+      cafe.preco = Decimal('13.50')
+      cafe.save()
+      self.assertEqual(precos.reajustar_precos(Produto.objects.all(), Decimal('10')), 2)
+
+      self.assertEqual(HistoricoPreco.objects.filter(produto=self.cafe).count(), 3)
+      self.assertEqual(precos.preco_em(self.cafe.id, antes), Decimal('12.90'))
+      self.assertEqual(precos.precos_em(timezone.now()), {self.cafe.id: Decimal('14.85'), self.acucar.id: Decimal('4.95')})
+      self.assertEqual(Produto.objects.get(id=self.cafe.id).preco, Decimal('14.85'))
+
+      with self.assertNumQueries(1):
+          tabela = self.client.get('/tabela-precos/').json()['produtos']
+      self.assertEqual([(produto['nome'], produto['preco']) for produto in tabela], [('Açúcar', 4.95), ('Café', 14.85)])
+      antiga = self.client.get(f'/tabela-precos/?data={antes.date() - timedelta(days=1)}').json()['produtos']
+      self.assertEqual(antiga, [])
+
+  def test_evolucao_pelos_relatorios(self):
+      ontem = timezone.localdate() - timedelta(days=1)
+      RelatorioDiario.objects.create(data=ontem, resumo_produtos={'Café': {'quantidade': 4, 'total': 50.0}})
+      HistoricoPreco.objects.update(inicio=timezone.make_aware(datetime.combine(ontem, time(8))))
+      resposta = self.client.get(f'/evolucao-precos/{self.cafe.id}/?inicio={ontem}&fim={ontem}').json()
+      self.assertEqual(len(resposta['alteracoes']), 1)
+      self.assertEqual(resposta['meses'], [{'ano': ontem.year, 'mes': ontem.month, 'preco_tabela': 12.9,
+                                            'quantidade': 4, 'receita': 50.0, 'preco_medio': 12.5}])
+
+  def test_datas_nos_extremos_sao_recusadas(self):
+      self.assertEqual(self.client.get('/tabela-precos/?data=9999-12-31').status_code, 400)
+      self.assertEqual(self.client.get(f'/evolucao-precos/{self.cafe.id}/?fim=0001-01-01').status_code, 400)
+      self.assertEqual(self.client.get(f'/evolucao-precos/{self.cafe.id}/?fim=9999-12-31').status_code, 400)
+
+
+class FormatosTests(TestCase):
+  """Vários formatos do mesmo relatório saem de uma leitura só"""
+
+  def setUp(self):
+      self.dia = timezone.localdate() - timedelta(days=1)
+      self.cafe = Produto.objects.create(nome='Café "extra"', preco='12.90', quantidade_estoque=100)
+      venda = Venda.objects.create(data_venda=timezone.make_aware(datetime.combine(self.dia, time(10))),
+                                   total='25.80', finalizada=True)
+      ItemVenda.objects.create(venda=venda, produto=self.cafe, quantidade=2, preco_unitario=Decimal('12.90'))
+      GeradorRelatorios.gerar_relatorio_diario(self.dia)
+
+  def test_zip_com_varios_formatos(self):
+      url = f'/download-relatorio-diario/{self.dia.year}/{self.dia.month}/{self.dia.day}/'
+      # A versão (ETag) antes e depois da view e uma leitura do relatório
+      with self.assertNumQueries(3):
+          resposta = self.client.get(url + '?formato=csv,xlsx,txt')
+      self.assertEqual(resposta['Content-Type'], 'application/zip')
+
+      arquivos = zipfile.ZipFile(io.BytesIO(resposta.content))
+      nome = f'relatorio_diario_{self.dia.strftime("%d_%m_%Y")}'
+      self.assertEqual(arquivos.namelist(), [f'{nome}.csv', f'{nome}.xlsx', f'{nome}.txt'])
+      self.assertIn('2;"Café ""extra""";25,80', arquivos.read(f'{nome}.csv').decode('utf-8-sig'))
+      self.assertEqual(arquivos.read(f'{nome}.txt').decode(), RelatorioDiario.objects.get(data=self.dia).formato_caderno())
+      planilha = zipfile.ZipFile(io.BytesIO(arquivos.read(f'{nome}.xlsx'))).read('xl/worksheets/sheet1.xml').decode()
+      self.assertIn('<c r="C2"><v>25.80</v></c>', planilha)
+
+      self.assertEqual(self.client.get(url + '?formato=doc').status_code, 400)
+
+  def test_nomes_de_produto_nao_viram_formula_nem_xml_invalido(self):
+      dados = formatos.DadosDia(
+          data=self.dia, loja='', total=Decimal('2.00'), total_itens=2, numero_vendas=1,
+          produtos=(formatos.LinhaProduto(1, '=HYPERLINK("x")', Decimal('1.00')),
+                    formatos.LinhaProduto(1, 'Pão\x07\x00 doce', Decimal('1.00'))),
+      )
+      texto = formatos.renderizar(dados, 'csv').decode('utf-8-sig')
+      self.assertIn('''1;"'=HYPERLINK(""x"")";1,00''', texto)
+      planilha = zipfile.ZipFile(io.BytesIO(formatos.renderizar(dados, 'xlsx'))).read('xl/worksheets/sheet1.xml')
+      ElementTree.fromstring(planilha)  # XML válido
+      self.assertIn('<t>Pão doce</t>', planilha.decode())
+
+
+class ExtratoTests(TestCase):
+  """A paginação por cursor percorre todas as vendas, nos dois sentidos"""
+
+  def setUp(self):
+      self.cafe = Produto.objects.create(nome='Café', preco='12.90', quantidade_estoque=100)
+      self.pao = Produto.objects.create(nome='Pão', preco='0.50', quantidade_estoque=100)
+      momento = timezone.now().replace(microsecond=0) - timedelta(days=1)
+      self.ids = []
+      for numero in range(7):
+          # Duas vendas no mesmo instante: o id desempata
+          venda = Venda.objects.create(data_venda=momento + timedelta(minutes=numero // 2), total='12.90', finalizada=True)
+          ItemVenda.objects.create(venda=venda, produto=self.cafe if numero % 3 else self.pao, quantidade=1,
+                                   preco_unitario=Decimal('12.90'))
+          self.ids.append(venda.id)
+      Venda.objects.create(total='1.00')  # em aberto: fora do extrato
+      self.ordem = sorted(self.ids, key=lambda i: (Venda.objects.get(id=i).data_venda, i), reverse=True)
+
+  def test_percorre_nos_dois_sentidos(self):
+      filtros = extrato.Filtros()
+      paginas = [extrato.pagina(filtros, tamanho=3)]
+      while paginas[-1]['proximo']:
+          with self.assertNumQueries(2):
+              paginas.append(extrato.pagina(filtros, depois=paginas[-1]['proximo'], tamanho=3))
+      self.assertEqual([venda.id for p in paginas for venda in p['vendas']], self.ordem)
+      self.assertEqual(paginas[1]['vendas'][0].linhas, [(1, 'Pão', Decimal('12.90'))])
+
+      volta = extrato.pagina(filtros, antes=paginas[-1]['anterior'], tamanho=3)
+      self.assertEqual([venda.id for venda in volta['vendas']], [venda.id for venda in paginas[-2]['vendas']])
+      self.assertEqual(volta['proximo'], paginas[-2]['proximo'])
+
+  def test_filtros_e_api(self):
+      resposta = self.client.get(f'/buscar-vendas/?produto={self.pao.id}&tamanho=2').json()
+      self.assertEqual([venda['itens'][0]['produto'] for venda in resposta['vendas']], ['Pão', 'Pão'])
+      seguinte = self.client.get(f'/buscar-vendas/?produto={self.pao.id}&tamanho=2&depois={resposta["proximo"]}').json()
+      self.assertEqual(len(seguinte['vendas']), 1)
+      self.assertIsNone(seguinte['proximo'])
+
+      self.assertEqual(self.client.get('/buscar-vendas/?valor_min=13').json()['vendas'], [])
+      self.assertEqual(self.client.get('/buscar-vendas/?depois=xyz').status_code, 400)
+      self.assertContains(self.client.get(f'/extrato/?produto={self.cafe.id}&tamanho=2'), 'Mais antigas →')
+
+  def test_parametros_fora_do_intervalo_sao_recusados(self):
+      for parametro in ('valor_min=Infinity', 'valor_min=inf', 'valor_max=NaN', 'valor_min=1e20', 'valor_max=1e400',
+                        'inicio=9999-12-31', 'fim=0001-01-01', f'produto={10 ** 30}', 'loja=-1', 'codigo=nenhum'):
+          self.assertEqual(self.client.get(f'/buscar-vendas/?{parametro}').status_code, 400, parametro)
+          self.assertContains(self.client.get(f'/extrato/?{parametro}'), 'Filtros inválidos')
+
+  def test_filtro_por_codigo_do_produto(self):
+      self.pao.codigo = 'PAO'
+      self.pao.save()
+      resposta = self.client.get('/buscar-vendas/?codigo=PAO').json()
+      self.assertEqual(len(resposta['vendas']), 3)
+      # A página não lista o catálogo inteiro num <select>
+      pagina = self.client.get('/extrato/?codigo=PAO')
+      self.assertContains(pagina, 'name="codigo" value="PAO"')
+      self.assertNotContains(pagina, f'<option value="{self.cafe.id}"')
+
+  def test_filtro_por_produto_nao_alcanca_meses_arquivados(self):
+      pasta = tempfile.mkdtemp()
+      self.addCleanup(shutil.rmtree, pasta)
+      self.enterContext(self.settings(ARQUIVO_ITENS_PATH=Path(pasta) / 'arquivo.sqlite3'))
+      dia = timezone.localdate().replace(day=1) - timedelta(days=40)
+      venda = Venda.objects.create(data_venda=timezone.make_aware(datetime.combine(dia, time(10))),
+                                   total='12.90', finalizada=True)
+      ItemVenda.objects.create(venda=venda, produto=self.cafe, quantidade=1, preco_unitario=Decimal('12.90'))
+      self.assertEqual(arquivo.arquivar_mes(dia.year, dia.month), 1)
+      seguinte = (dia.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+      resposta = self.client.get(f'/buscar-vendas/?produto={self.cafe.id}')
+      self.assertEqual(resposta.status_code, 400)
+      self.assertIn(f'{seguinte:%d/%m/%Y}', resposta.json()['erro'])
+      self.assertContains(self.client.get(f'/extrato/?produto={self.cafe.id}&fim={dia.isoformat()}'), 'arquivo morto')
+      # A partir do mês seguinte, ou sem filtro por produto, o extrato sai normalmente
+      resposta = self.client.get(f'/buscar-vendas/?produto={self.cafe.id}&inicio={seguinte.isoformat()}')
+      self.assertEqual(len(resposta.json()['vendas']), 4)
+      self.assertEqual(len(self.client.get('/buscar-vendas/?tamanho=20').json()['vendas']), 8)
@@ -3,14 +3,41 @@ from . import views
 
 urlpatterns = [
   path('', views.home, name='home'),
+  path('saude/', views.saude, name='saude'),
   path('produtos/', views.produtos, name='produtos'),
+  path('importar-produtos/', views.importar_produtos, name='importar_produtos'),
   path('registrar-vendas/', views.registrar_vendas, name='registrar_vendas'),
   path('finalizar-venda/', views.finalizar_venda, name='finalizar_venda'),
+  path('cancelar-venda/<int:venda_id>/', views.cancelar_venda, name='cancelar_venda'),
+  path('devolver-itens/<int:venda_id>/', views.devolver_itens, name='devolver_itens'),
+
+  # Extrato de vendas
+  path('extrato/', views.extrato_vendas, name='extrato_vendas'),
+  path('buscar-vendas/', views.buscar_vendas, name='buscar_vendas'),
+
+  # Cupons
+  path('cupom/<int:venda_id>/', views.cupom_venda, name='cupom_venda'),
+  path('reimprimir-cupons/', views.reimprimir_cupons, name='reimprimir_cupons'),
+
+  # Caixa (turnos)
+  path('abrir-caixa/', views.abrir_caixa, name='abrir_caixa'),
+  path('fechar-caixa/<int:sessao_id>/', views.fechar_caixa, name='fechar_caixa'),
+  path('fechamento-caixa/<int:sessao_id>/', views.fechamento_caixa, name='fechamento_caixa'),
+  path('fechamento-caixa/<int:sessao_id>/pdf/', views.pdf_fechamento_caixa, name='pdf_fechamento_caixa'),
 
   # URLs de Relatórios
   path('relatorios/', views.visualizar_relatorios, name='visualizar_relatorios'),
   path('buscar-relatorios-mes/', views.buscar_relatorios_mes, name='buscar_relatorios_mes'),
+  path('periodos-disponiveis/', views.periodos_disponiveis, name='periodos_disponiveis'),
   path('estatisticas-rapidas/', views.estatisticas_rapidas, name='estatisticas_rapidas'),
+  path('eventos-estatisticas/', views.eventos_estatisticas, name='eventos_estatisticas'),
+  path('ranking-produtos/', views.ranking_produtos, name='ranking_produtos'),
+  path('alertas-estoque/', views.alertas_estoque, name='alertas_estoque'),
+  path('mapa-calor-vendas/', views.mapa_calor_vendas, name='mapa_calor_vendas'),
+  path('comparativo-vendas/', views.comparativo_vendas, name='comparativo_vendas'),
+  path('resumo-lojas/', views.resumo_lojas, name='resumo_lojas'),
+  path('evolucao-precos/<int:produto_id>/', views.evolucao_precos, name='evolucao_precos'),
+  path('tabela-precos/', views.tabela_precos, name='tabela_precos'),
 
   # Downloads de PDF
   path('download-relatorio-diario/<int:ano>/<int:mes>/<int:dia>/', views.download_relatorio_diario, name='download_relatorio_diario'),
@@ -0,0 +1,162 @@
+# utils/ao_vivo.py
+"""Estatísticas do painel ao vivo (Server-Sent Events)
+
+Cada venda (ou devolução) confirmada chama `publicar`, que calcula o
+resumo do dia uma vez e entrega o mesmo payload a todas as conexões
+abertas daquela visão (consolidada ou de uma loja). Sem conexões abertas,
+publicar só grava uma versão nova no cache.
+
+As conexões ficam no processo que as atendeu. Para que vendas gravadas por
+outro processo também apareçam, cada conexão confere a versão no cache a
+cada INTERVALO_PING segundos (um cache.get, não uma consulta) e, se ela
+mudou, recebe o payload recalculado uma vez por processo. Por isso o cache
+precisa ser compartilhado pelos workers (settings.CACHES; checks.py avisa
+quando não é).
+"""
+import asyncio
+import threading
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .comparativos import totais_diarios
+from .respostas import serializar_json
+
+# Segundos entre comentários de keep-alive (e conferências da versão no cache)
+INTERVALO_PING = 15
+# As versões são por dia; a de ontem pode sumir depois de dois dias
+VALIDADE_VERSAO = 60 * 60 * 48
+
+
+def estatisticas_do_dia(loja=None):
+  """Resumo de hoje, do mês e de ontem para o painel (uma consulta)
+
+  Sai dos baldes de VendasPorHora, atualizados a cada venda e devolução, e
+  não do relatório diário (que só é regenerado de hora em hora).
+  """
+  hoje = timezone.localdate()
+  ontem = hoje - timedelta(days=1)
+  inicio_mes = hoje.replace(day=1)
+  totais = totais_diarios(min(ontem, inicio_mes), hoje, loja)
+
+  centavos_hoje, vendas_hoje, itens_hoje = totais.get(hoje, (0, 0, 0))
+  do_mes = [valores for data, valores in totais.items() if data >= inicio_mes]
+  centavos_ontem = totais.get(ontem, (0,))[0]
+
+  return {
+      'hoje': {
+          'total': centavos_hoje / 100,
+          'vendas': vendas_hoje,
+          'itens': itens_hoje
+      },
+      'mes_atual': {
+          'total': sum(centavos for centavos, _, _ in do_mes) / 100,
+          'dias_vendas': sum(1 for _, vendas, _ in do_mes if vendas > 0)
+      },
+      'comparativo': {
+          'ontem': centavos_ontem / 100,
+          'diferenca': (centavos_hoje - centavos_ontem) / 100
+      }
+  }
+
+
+def _chave_versao(loja_id):
+  # Por dia: na virada a versão muda sozinha e o painel zera o "hoje"
+  return f'ao_vivo:versao:{timezone.localdate().isoformat()}:{loja_id or "-"}'
+
+
+def versao(loja_id):
+  """(data, marca) da visão; muda a cada publicação e a cada dia"""
+  chave = _chave_versao(loja_id)
+  return chave.split(':')[2], cache.get_or_set(chave, time.time_ns, VALIDADE_VERSAO)
+
+
+def _nova_versao(loja_id):
+  # Um valor novo em vez de incr: o incr do cache em arquivo não é atômico,
+  # e duas vendas em processos diferentes poderiam gravar o mesmo contador
+  chave = _chave_versao(loja_id)
+  marca = time.time_ns()
+  cache.set(chave, marca, VALIDADE_VERSAO)
+  return chave.split(':')[2], marca
+
+
+def _entregar(fila, payload):
+  """Só o payload mais recente interessa: substitui o que não foi lido"""
+  if fila.full():
+      fila.get_nowait()
+  fila.put_nowait(payload)
+
+
+class Transmissor:
+  """Conexões abertas por visão e o último payload calculado de cada uma"""
+
+  def __init__(self):
+      self._assinantes = {}
+      self._ultimos = {}
+      self._lock = threading.Lock()
+
+  def assinar(self, loja_id):
+      """Registra uma conexão (chamado no event loop que vai ler a fila)"""
+      fila = asyncio.Queue(maxsize=1)
+      with self._lock:
+          self._assinantes.setdefault(loja_id, set()).add((asyncio.get_running_loop(), fila))
+      return fila
+
+  def cancelar(self, loja_id, fila):
+      with self._lock:
+          assinantes = self._assinantes.get(loja_id, set())
+          assinantes.difference_update({item for item in assinantes if item[1] is fila})
+          if not assinantes:
+              self._assinantes.pop(loja_id, None)
+
+  def conexoes(self, loja_id=None):
+      with self._lock:
+          return len(self._assinantes.get(loja_id, ()))
+
+  def payload(self, loja_id, versao_atual):
+      """Evento SSE serializado da versão; calculado uma vez por versão"""
+      from vendas.models import Loja
+
+      with self._lock:
+          ultimo = self._ultimos.get(loja_id)
+      if ultimo is not None and ultimo[0] == versao_atual:
+          return ultimo[1]
+
+      loja = Loja.objects.get(id=loja_id) if loja_id else None
+      dados = serializar_json(estatisticas_do_dia(loja))
+      evento = b'id: %s.%d\nevent: estatisticas\ndata: %s\n\n' % (versao_atual[0].encode(), versao_atual[1], dados)
+      with self._lock:
+          self._ultimos[loja_id] = (versao_atual, evento)
+      return evento
+
+  def publicar(self, loja_id=None):
+      """Nova versão da visão; calcula e entrega se houver conexões aqui"""
+      versao_atual = _nova_versao(loja_id)
+      with self._lock:
+          assinantes = list(self._assinantes.get(loja_id, ()))
+      if not assinantes:
+          return 0
+
+      evento = (versao_atual, self.payload(loja_id, versao_atual))
+      for loop, fila in assinantes:
+          try:
+              loop.call_soon_threadsafe(_entregar, fila, evento)
+          except RuntimeError:
+              # Loop já encerrado; a conexão sai no cancelar()
+              pass
+      return len(assinantes)
+
+
+transmissor = Transmissor()
+
+
+def publicar_venda(loja_id):
+  """Avisa o painel consolidado e o da loja; nunca derruba a venda"""
+  try:
+      transmissor.publicar(None)
+      if loja_id:
+          transmissor.publicar(loja_id)
+  except Exception as e:
+      print(f"Erro ao publicar estatísticas: {e}")
@@ -0,0 +1,316 @@
+# utils/arquivo.py
+"""Arquivo morto dos itens de venda antigos (um banco SQLite à parte)
+
+Meses anteriores ao horizonte (ARQUIVO_ITENS_MESES) já estão consolidados
+em RelatorioDiario/RelatorioMensal; seus ItemVenda vão para o arquivo e saem
+do banco principal. A Venda fica (é pequena e os relatórios apontam para
+ela), marcada com itens_arquivados.
+
+Leituras que precisam dos itens antigos passam por aqui: `itens_da_venda`
+e `itens_das_vendas` (cupons) para vendas, `por_produto` (ranking),
+`por_dia_e_produto` (verificação de consistência) e `quantidades_por_hora`
+(reconstrução do mapa de calor) para intervalos.
+
+Vendas com devoluções ficam no banco principal (Devolucao aponta para o
+item) e vendas arquivadas não aceitam devolução nem cancelamento. As
+leituras por intervalo ainda conferem no banco principal e descartam
+vendas arquivadas que não estão mais finalizadas (canceladas antes dessa
+regra), então ranking, consistência e mapa de calor não as contam.
+"""
+import sqlite3
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils import timezone
+
+from vendas.campos import de_centavos, para_centavos
+from .periodos import intervalo_do_mes
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS itens (
+    id INTEGER PRIMARY KEY,
+    venda_id INTEGER NOT NULL,
+    loja_id INTEGER,
+    produto_id INTEGER NOT NULL,
+    produto_nome TEXT NOT NULL,
+    quantidade INTEGER NOT NULL,
+    preco_unitario INTEGER NOT NULL,
+    subtotal INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    hora INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS itens_venda_idx ON itens (venda_id);
+CREATE INDEX IF NOT EXISTS itens_data_idx ON itens (data, loja_id);
+CREATE TABLE IF NOT EXISTS meses (
+    ano INTEGER NOT NULL,
+    mes INTEGER NOT NULL,
+    itens INTEGER NOT NULL,
+    arquivado_em TEXT NOT NULL,
+    PRIMARY KEY (ano, mes)
+);
+"""
+
+# Vendas copiadas (e apagadas do banco principal) por lote
+LOTE = 2000
+
+
+@dataclass(frozen=True)
+class ItemArquivado:
+  """Item de venda lido do arquivo (mesmos campos usados de ItemVenda)"""
+  id: int
+  venda_id: int
+  produto_id: int
+  produto_nome: str
+  quantidade: int
+  preco_unitario: Decimal
+  subtotal: Decimal
+
+
+def caminho_arquivo():
+  return getattr(settings, 'ARQUIVO_ITENS_PATH', settings.BASE_DIR / 'arquivo_itens.sqlite3')
+
+
+def conectar(caminho=None, criar=False):
+  """Conexão com o arquivo; None se ele ainda não existe (e criar=False)"""
+  from pathlib import Path
+
+  caminho = Path(caminho or caminho_arquivo())
+  if not criar and not caminho.exists():
+      return None
+  conexao = sqlite3.connect(caminho)
+  conexao.executescript(ESQUEMA)
+  return conexao
+
+
+def horizonte(meses=None, hoje=None):
+  """Primeiro dia do mês mais antigo que ainda fica no banco principal"""
+  meses = getattr(settings, 'ARQUIVO_ITENS_MESES', 24) if meses is None else meses
+  hoje = hoje or timezone.localdate()
+  indice = hoje.year * 12 + hoje.month - 1 - meses
+  return date(indice // 12, indice % 12 + 1, 1)
+
+
+def meses_arquivados(caminho=None):
+  conexao = conectar(caminho)
+  if conexao is None:
+      return []
+  with conexao:
+      return conexao.execute('SELECT ano, mes, itens, arquivado_em FROM meses ORDER BY ano, mes').fetchall()
+
+
+def _finalizar_relatorios(ano, mes):
+  """Garante que os relatórios do mês estão completos antes de os itens saírem"""
+  from django.db.models.functions import TruncDate
+  from vendas.models import Loja, Venda
+  from .periodos import intervalo_de_datas
+  from .relatorios import GeradorRelatorios
+
+  inicio, fim = intervalo_de_datas(*intervalo_do_mes(ano, mes))
+  dias = (
+      Venda.objects.filter(finalizada=True, data_venda__gte=inicio, data_venda__lt=fim)
+      .annotate(dia=TruncDate('data_venda'))
+      .values_list('loja_id', 'dia')
+      .distinct()
+      .order_by()
+  )
+  por_loja = {}
+  for loja_id, dia in dias:
+      por_loja.setdefault(loja_id, set()).add(dia)
+
+  lojas = Loja.objects.in_bulk([loja_id for loja_id in por_loja if loja_id])
+  todos_os_dias = set().union(*por_loja.values()) if por_loja else set()
+  # O consolidado cobre todas as lojas; cada loja só os próprios dias
+  for dia in sorted(todos_os_dias):
+      GeradorRelatorios.gerar_relatorio_diario(dia)
+  for loja_id, dias_loja in por_loja.items():
+      if loja_id:
+          for dia in sorted(dias_loja):
+              GeradorRelatorios.gerar_relatorio_diario(dia, lojas[loja_id])
+  GeradorRelatorios.gerar_relatorio_mensal(ano, mes)
+  for loja in lojas.values():
+      GeradorRelatorios.gerar_relatorio_mensal(ano, mes, loja)
+
+
+def arquivar_mes(ano, mes, caminho=None):
+  """Copia os itens das vendas finalizadas do mês para o arquivo e os apaga
+
+  A cópia é confirmada no arquivo antes de apagar do banco principal; se o
+  processo parar no meio, rodar de novo regrava os mesmos ids sem duplicar.
+  Devolve o número de itens que saíram do banco principal.
+  """
+  from django.db import transaction
+  from vendas.models import Devolucao, ItemVenda, Venda
+  from .periodos import intervalo_de_datas
+
+  if (ano, mes) >= (timezone.localdate().year, timezone.localdate().month):
+      raise ValueError('Só meses encerrados podem ser arquivados')
+
+  _finalizar_relatorios(ano, mes)
+
+  inicio, fim = intervalo_de_datas(*intervalo_do_mes(ano, mes))
+  ids_vendas = list(
+      Venda.objects.filter(finalizada=True, itens_arquivados=False, data_venda__gte=inicio, data_venda__lt=fim)
+      .exclude(id__in=Devolucao.objects.values('venda_id'))
+      .order_by('id')
+      .values_list('id', flat=True)
+  )
+  blocos = [ids_vendas[posicao:posicao + LOTE] for posicao in range(0, len(ids_vendas), LOTE)]
+
+  conexao = conectar(caminho, criar=True)
+  arquivados = 0
+  try:
+      for bloco in blocos:
+          lote = []
+          itens = (
+              ItemVenda.objects.filter(venda_id__in=bloco)
+              .values_list('id', 'venda_id', 'venda__loja_id', 'produto_id', 'produto__nome', 'quantidade',
+                           'preco_unitario', 'subtotal', 'venda__data_venda')
+          )
+          for item_id, venda_id, loja_id, produto_id, nome, quantidade, preco, subtotal, data_venda in itens:
+              local = timezone.localtime(data_venda)
+              lote.append((item_id, venda_id, loja_id, produto_id, nome, quantidade,
+                           para_centavos(preco), para_centavos(subtotal), local.date().isoformat(), local.hour))
+          with conexao:
+              conexao.executemany('INSERT OR REPLACE INTO itens VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', lote)
+
+      # Só agora, com o arquivo confirmado, os itens saem do banco principal.
+      # As vendas ficam travadas: uma devolução feita durante a cópia (ela
+      # também trava a venda) mantém a venda aqui e a tira do arquivo
+      for bloco in blocos:
+          with transaction.atomic():
+              list(Venda.objects.select_for_update().filter(id__in=bloco).values_list('id'))
+              devolvidas = list(Devolucao.objects.filter(venda_id__in=bloco).values_list('venda_id', flat=True).distinct())
+              if devolvidas:
+                  with conexao:
+                      conexao.executemany('DELETE FROM itens WHERE venda_id = ?', [(venda_id,) for venda_id in devolvidas])
+                  bloco = sorted(set(bloco) - set(devolvidas))
+              arquivados += ItemVenda.objects.filter(venda_id__in=bloco).delete()[0]
+              Venda.objects.filter(id__in=bloco).update(itens_arquivados=True)
+
+      with conexao:
+          total = conexao.execute(
+              'SELECT COUNT(*) FROM itens WHERE data >= ? AND data <= ?',
+              [d.isoformat() for d in intervalo_do_mes(ano, mes)]
+          ).fetchone()[0]
+          conexao.execute(
+              'INSERT OR REPLACE INTO meses (ano, mes, itens, arquivado_em) VALUES (?, ?, ?, ?)',
+              (ano, mes, total, timezone.now().isoformat())
+          )
+  finally:
+      conexao.close()
+
+  return arquivados
+
+
+# --- leitura ---
+
+def itens_da_venda(venda):
+  """Itens de uma venda, do banco principal ou do arquivo"""
+  if not venda.itens_arquivados:
+      return [
+          ItemArquivado(item.id, item.venda_id, item.produto_id, item.produto.nome,
+                        item.quantidade, item.preco_unitario, item.subtotal)
+          for item in venda.itens.select_related('produto').order_by('id')
+      ]
+
+  conexao = conectar()
+  if conexao is None:
+      return []
+  with conexao:
+      linhas = conexao.execute(
+          'SELECT id, venda_id, produto_id, produto_nome, quantidade, preco_unitario, subtotal '
+          'FROM itens WHERE venda_id = ? ORDER BY id', (venda.id,)
+      ).fetchall()
+  conexao.close()
+  return [
+      ItemArquivado(item_id, venda_id, produto_id, nome, quantidade, de_centavos(preco), de_centavos(subtotal))
+      for item_id, venda_id, produto_id, nome, quantidade, preco, subtotal in linhas
+  ]
+
+
+def itens_das_vendas(ids_vendas):
+  """{venda_id: [(quantidade, nome, subtotal)]} arquivados, em ordem de item"""
+  ids_vendas = list(ids_vendas)
+  conexao = conectar() if ids_vendas else None
+  if conexao is None:
+      return {}
+  por_venda = {}
+  with conexao:
+      for posicao in range(0, len(ids_vendas), LOTE):
+          bloco = ids_vendas[posicao:posicao + LOTE]
+          linhas = conexao.execute(
+              'SELECT venda_id, quantidade, produto_nome, subtotal FROM itens '
+              f'WHERE venda_id IN ({", ".join("?" * len(bloco))}) ORDER BY id', bloco
+          ).fetchall()
+          for venda_id, quantidade, nome, subtotal in linhas:
+              por_venda.setdefault(venda_id, []).append((quantidade, nome, de_centavos(subtotal)))
+  conexao.close()
+  return por_venda
+
+
+def _canceladas(data_inicio, data_fim, loja_id):
+  """Ids das vendas arquivadas do intervalo que não estão mais finalizadas"""
+  from vendas.models import Venda
+  from .periodos import intervalo_de_datas
+
+  vendas = Venda.objects.filter(itens_arquivados=True, finalizada=False)
+  if (data_inicio, data_fim) != (date.min, date.max):
+      inicio, fim = intervalo_de_datas(data_inicio, data_fim)
+      vendas = vendas.filter(data_venda__gte=inicio, data_venda__lt=fim)
+  if loja_id is not None:
+      vendas = vendas.filter(loja_id=loja_id)
+  return list(vendas.values_list('id', flat=True))
+
+
+def _consultar_intervalo(sql, data_inicio, data_fim, loja_id, sufixo=''):
+  """Roda uma agregação sobre os itens do intervalo; [] sem arquivo"""
+  conexao = conectar()
+  if conexao is None:
+      return []
+  parametros = [data_inicio.isoformat(), data_fim.isoformat()]
+  filtro = 'data >= ? AND data <= ?'
+  if loja_id is not None:
+      filtro += ' AND loja_id = ?'
+      parametros.append(loja_id)
+  with conexao:
+      canceladas = _canceladas(data_inicio, data_fim, loja_id)
+      if canceladas:
+          # Numa tabela temporária, sem limite de parâmetros
+          conexao.execute('CREATE TEMP TABLE IF NOT EXISTS canceladas (id INTEGER PRIMARY KEY)')
+          conexao.executemany('INSERT OR IGNORE INTO canceladas VALUES (?)', [(venda_id,) for venda_id in canceladas])
+          filtro += ' AND venda_id NOT IN (SELECT id FROM canceladas)'
+      linhas = conexao.execute(sql.format(filtro=filtro) + sufixo, parametros).fetchall()
+  conexao.close()
+  return linhas
+
+
+def por_produto(data_inicio, data_fim, loja_id=None):
+  """{produto_id: (nome, quantidade, receita em centavos)} arquivados no intervalo"""
+  linhas = _consultar_intervalo(
+      'SELECT produto_id, MAX(produto_nome), SUM(quantidade), SUM(subtotal) FROM itens WHERE {filtro}',
+      data_inicio, data_fim, loja_id, ' GROUP BY produto_id'
+  )
+  return {produto_id: (nome, quantidade, centavos) for produto_id, nome, quantidade, centavos in linhas}
+
+
+def por_dia_e_produto(data_inicio, data_fim):
+  """[(loja_id, data, nome, quantidade, centavos)] arquivados no intervalo"""
+  linhas = _consultar_intervalo(
+      'SELECT loja_id, data, produto_nome, SUM(quantidade), SUM(subtotal) FROM itens WHERE {filtro}',
+      data_inicio, data_fim, None, ' GROUP BY loja_id, data, produto_nome'
+  )
+  return [(loja_id, date.fromisoformat(data), nome, quantidade, centavos)
+          for loja_id, data, nome, quantidade, centavos in linhas]
+
+
+def quantidades_por_hora(data_inicio=None, data_fim=None):
+  """{(loja_id, data, hora): itens} arquivados (tudo, sem datas)"""
+  if data_inicio is None:
+      data_inicio, data_fim = date.min, date.max
+  linhas = _consultar_intervalo(
+      'SELECT loja_id, data, hora, SUM(quantidade) FROM itens WHERE {filtro}',
+      data_inicio, data_fim, None, ' GROUP BY loja_id, data, hora'
+  )
+  return {(loja_id, date.fromisoformat(data), hora): quantidade for loja_id, data, hora, quantidade in linhas}
@@ -0,0 +1,815 @@
+# utils/benchmarks.py
+"""Cenários de benchmark executados por `python manage.py benchmark`
+
+Cada cenário popula os dados sintéticos de que precisa dentro de uma
+transação que é desfeita no final, então pode rodar no banco de
+desenvolvimento sem deixar rastros. Retorna uma lista de (descrição, valor).
+"""
+import gzip
+import time
+from datetime import date
+
+from django.db import transaction
+
+CENARIOS = {}
+
+
+class _Rollback(Exception):
+  pass
+
+
+def cenario(nome):
+  """Registra uma função como cenário de benchmark"""
+  def registrar(funcao):
+      CENARIOS[nome] = funcao
+      return funcao
+  return registrar
+
+
+def executar(nome, **opcoes):
+  """Executa um cenário e desfaz tudo o que ele gravou no banco"""
+  funcao = CENARIOS[nome]
+  resultado = []
+
+  try:
+      with transaction.atomic():
+          resultado = funcao(**opcoes)
+          raise _Rollback
+  except _Rollback:
+      pass
+
+  return resultado
+
+
+def cronometrar(funcao, repeticoes=1):
+  """Tempo médio (em ms) de `repeticoes` chamadas e o último retorno"""
+  inicio = time.perf_counter()
+  for _ in range(repeticoes):
+      retorno = funcao()
+  return (time.perf_counter() - inicio) * 1000 / repeticoes, retorno
+
+
+@cenario('relatorios_mes')
+def relatorios_mes(produtos=300, repeticoes=20, **opcoes):
+  """Tamanho e tempo de serialização da resposta de buscar_relatorios_mes
+  em um mês movimentado: vendas todos os dias, `produtos` itens por dia"""
+  import json
+  from django.core.serializers.json import DjangoJSONEncoder
+  from vendas.models import RelatorioDiario, RelatorioMensal, SnapshotLeitura
+  from vendas.utils.respostas import serializar_json
+  from vendas.utils.snapshots import chave_mes, dias_formato_completo, dias_formato_compacto, materializar_mes
+
+  ano, mes = 2000, 1
+  RelatorioDiario.objects.bulk_create([
+      RelatorioDiario(
+          data=date(ano, mes, dia),
+          total_vendido=produtos * 12,
+          numero_vendas=produtos // 2,
+          total_itens=produtos * 3,
+          resumo_produtos={
+              f'Produto {i:04d}': {'quantidade': 3, 'total': 12.0} for i in range(produtos)
+          }
+      )
+      for dia in range(1, 32)
+  ])
+
+  linhas = []
+  por_data = {relatorio.data: relatorio for relatorio in RelatorioDiario.objects.filter(data__year=ano, data__month=mes)}
+  for nome, montar in (('completo', dias_formato_completo), ('compacto', dias_formato_compacto)):
+      dados = montar(ano, mes, por_data)
+      ms_json, corpo_json = cronometrar(lambda: json.dumps(dados, cls=DjangoJSONEncoder).encode(), repeticoes)
+      ms_rapido, corpo = cronometrar(lambda: serializar_json(dados), repeticoes)
+
+      linhas += [
+          (f'{nome}: bytes (JsonResponse)', len(corpo_json)),
+          (f'{nome}: bytes (serializar_json)', len(corpo)),
+          (f'{nome}: bytes gzip', len(gzip.compress(corpo))),
+          (f'{nome}: ms json.dumps', round(ms_json, 3)),
+          (f'{nome}: ms serializar_json', round(ms_rapido, 3)),
+      ]
+
+  # Resposta montada a cada requisição contra o snapshot gravado na geração
+  relatorio_mensal = RelatorioMensal.objects.create(ano=ano, mes=mes)
+  relatorio_mensal.gerar_consolidacao()
+  ms_montar, _ = cronometrar(lambda: materializar_mes(relatorio_mensal), repeticoes)
+  ms_snapshot, _ = cronometrar(lambda: SnapshotLeitura.ler(chave_mes(ano, mes)), repeticoes)
+  linhas += [
+      ('mês montado (consulta + 2 formatos): ms', round(ms_montar, 3)),
+      ('snapshot lido por chave: ms', round(ms_snapshot, 3)),
+  ]
+
+  return linhas
+
+
+def _resumo_legado(relatorio):
+  """gerar_resumo como era antes dos centavos: item a item, somando floats/Decimals"""
+  vendas = relatorio.vendas_do_dia
+  produtos_resumo = {}
+  for venda in vendas:
+      for item in venda.itens.all():
+          dados = produtos_resumo.setdefault(item.produto.nome, {'quantidade': 0, 'total': 0.0})
+          dados['quantidade'] += item.quantidade
+          dados['total'] += float(item.subtotal)
+  total = sum(venda.total for venda in vendas)
+  itens = sum(sum(item.quantidade for item in venda.itens.all()) for venda in vendas)
+  return produtos_resumo, total, itens
+
+
+@cenario('agregacao_dinheiro')
+def agregacao_dinheiro(vendas=500, itens=10, produtos=50, repeticoes=3, **opcoes):
+  """Vazão da agregação de valores: resumo diário item a item (como antes)
+  contra agregação no banco em centavos, e somas no Python com Decimal
+  contra inteiros"""
+  from django.db import models
+  from django.db.models.functions import Cast
+  from django.utils import timezone
+  from vendas.models import ItemVenda, Produto, RelatorioDiario, Venda
+
+  agora = timezone.now()
+  lista_produtos = Produto.objects.bulk_create([
+      Produto(nome=f'Produto {i:04d}', preco='1.37', quantidade_estoque=1000) for i in range(produtos)
+  ])
+  lista_vendas = Venda.objects.bulk_create([
+      Venda(data_venda=agora, total='13.70', finalizada=True) for _ in range(vendas)
+  ])
+  ItemVenda.objects.bulk_create([
+      ItemVenda(venda=venda, produto=lista_produtos[(v + i) % produtos], quantidade=1,
+                preco_unitario='1.37', subtotal='1.37')
+      for v, venda in enumerate(lista_vendas) for i in range(itens)
+  ])
+  relatorio = RelatorioDiario.objects.create(data=timezone.localdate(agora))
+
+  total_itens = vendas * itens
+  ms_legado, _ = cronometrar(lambda: _resumo_legado(relatorio), repeticoes)
+  ms_novo, _ = cronometrar(relatorio.gerar_resumo, repeticoes)
+
+  decimais = list(ItemVenda.objects.values_list('subtotal', flat=True))
+  inteiros = list(
+      ItemVenda.objects.annotate(centavos=Cast('subtotal', models.BigIntegerField()))
+      .values_list('centavos', flat=True)
+  )
+  ms_decimal, _ = cronometrar(lambda: sum(decimais), repeticoes * 10)
+  ms_inteiro, _ = cronometrar(lambda: sum(inteiros), repeticoes * 10)
+
+  return [
+      ('itens agregados', total_itens),
+      ('resumo item a item (antes): ms', round(ms_legado, 2)),
+      ('resumo agregado em centavos: ms', round(ms_novo, 2)),
+      ('resumo item a item: itens/s', round(total_itens / ms_legado * 1000)),
+      ('resumo agregado: itens/s', round(total_itens / ms_novo * 1000)),
+      ('sum() de Decimals no Python: ms', round(ms_decimal, 3)),
+      ('sum() de centavos inteiros: ms', round(ms_inteiro, 3)),
+  ]
+
+
+@cenario('relatorio_por_loja')
+def relatorio_por_loja(vendas_por_loja=200, repeticoes=5, **opcoes):
+  """Tempo do relatório diário de uma loja conforme cresce o número de
+  lojas: com o índice (loja, data_venda) deve ficar estável"""
+  from datetime import timedelta
+  from django.utils import timezone
+  from vendas.models import ItemVenda, Loja, Produto, RelatorioDiario, Venda
+  from vendas.utils.relatorios import GeradorRelatorios
+
+  agora = timezone.now()
+  hoje = timezone.localdate(agora)
+  produto = Produto.objects.create(nome='Produto', preco='2.50', quantidade_estoque=10 ** 6)
+  linhas = []
+  total_lojas = 0
+
+  for lojas in (1, 10, 50):
+      novas = Loja.objects.bulk_create([
+          Loja(codigo=f'L{i:03d}', nome=f'Loja {i:03d}') for i in range(total_lojas, lojas)
+      ])
+      total_lojas = lojas
+      for loja in novas:
+          lista_vendas = Venda.objects.bulk_create([
+              Venda(loja=loja, data_venda=agora - timedelta(minutes=v), total='5.00', finalizada=True)
+              for v in range(vendas_por_loja)
+          ])
+          ItemVenda.objects.bulk_create([
+              ItemVenda(venda=venda, produto=produto, quantidade=2, preco_unitario='2.50', subtotal='5.00')
+              for venda in lista_vendas
+          ])
+
+      loja = Loja.objects.order_by('id').first()
+
+      def gerar():
+          # Força a regeneração completa a cada repetição
+          RelatorioDiario.objects.filter(loja=loja, data=hoje).delete()
+          return GeradorRelatorios.gerar_relatorio_diario(hoje, loja)
+
+      ms, relatorio = cronometrar(gerar, repeticoes)
+      linhas.append((f'{lojas:>3} lojas ({lojas * vendas_por_loja} vendas no dia): ms', round(ms, 2)))
+
+  return linhas
+
+
+@cenario('mapa_calor')
+def mapa_calor(vendas=100000, dias=365, repeticoes=5, **opcoes):
+  """Mapa de calor de um ano: agrupando as vendas por hora na hora da
+  consulta contra a leitura dos baldes de VendasPorHora"""
+  from datetime import timedelta
+  from django.db.models import Count, Sum
+  from django.db.models.functions import ExtractHour, ExtractIsoWeekDay
+  from django.utils import timezone
+  from vendas.models import Venda
+  from vendas.utils.mapa_calor import mapa_calor as calcular_mapa, reconstruir_vendas_por_hora
+
+  agora = timezone.now()
+  minutos = dias * 24 * 60
+  Venda.objects.bulk_create([
+      Venda(data_venda=agora - timedelta(minutes=(v * 7919) % minutos), total='9.90', finalizada=True)
+      for v in range(vendas)
+  ], batch_size=5000)
+  ms_backfill, baldes = cronometrar(reconstruir_vendas_por_hora)
+
+  hoje = timezone.localdate(agora)
+  inicio = hoje - timedelta(days=dias)
+
+  def direto():
+      return list(
+          Venda.objects.filter(finalizada=True, data_venda__date__gte=inicio)
+          .annotate(dia_semana=ExtractIsoWeekDay('data_venda'), hora=ExtractHour('data_venda'))
+          .values('dia_semana', 'hora')
+          .annotate(vendas=Count('id'), total=Sum('total'))
+          .order_by()
+      )
+
+  ms_direto, _ = cronometrar(direto, repeticoes)
+  ms_baldes, _ = cronometrar(lambda: calcular_mapa(inicio, hoje), repeticoes)
+
+  return [
+      ('vendas no período', vendas),
+      ('baldes (horas com vendas)', baldes),
+      ('backfill dos baldes: ms', round(ms_backfill, 2)),
+      ('agrupando as vendas: ms', round(ms_direto, 2)),
+      ('lendo os baldes: ms', round(ms_baldes, 2)),
+  ]
+
+
+def _pdf_diario_legado(relatorio):
+  """pdf_diario como era antes dos blocos: uma Table só, estilos recriados a cada PDF"""
+  import io
+  from reportlab.lib import colors
+  from reportlab.lib.enums import TA_CENTER
+  from reportlab.lib.pagesizes import A4
+  from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+  from reportlab.lib.units import cm
+  from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+  buffer = io.BytesIO()
+  doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=2*cm, leftMargin=2*cm, topMargin=2*cm, bottomMargin=2*cm)
+  styles = getSampleStyleSheet()
+  title_style = ParagraphStyle('CustomTitle', parent=styles['Title'], fontSize=16, spaceAfter=30, alignment=TA_CENTER)
+
+  data_table = [['Qtd', 'Produto', 'Total']]
+  for produto, dados in relatorio.resumo_produtos.items():
+      data_table.append([f"{dados['quantidade']:02d}", produto, f"R$ {dados['total']:.2f}"])
+  data_table.append(['', '', ''])
+  data_table.append(['TOTAL', '', f"R$ {relatorio.total_vendido:.2f}"])
+
+  table = Table(data_table, colWidths=[2*cm, 10*cm, 3*cm])
+  table.setStyle(TableStyle([
+      ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+      ('ALIGN', (2, 0), (2, -1), 'RIGHT'),
+      ('FONTNAME', (0, 0), (-1, -1), 'Courier'),
+      ('FONTSIZE', (0, 0), (-1, -1), 12),
+      ('GRID', (0, 0), (-1, -2), 0.5, colors.black),
+      ('LINEBELOW', (0, -2), (-1, -2), 2, colors.black),
+      ('FONTNAME', (0, -1), (-1, -1), 'Courier-Bold'),
+      ('FONTSIZE', (0, -1), (-1, -1), 14),
+  ]))
+  doc.build([Paragraph('Relatório de Vendas', title_style), Spacer(1, 20), table])
+  return buffer
+
+
+@cenario('pdf_diario')
+def pdf_diario(produtos=10000, repeticoes=1, **opcoes):
+  """Tempo do PDF diário com `produtos` linhas: tabela única (antes) contra
+  blocos do tamanho da página com estilos pré-montados"""
+  from reportlab.lib.styles import getSampleStyleSheet
+  from vendas.models import RelatorioDiario
+  from vendas.utils.relatorios import GeradorRelatorios
+  from vendas.utils.pdf import estilos
+
+  dia = date(2000, 1, 1)
+  relatorio = RelatorioDiario.objects.create(
+      data=dia,
+      total_vendido=produtos * 12,
+      numero_vendas=produtos // 2,
+      total_itens=produtos * 3,
+      resumo_produtos={
+          f'Produto {i:05d}': {'quantidade': 3, 'total': 12.0} for i in range(produtos)
+      }
+  )
+
+  ms_legado, _ = cronometrar(lambda: _pdf_diario_legado(relatorio), repeticoes)
+  ms_blocos, buffer = cronometrar(lambda: GeradorRelatorios.pdf_diario(dia), repeticoes)
+  ms_folha, _ = cronometrar(getSampleStyleSheet, 100)
+  estilos()
+  ms_folha_cache, _ = cronometrar(estilos, 100)
+
+  return [
+      ('linhas na tabela', produtos),
+      ('tabela única (antes): ms', round(ms_legado, 1)),
+      ('blocos por página: ms', round(ms_blocos, 1)),
+      ('bytes do PDF', len(buffer.getvalue())),
+      ('getSampleStyleSheet(): ms', round(ms_folha, 3)),
+      ('estilos() em cache: ms', round(ms_folha_cache, 4)),
+  ]
+
+
+# Processo de worker até estar pronto para o primeiro pedido: settings,
+# apps, aplicação WSGI e o URLconf (que importa as views)
+_WORKER = """
+import atexit, resource, sys
+atexit.register(lambda: print('\\nRSS', resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, len(sys.modules)))
+import registro_vendas.wsgi
+from django.urls import get_resolver
+get_resolver().url_patterns
+"""
+
+
+def _processo(argumentos):
+  """Roda o Python atual com os mesmos settings, na pasta do projeto"""
+  import os
+  import subprocess
+  import sys
+  from django.conf import settings
+
+  ambiente = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+  return subprocess.run(
+      [sys.executable, *argumentos],
+      cwd=settings.BASE_DIR, env=ambiente, capture_output=True, text=True, check=True
+  )
+
+
+def _medir_processo(codigo, argumentos=()):
+  """(ms de relógio, µs de import, µs de import do ReportLab, módulos, RSS em KB)
+  de um processo novo com -X importtime"""
+  inicio = time.perf_counter()
+  processo = _processo(['-X', 'importtime', '-c', codigo, *argumentos])
+  ms = (time.perf_counter() - inicio) * 1000
+
+  importacao = reportlab = 0
+  for linha in processo.stderr.splitlines():
+      if not linha.startswith('import time:') or 'self [us]' in linha:
+          continue
+      proprio, acumulado, modulo = linha[len('import time:'):].split('|')
+      if not modulo.startswith('  '):
+          importacao += int(acumulado)
+      if modulo.strip().split('.')[0] == 'reportlab':
+          reportlab += int(proprio)
+  rss, modulos = processo.stdout.rsplit('RSS', 1)[1].split()
+  return ms, importacao, reportlab, int(modulos), int(rss)
+
+
+@cenario('tempo_importacao')
+def tempo_importacao(repeticoes=5, **opcoes):
+  """Partida de processos novos (mediana de `repeticoes`): worker de caixa,
+  o mesmo worker depois do primeiro PDF e `manage.py check`"""
+  from statistics import median
+
+  variantes = (
+      ('worker', _WORKER, ()),
+      # Como era antes: utils.relatorios trazia o ReportLab no import das views
+      ('worker + PDF', _WORKER + 'import vendas.utils.pdf\n', ()),
+      ('manage.py check', (
+          "import atexit, resource, runpy, sys\n"
+          "atexit.register(lambda: print('\\nRSS', resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, len(sys.modules)))\n"
+          "runpy.run_path('manage.py', run_name='__main__')\n"
+      ), ('check',)),
+  )
+
+  linhas = []
+  for nome, codigo, argumentos in variantes:
+      medidas = [_medir_processo(codigo, argumentos) for _ in range(repeticoes)]
+      ms, importacao, reportlab, modulos, rss = (median(coluna) for coluna in zip(*medidas))
+      linhas += [
+          (f'{nome}: partida ms', round(ms, 1)),
+          (f'{nome}: imports ms', round(importacao / 1000, 1)),
+          (f'{nome}: ReportLab ms', round(reportlab / 1000, 1)),
+          (f'{nome}: módulos', modulos),
+          (f'{nome}: RSS MB', round(rss / 1024, 1)),
+      ]
+  return linhas
+
+
+_CUPOM_TEMPLATE = (
+  "{{ venda.loja.nome|center:40 }}\nVenda nº {{ venda.id }} {{ venda.data_venda|date:'d/m/Y H:i' }}\n"
+  "{% for quantidade, nome, subtotal in itens %}{{ quantidade|stringformat:'02d' }} "
+  "{{ nome|truncatechars:25|ljust:25 }} R$ {{ subtotal|floatformat:2 }}\n{% endfor %}"
+  "TOTAL R$ {{ venda.total|floatformat:2 }}"
+)
+
+
+@cenario('cupons')
+def cupons(vendas=500, itens=8, repeticoes=5, **opcoes):
+  """Cupons por segundo: texto com o layout em cache contra o mesmo cupom
+  como template do Django, e reimpressão em lote (texto e PDF)"""
+  from datetime import datetime, time as hora, timedelta
+  from decimal import Decimal
+  from django.db import connection
+  from django.template import Context, Engine
+  from django.test.utils import CaptureQueriesContext
+  from django.utils import timezone
+  from vendas.models import ItemVenda, Loja, Produto, Venda
+  from vendas.utils import cupons as modulo
+
+  dia = date(2000, 1, 3)
+  loja = Loja.objects.create(codigo='BENCH', nome='Loja Benchmark')
+  produtos = Produto.objects.bulk_create([
+      Produto(nome=f'Produto de nome comprido {i:03d}', preco='2.50', quantidade_estoque=10 ** 6)
+      for i in range(itens)
+  ])
+  abertura = timezone.make_aware(datetime.combine(dia, hora(8)))
+  lista_vendas = Venda.objects.bulk_create([
+      Venda(loja=loja, data_venda=abertura + timedelta(minutes=v), total=itens * 5, finalizada=True)
+      for v in range(vendas)
+  ])
+  ItemVenda.objects.bulk_create([
+      ItemVenda(venda=venda, produto=produto, quantidade=2, preco_unitario='2.50', subtotal='5.00')
+      for venda in lista_vendas for produto in produtos
+  ])
+
+  venda = Venda.objects.select_related('loja').get(id=lista_vendas[0].id)
+  linhas_itens = [(2, produto.nome, Decimal('5.00')) for produto in produtos]
+
+  # O mesmo cupom como template do Django: compilado a cada cupom e pré-compilado
+  motor = Engine()
+  contexto = {'venda': venda, 'itens': linhas_itens}
+  ms_template, _ = cronometrar(lambda: motor.from_string(_CUPOM_TEMPLATE).render(Context(contexto)), 1000)
+  compilado = motor.from_string(_CUPOM_TEMPLATE)
+  ms_compilado, _ = cronometrar(lambda: compilado.render(Context(contexto)), 1000)
+  ms_texto, texto = cronometrar(lambda: modulo.texto(venda, linhas_itens), 1000)
+  ms_pdf, _ = cronometrar(lambda: modulo.em_pdf([texto]), 50)
+
+  with CaptureQueriesContext(connection) as consultas:
+      ms_lote, textos = cronometrar(lambda: modulo.do_intervalo(dia, dia, loja), repeticoes)
+  ms_lote_pdf, buffer = cronometrar(lambda: modulo.em_pdf(textos), repeticoes)
+
+  return [
+      ('itens por cupom', itens),
+      ('template Django compilado a cada cupom: ms', round(ms_template, 4)),
+      ('template Django pré-compilado: ms', round(ms_compilado, 4)),
+      ('layout em cache (utils/cupons): ms', round(ms_texto, 4)),
+      ('texto: cupons/s', round(1000 / ms_texto)),
+      ('PDF de um cupom: ms', round(ms_pdf, 2)),
+      (f'lote de {vendas} (texto, com consultas): ms', round(ms_lote, 1)),
+      ('lote texto: cupons/s', round(vendas * 1000 / ms_lote)),
+      ('lote: consultas por reimpressão', len(consultas) // repeticoes),
+      (f'lote de {vendas} em PDF: ms', round(ms_lote_pdf, 1)),
+      ('lote PDF: cupons/s', round(vendas * 1000 / ms_lote_pdf)),
+      ('bytes do PDF do lote', len(buffer.getvalue())),
+  ]
+
+
+@cenario('consistencia')
+def consistencia(dias=730, lojas=3, vendas_por_dia=20, **opcoes):
+  """verificar_consistencia sobre `dias` de histórico: consultas agrupadas
+  contra regenerar relatório por relatório (gerar_resumo, por amostra)"""
+  from datetime import datetime, time as hora, timedelta
+  from django.db import connection
+  from django.test.utils import CaptureQueriesContext
+  from django.utils import timezone
+  from vendas.models import ItemVenda, Loja, Produto, RelatorioDiario, Venda
+  from vendas.utils import consistencia as modulo
+
+  ontem = timezone.localdate() - timedelta(days=1)
+  lista_lojas = Loja.objects.bulk_create([Loja(codigo=f'C{i:03d}', nome=f'Loja {i:03d}') for i in range(lojas)])
+  produtos = Produto.objects.bulk_create([
+      Produto(nome=f'Produto {i:02d}', preco='2.50', quantidade_estoque=10 ** 6) for i in range(10)
+  ])
+  for dia in range(dias):
+      abertura = timezone.make_aware(datetime.combine(ontem - timedelta(days=dia), hora(9)))
+      lista_vendas = Venda.objects.bulk_create([
+          Venda(loja=loja, data_venda=abertura + timedelta(minutes=v), total='7.50', finalizada=True)
+          for loja in lista_lojas for v in range(vendas_por_dia)
+      ])
+      ItemVenda.objects.bulk_create([
+          ItemVenda(venda=venda, produto=produtos[(venda.id + i) % 10], quantidade=q,
+                    preco_unitario='2.50', subtotal=f'{2.5 * q:.2f}')
+          for venda in lista_vendas for i, q in ((0, 1), (1, 2))
+      ])
+  Produto.objects.update(quantidade_vendidos=0)
+  linhas = [('vendas no histórico', dias * lojas * vendas_por_dia)]
+
+  # Sem relatórios: tudo aparece como ausente e --corrigir cria em lote
+  ms, (divergencias, correcoes) = cronometrar(modulo.verificar)
+  linhas.append(('verificar, sem relatórios: ms', round(ms, 1)))
+  linhas.append(('divergências encontradas', len(divergencias)))
+  ms, _ = cronometrar(lambda: modulo.corrigir(correcoes))
+  linhas.append((f'corrigir ({len(correcoes["diarios"])} diários, {len(correcoes["mensais"])} mensais): ms', round(ms, 1)))
+
+  with CaptureQueriesContext(connection) as consultas:
+      ms, (divergencias, _) = cronometrar(modulo.verificar)
+  linhas.append(('verificar, consistente: ms', round(ms, 1)))
+  linhas.append(('consultas', len(consultas)))
+  linhas.append(('divergências depois de corrigir', len(divergencias)))
+
+  amostra = list(RelatorioDiario.objects.order_by('?')[:30])
+  ms_amostra, _ = cronometrar(lambda: [relatorio.gerar_resumo() for relatorio in amostra])
+  por_relatorio = ms_amostra / len(amostra)
+  linhas.append(('gerar_resumo por relatório: ms', round(por_relatorio, 2)))
+  linhas.append(('regenerar todos os diários (estimado): ms', round(por_relatorio * len(correcoes['diarios']))))
+  return linhas
+
+
+# Processo à parte: close_old_connections roda nos sinais de início e fim de
+# requisição e fecharia a transação desfeita por `executar`. Lá as
+# requisições passam pelo WSGIHandler (o test Client desliga esses sinais),
+# num banco de teste criado e destruído pelo próprio processo
+_CONEXOES = """
+import json, sys, tempfile, time
+import django
+django.setup()
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory
+
+repeticoes = int(sys.argv[1])
+if connection.vendor == 'sqlite':
+    # Em arquivo: o banco de teste em memória nunca fecha a conexão
+    connection.settings_dict['TEST']['NAME'] = tempfile.mktemp(suffix='.sqlite3')
+nome = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+from vendas.models import Produto
+produto = Produto.objects.create(nome='Café', preco='5.00', quantidade_estoque=10 ** 6)
+corpo = json.dumps({'itens': [{'produto_id': produto.id, 'quantidade': 1}]})
+fabrica = RequestFactory(HTTP_HOST=(settings.ALLOWED_HOSTS or ['localhost'])[0])
+pedidos = {
+    'finalizar_venda': lambda: fabrica.post('/finalizar-venda/', corpo, content_type='application/json').environ,
+    'estatisticas_rapidas': lambda: fabrica.get('/estatisticas-rapidas/').environ,
+}
+handler = WSGIHandler()
+abertas = []
+connection_created.connect(lambda **kwargs: abertas.append(1), weak=False)
+
+variantes = [('conexão nova', 0, None), ('persistente', 600, None)]
+if connection.vendor == 'postgresql':
+    try:
+        import psycopg_pool
+        variantes.append(('pool', 0, {'min_size': 1, 'max_size': 4}))
+    except ImportError:
+        pass
+
+resultado = []
+opcoes = dict(connection.settings_dict['OPTIONS'])
+for descricao, idade, pool in variantes:
+    connection.close()
+    if connection.vendor == 'postgresql':
+        connection.close_pool()
+    connection.settings_dict['CONN_MAX_AGE'] = idade
+    connection.settings_dict['OPTIONS'] = dict(opcoes, pool=pool) if pool else {k: v for k, v in opcoes.items() if k != 'pool'}
+    for nome_view, montar in pedidos.items():
+        ambientes = [montar() for _ in range(repeticoes + 20)]
+        for ambiente in ambientes[:20]:
+            handler(ambiente, lambda *args: None).close()
+        del abertas[:]
+        inicio = time.perf_counter()
+        for ambiente in ambientes[20:]:
+            # close() dispara request_finished, como num servidor WSGI
+            handler(ambiente, lambda *args: None).close()
+        ms = (time.perf_counter() - inicio) * 1000 / repeticoes
+        resultado.append([descricao, nome_view, ms, len(abertas) / repeticoes])
+
+connection.close()
+if connection.vendor == 'postgresql':
+    connection.close_pool()
+connection.settings_dict['OPTIONS'] = opcoes
+connection.creation.destroy_test_db(nome, verbosity=0)
+print(json.dumps([connection.vendor, resultado]))
+"""
+
+
+@cenario('conexoes')
+def conexoes(repeticoes=300, **opcoes):
+  """Custo de abrir a conexão com o banco a cada requisição (CONN_MAX_AGE=0)
+  contra a conexão persistente (e o pool, no PostgreSQL) em finalizar_venda
+  e estatisticas_rapidas"""
+  import json
+
+  processo = _processo(['-c', _CONEXOES, str(repeticoes)])
+  banco, resultado = json.loads(processo.stdout.strip().splitlines()[-1])
+
+  linhas = [('banco', banco)]
+  base = {}
+  for descricao, view, ms, abertas in resultado:
+      base.setdefault(view, ms)
+      linhas.append((f'{view}, {descricao}: ms', round(ms, 3)))
+      linhas.append((f'{view}, {descricao}: conexões/req', round(abertas, 2)))
+      if ms != base[view]:
+          linhas.append((f'{view}, {descricao}: economia ms', round(base[view] - ms, 3)))
+  return linhas
+
+
+@cenario('precos')
+def precos(produtos=500, dias=365, vendas_por_dia=100, repeticoes=5, **opcoes):
+  """Preços passados pelo histórico (HistoricoPreco e relatórios diários)
+  contra procurá-los nos itens de venda, e reajuste em lote contra save()
+  produto a produto"""
+  from datetime import datetime, time as hora, timedelta
+  from decimal import Decimal
+  from django.db.models import BigIntegerField, OuterRef, Subquery, Sum
+  from django.db.models.functions import TruncMonth
+  from django.utils import timezone
+  from vendas.models import HistoricoPreco, ItemVenda, Produto, RelatorioDiario, Venda
+  from vendas.utils import precos as modulo
+
+  ultimo = date(2000, 12, 31)
+  primeiro = ultimo - timedelta(days=dias - 1)
+  lista = Produto.objects.bulk_create([
+      Produto(nome=f'Produto {i:04d}', preco='2.00', quantidade_estoque=10 ** 6) for i in range(produtos)
+  ])
+  precos_atuais = {produto.id: Decimal('2.00') for produto in lista}
+  modulo.registrar_precos(precos_atuais, timezone.make_aware(datetime.combine(primeiro, hora.min)))
+
+  for numero in range(dias):
+      dia = primeiro + timedelta(days=numero)
+      abertura = timezone.make_aware(datetime.combine(dia, hora(8)))
+      if numero and numero % 30 == 0:
+          # Um quarto dos produtos muda de preço a cada 30 dias
+          mudancas = {produto.id: precos_atuais[produto.id] + Decimal('0.10') for produto in lista[numero % 4::4]}
+          precos_atuais.update(mudancas)
+          modulo.registrar_precos(mudancas, abertura)
+      lista_vendas = Venda.objects.bulk_create([
+          Venda(data_venda=abertura + timedelta(minutes=v), total=0, finalizada=True) for v in range(vendas_por_dia)
+      ])
+      resumo = {}
+      itens = []
+      for posicao, venda in enumerate(lista_vendas):
+          # O produto 0 entra em toda venda (o mais vendido)
+          for produto in (lista[0], *(lista[1 + (numero + posicao * 2 + i) % (produtos - 1)] for i in range(2))):
+              preco = precos_atuais[produto.id]
+              itens.append(ItemVenda(venda=venda, produto=produto, quantidade=1, preco_unitario=preco, subtotal=preco))
+              soma = resumo.setdefault(produto.nome, {'quantidade': 0, 'total': 0.0})
+              soma['quantidade'] += 1
+              soma['total'] = round(soma['total'] + float(preco), 2)
+      ItemVenda.objects.bulk_create(itens, batch_size=2000)
+      RelatorioDiario.objects.create(data=dia, resumo_produtos=resumo)
+
+  linhas = [
+      ('itens de venda', dias * vendas_por_dia * 3),
+      ('intervalos no histórico', HistoricoPreco.objects.count()),
+  ]
+  momento = timezone.make_aware(datetime.combine(primeiro + timedelta(days=dias // 2), hora(12)))
+
+  # Tabela de preços num momento passado: último preço praticado por produto
+  ultimo_item = (
+      ItemVenda.objects.filter(produto=OuterRef('pk'), venda__data_venda__lte=momento)
+      .order_by('-venda__data_venda').values('preco_unitario')[:1]
+  )
+  ms_itens, pelos_itens = cronometrar(
+      lambda: dict(Produto.objects.annotate(preco_em=Subquery(ultimo_item)).values_list('id', 'preco_em')), repeticoes
+  )
+  ms_historico, pelo_historico = cronometrar(lambda: modulo.precos_em(momento), repeticoes)
+  linhas += [
+      ('tabela num momento, pelos itens: ms', round(ms_itens, 1)),
+      ('tabela num momento, pelo histórico: ms', round(ms_historico, 2)),
+      # O último preço vendido atrasa quando o produto mudou de preço e não vendeu desde então
+      ('produtos com último preço vendido ≠ tabela', sum(pelos_itens[pid] != preco for pid, preco in pelo_historico.items())),
+  ]
+
+  produto = lista[1]
+  ms_itens, _ = cronometrar(lambda: (
+      ItemVenda.objects.filter(produto=produto, venda__data_venda__lte=momento)
+      .order_by('-venda__data_venda').values_list('preco_unitario', flat=True).first()
+  ), 100)
+  ms_historico, _ = cronometrar(lambda: modulo.preco_em(produto.id, momento), 100)
+  linhas += [
+      ('preço de um produto num momento, pelos itens: ms', round(ms_itens, 3)),
+      ('preço de um produto num momento, pelo histórico: ms', round(ms_historico, 3)),
+  ]
+
+  # Evolução mensal: itens do produto agrupados por mês contra histórico + relatórios
+  for descricao, escolhido in (('mais vendido', lista[0]), ('comum', produto)):
+      ms_itens, _ = cronometrar(lambda: list(
+          ItemVenda.objects.filter(produto=escolhido, venda__finalizada=True)
+          .annotate(mes=TruncMonth('venda__data_venda')).values('mes')
+          .annotate(quantidade=Sum('quantidade'), centavos=Sum('subtotal', output_field=BigIntegerField()))
+          .order_by('mes')
+      ), repeticoes)
+      ms_historico, _ = cronometrar(lambda: modulo.evolucao_precos(escolhido, primeiro, ultimo), repeticoes)
+      linhas += [
+          (f'evolução de {dias} dias, {descricao}, pelos itens: ms', round(ms_itens, 1)),
+          (f'evolução de {dias} dias, {descricao}, histórico + relatórios: ms', round(ms_historico, 1)),
+      ]
+
+  # Reajuste de todos os produtos: em lote contra save() de cada um
+  ms_lote, _ = cronometrar(lambda: modulo.reajustar_precos(Produto.objects.all(), Decimal('5')))
+
+  def um_a_um():
+      for produto in Produto.objects.all():
+          produto.preco = (produto.preco * Decimal('1.05')).quantize(Decimal('0.01'))
+          produto.save()
+  ms_um_a_um, _ = cronometrar(um_a_um)
+  linhas += [
+      (f'reajuste de {produtos} produtos em lote: ms', round(ms_lote, 1)),
+      (f'reajuste de {produtos} produtos com save(): ms', round(ms_um_a_um, 1)),
+  ]
+  return linhas
+
+
+@cenario('formatos')
+def formatos(produtos=2000, repeticoes=3, **opcoes):
+  """Cada renderizador de utils/formatos medido sozinho sobre o mesmo
+  relatório diário, e os quatro formatos com uma leitura só (zip) contra
+  uma leitura por formato"""
+  from django.db import connection
+  from django.test.utils import CaptureQueriesContext
+  from vendas.models import RelatorioDiario
+  from vendas.utils import formatos as modulo
+
+  dia = date(2000, 1, 1)
+  RelatorioDiario.objects.create(
+      data=dia,
+      total_vendido=produtos * 12,
+      numero_vendas=produtos // 2,
+      total_itens=produtos * 3,
+      resumo_produtos={f'Produto {i:05d}': {'quantidade': 3, 'total': 12.0} for i in range(produtos)}
+  )
+  todos = list(modulo.TIPOS_CONTEUDO)
+
+  ms_leitura, dados = cronometrar(lambda: modulo.dados_diario(dia), repeticoes)
+  linhas = [('linhas no relatório', produtos), ('leitura para o modelo tipado: ms', round(ms_leitura, 2))]
+  for formato in todos:
+      ms, conteudo = cronometrar(lambda: modulo.renderizar(dados, formato), repeticoes)
+      linhas.append((f'{formato}: ms', round(ms, 2)))
+      linhas.append((f'{formato}: bytes', len(conteudo)))
+
+  def um_por_formato():
+      return [modulo.renderizar(modulo.dados_diario(dia), formato) for formato in todos]
+
+  with CaptureQueriesContext(connection) as separados:
+      ms_separados, _ = cronometrar(um_por_formato, repeticoes)
+  with CaptureQueriesContext(connection) as juntos:
+      ms_juntos, (conteudo, _, _) = cronometrar(lambda: modulo.exportar(modulo.dados_diario(dia), todos), repeticoes)
+  linhas += [
+      ('4 formatos, uma leitura por formato: ms', round(ms_separados, 1)),
+      ('4 formatos, uma leitura por formato: consultas', len(separados) // repeticoes),
+      ('4 formatos, uma leitura (zip): ms', round(ms_juntos, 1)),
+      ('4 formatos, uma leitura (zip): consultas', len(juntos) // repeticoes),
+      ('bytes do zip', len(conteudo)),
+  ]
+  return linhas
+
+
+@cenario('extrato')
+def extrato(vendas=300000, tamanho=50, repeticoes=5, **opcoes):
+  """Página do extrato de vendas em profundidades crescentes: OFFSET contra
+  cursor em (data_venda, id), com itens e produtos pré-carregados"""
+  from datetime import datetime, time as hora, timedelta
+  from django.db import connection
+  from django.db.models import Prefetch
+  from django.test.utils import CaptureQueriesContext
+  from django.utils import timezone
+  from vendas.models import ItemVenda, Produto, Venda
+  from vendas.utils import extrato as modulo
+
+  produtos = Produto.objects.bulk_create([
+      Produto(nome=f'Produto {i:03d}', preco='2.50', quantidade_estoque=10 ** 6) for i in range(100)
+  ])
+  inicio = timezone.make_aware(datetime.combine(date(2000, 1, 1), hora(8)))
+  for lote in range(0, vendas, 10000):
+      lista_vendas = Venda.objects.bulk_create([
+          # Várias vendas por minuto: o id desempata a ordem
+          Venda(data_venda=inicio + timedelta(seconds=20 * (numero // 3)), total='5.00', finalizada=True)
+          for numero in range(lote, min(lote + 10000, vendas))
+      ])
+      ItemVenda.objects.bulk_create([
+          ItemVenda(venda=venda, produto=produtos[venda.id % 100], quantidade=2, preco_unitario='2.50', subtotal='5.00')
+          for venda in lista_vendas
+      ])
+
+  filtros = modulo.Filtros()
+  ordenadas = filtros.vendas().select_related('loja').order_by('-data_venda', '-id')
+  itens = Prefetch('itens', queryset=ItemVenda.objects.select_related('produto').order_by('id'))
+  linhas = [('vendas', vendas)]
+  if connection.vendor == 'sqlite':
+      # A ordem tem que vir do índice (sem "USE TEMP B-TREE FOR ORDER BY")
+      sql, parametros = ordenadas[:1].query.sql_with_params()
+      with connection.cursor() as cursor:
+          cursor.execute('EXPLAIN QUERY PLAN ' + sql, parametros)
+          linhas.append(('plano (SQLite)', ' / '.join(linha[-1] for linha in cursor.fetchall())))
+
+  for numero_pagina in (1, 100, 1000, vendas // tamanho):
+      deslocamento = (numero_pagina - 1) * tamanho
+      ms_offset, _ = cronometrar(
+          lambda: list(ordenadas.prefetch_related(itens)[deslocamento:deslocamento + tamanho]), repeticoes
+      )
+      cursor_pagina = None
+      if deslocamento:
+          cursor_pagina = modulo.codificar_cursor(ordenadas[deslocamento - 1])
+      with CaptureQueriesContext(connection) as consultas:
+          ms_cursor, resultado = cronometrar(lambda: modulo.pagina(filtros, depois=cursor_pagina, tamanho=tamanho),
+                                             repeticoes)
+      linhas += [
+          (f'página {numero_pagina}, OFFSET: ms', round(ms_offset, 2)),
+          (f'página {numero_pagina}, cursor: ms', round(ms_cursor, 2)),
+      ]
+  linhas.append(('consultas por página (cursor)', len(consultas) // repeticoes))
+  linhas.append(('vendas na última página', len(resultado['vendas'])))
+  return linhas
@@ -0,0 +1,139 @@
+# utils/cache_http.py
+import hashlib
+from datetime import date
+from functools import wraps
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .periodos import dia_fechado, intervalo_do_dia, intervalo_do_mes, mes_fechado
+
+
+class VersaoRelatorio:
+  """Validadores HTTP de um relatório: ETag, Last-Modified e se o período já fechou"""
+
+  def __init__(self, partes, ultima_modificacao, fechado):
+    conteudo = '|'.join(str(parte) for parte in partes)
+    self.etag = quote_etag(hashlib.sha1(conteudo.encode()).hexdigest())
+    self.ultima_modificacao = ultima_modificacao
+    self.fechado = fechado
+
+  def aplicar(self, response):
+    """Escreve os cabeçalhos de cache na resposta"""
+    response['ETag'] = self.etag
+    if self.ultima_modificacao is not None:
+        response['Last-Modified'] = http_date(self.ultima_modificacao.timestamp())
+
+    # Sempre revalidado: mesmo um período fechado muda com devoluções e
+    # com verificar_consistencia --corrigir, e a ETag acompanha. O que o
+    # fechamento dá é o 304 antes de reprocessar (cache_por_versao) e a
+    # resposta poder ficar em caches compartilhados
+    if self.fechado:
+        patch_cache_control(response, no_cache=True, public=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
+
+  def resposta_condicional(self, request):
+    """304 (ou 412) se o cliente já tem esta versão; None caso contrário"""
+    # Last-Modified tem precisão de segundos
+    timestamp = int(self.ultima_modificacao.timestamp()) if self.ultima_modificacao else None
+    response = get_conditional_response(request, etag=self.etag, last_modified=timestamp)
+    if response is not None:
+        self.aplicar(response)
+    return response
+
+
+def versao_relatorio_diario(request, ano, mes, dia):
+  """Versão derivada de gerado_em e dos totais do RelatorioDiario (uma consulta)"""
+  from vendas.models import RelatorioDiario
+
+  data = date(ano, mes, dia)
+  relatorio = (
+      RelatorioDiario.objects.filter(data=data, loja_id=request.GET.get('loja') or None)
+      .values('gerado_em', 'total_vendido', 'numero_vendas')
+      .first()
+  )
+  if relatorio is None:
+      return None
+
+  # Antes de ser gerado após o fim do dia, o relatório ainda pode mudar
+  fechado = dia_fechado(data) and relatorio['gerado_em'] >= intervalo_do_dia(data)[1]
+  return VersaoRelatorio(
+      [request.resolver_match.url_name, request.GET.get('formato', ''), request.GET.get('loja', ''), data,
+       relatorio['gerado_em'].isoformat(), relatorio['total_vendido'], relatorio['numero_vendas']],
+      relatorio['gerado_em'],
+      fechado,
+  )
+
+
+def versao_relatorio_mensal(request, ano=None, mes=None):
+  """Versão derivada dos relatórios diários do mês (uma consulta, no
+  máximo 31 linhas)
+
+  Sem ano/mês na URL, usa os parâmetros ?ano=&mes= (buscar_relatorios_mes).
+  O mês só está fechado quando todos os diários também estão, como em
+  versao_relatorio_diario: um dia gerado antes de terminar ainda muda.
+  """
+  from vendas.models import RelatorioDiario
+
+  if ano is None or mes is None:
+      ano, mes = int(request.GET.get('ano')), int(request.GET.get('mes'))
+
+  diarios = list(
+      RelatorioDiario.objects.filter(loja_id=request.GET.get('loja') or None, data__range=intervalo_do_mes(ano, mes))
+      .values_list('data', 'gerado_em', 'total_vendido')
+  )
+  if not diarios:
+      return None
+
+  ultima = max(gerado_em for _, gerado_em, _ in diarios)
+  fechado = mes_fechado(ano, mes) and all(
+      gerado_em >= intervalo_do_dia(data)[1] for data, gerado_em, _ in diarios
+  )
+  return VersaoRelatorio(
+      [request.resolver_match.url_name, request.GET.get('formato', ''), request.GET.get('loja', ''), ano, mes,
+       ultima.isoformat(), len(diarios), sum(total for _, _, total in diarios)],
+      ultima,
+      fechado,
+  )
+
+
+def cache_por_versao(calcular_versao):
+  """Decorator de view com ETag/Last-Modified e Cache-Control por período
+
+  Para períodos fechados a requisição condicional é respondida com 304 antes
+  de qualquer reprocessamento; nos abertos a versão é conferida depois que a
+  view atualizou o relatório.
+  """
+  def decorator(view):
+      @wraps(view)
+      def wrapper(request, *args, **kwargs):
+          if request.method not in ('GET', 'HEAD'):
+              return view(request, *args, **kwargs)
+
+          try:
+              versao = calcular_versao(request, *args, **kwargs)
+          except (ValueError, TypeError):
+              # Parâmetros inválidos: a própria view devolve o erro
+              versao = None
+
+          if versao is not None and versao.fechado:
+              response = versao.resposta_condicional(request)
+              if response is not None:
+                  return response
+
+          response = view(request, *args, **kwargs)
+          if response.status_code != 200:
+              return response
+
+          versao = calcular_versao(request, *args, **kwargs)
+          if versao is None:
+              return response
+
+          nao_modificado = versao.resposta_condicional(request)
+          if nao_modificado is not None:
+              return nao_modificado
+          return versao.aplicar(response)
+      return wrapper
+  return decorator
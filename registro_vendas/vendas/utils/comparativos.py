@@ -0,0 +1,188 @@
+# utils/comparativos.py
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models
+from django.db.models import Sum
+
+from .periodos import dia_fechado, intervalo_do_mes
+
+# Janelas móveis aceitas (em dias)
+JANELAS = (7, 30)
+
+
+def invalidar_cache_comparativos():
+  """Descarta comparativos em cache (usado quando vendas passadas mudam)
+
+  Como em invalidar_cache_ranking: valor novo no cache compartilhado,
+  visto por todos os workers.
+  """
+  cache.set('comparativo:versao', time.time_ns(), None)
+
+
+def _em_cache(partes, data_fim, calcular):
+  """Guarda o resultado quando todos os períodos envolvidos já terminaram"""
+  if not dia_fechado(data_fim):
+      return calcular()
+
+  versao = cache.get_or_set('comparativo:versao', time.time_ns, None)
+  chave = 'comparativo:' + ':'.join(str(parte) for parte in (versao, *partes))
+  dados = cache.get(chave)
+  if dados is None:
+      dados = calcular()
+      timeout = getattr(settings, 'RELATORIOS_CACHE_PERIODO_FECHADO', 60 * 60 * 24 * 30)
+      cache.set(chave, dados, timeout)
+  return dados
+
+
+def totais_diarios(data_inicio, data_fim, loja=None):
+  """{data: (centavos, vendas, itens)} do intervalo, em uma consulta agrupada
+
+  Lê os baldes de VendasPorHora (mantidos a cada venda e devolução), então
+  não depende de o relatório diário de cada dia já ter sido gerado.
+  """
+  from vendas.models import VendasPorHora
+
+  baldes = VendasPorHora.objects.filter(data__gte=data_inicio, data__lte=data_fim)
+  if loja is not None:
+      baldes = baldes.filter(loja=loja)
+
+  linhas = (
+      baldes
+      .values('data')
+      .annotate(
+          centavos=Sum('total', output_field=models.BigIntegerField()),
+          vendas=Sum('numero_vendas'),
+          itens=Sum('total_itens'),
+      )
+      .order_by()
+  )
+  return {linha['data']: (linha['centavos'], linha['vendas'], linha['itens']) for linha in linhas}
+
+
+def _resumo(totais, data_inicio, data_fim):
+  centavos = vendas = itens = 0
+  for data, (c, v, i) in totais.items():
+      if data_inicio <= data <= data_fim:
+          centavos += c
+          vendas += v
+          itens += i
+  return {
+      'inicio': data_inicio.strftime('%d/%m/%Y'),
+      'fim': data_fim.strftime('%d/%m/%Y'),
+      'total': centavos / 100,
+      'vendas': vendas,
+      'itens': itens,
+  }
+
+
+def _variacao(atual, anterior):
+  diferenca = round(atual['total'] - anterior['total'], 2)
+  percentual = round(diferenca / anterior['total'] * 100, 1) if anterior['total'] else None
+  return {'diferenca': diferenca, 'variacao_pct': percentual}
+
+
+def comparar_periodos(atual, anteriores, loja=None):
+  """Compara o período `atual` com cada um de `anteriores` ({nome: (inicio, fim)})
+
+  Todos os totais saem de uma única consulta sobre o intervalo que cobre
+  todos os períodos.
+  """
+  periodos = [atual, *anteriores.values()]
+  totais = totais_diarios(min(p[0] for p in periodos), max(p[1] for p in periodos), loja)
+
+  resumo_atual = _resumo(totais, *atual)
+  comparacoes = {}
+  for nome, (inicio, fim) in anteriores.items():
+      resumo = _resumo(totais, inicio, fim)
+      comparacoes[nome] = {**resumo, **_variacao(resumo_atual, resumo)}
+
+  return {'atual': resumo_atual, 'comparacoes': comparacoes}
+
+
+def _mes_anterior(ano, mes, meses=1):
+  indice = ano * 12 + (mes - 1) - meses
+  return indice // 12, indice % 12 + 1
+
+
+def comparar_dia(data, loja=None):
+  """Dia contra o dia anterior e o mesmo dia da semana passada"""
+  def calcular():
+      return comparar_periodos((data, data), {
+          'dia_anterior': (data - timedelta(days=1),) * 2,
+          'semana_anterior': (data - timedelta(days=7),) * 2,
+      }, loja)
+  return _em_cache(['dia', loja.id if loja else '-', data.isoformat()], data, calcular)
+
+
+def comparar_mes(ano, mes, loja=None):
+  """Mês contra o mês anterior e o mesmo mês do ano anterior"""
+  atual = intervalo_do_mes(ano, mes)
+
+  def calcular():
+      return comparar_periodos(atual, {
+          'mes_anterior': intervalo_do_mes(*_mes_anterior(ano, mes)),
+          'ano_anterior': intervalo_do_mes(ano - 1, mes),
+      }, loja)
+  return _em_cache(['mes', loja.id if loja else '-', ano, mes], atual[1], calcular)
+
+
+def comparar_janela(data_fim, dias, loja=None):
+  """Últimos `dias` dias até data_fim contra os `dias` anteriores e contra a
+  mesma janela 52 semanas antes (mantém os dias da semana alinhados)"""
+  if dias not in JANELAS:
+      raise ValueError(f'Janela inválida: {dias}')
+
+  inicio = data_fim - timedelta(days=dias - 1)
+
+  def calcular():
+      return comparar_periodos((inicio, data_fim), {
+          'periodo_anterior': (inicio - timedelta(days=dias), inicio - timedelta(days=1)),
+          'ano_anterior': (inicio - timedelta(weeks=52), data_fim - timedelta(weeks=52)),
+      }, loja)
+  return _em_cache(['janela', loja.id if loja else '-', data_fim.isoformat(), dias], data_fim, calcular)
+
+
+def serie_mensal(ano, mes, meses=24, loja=None):
+  """Os `meses` meses até ano/mês, cada um com o mesmo mês do ano anterior
+
+  Uma consulta cobre os meses da série e os 12 anteriores a ela; os dias
+  são somados por mês em uma passada só.
+  """
+  if not 1 <= meses <= 120:
+      raise ValueError(f'Quantidade de meses inválida: {meses}')
+
+  data_fim = intervalo_do_mes(ano, mes)[1]
+
+  def calcular():
+      primeiro = _mes_anterior(ano, mes, meses - 1)
+      inicio_consulta = intervalo_do_mes(primeiro[0] - 1, primeiro[1])[0]
+
+      por_mes = {}
+      for data, (centavos, vendas, itens) in totais_diarios(inicio_consulta, data_fim, loja).items():
+          soma = por_mes.setdefault((data.year, data.month), [0, 0, 0])
+          soma[0] += centavos
+          soma[1] += vendas
+          soma[2] += itens
+
+      serie = []
+      for deslocamento in range(meses - 1, -1, -1):
+          a, m = _mes_anterior(ano, mes, deslocamento)
+          centavos, vendas, itens = por_mes.get((a, m), (0, 0, 0))
+          atual = {'total': centavos / 100}
+          anterior = {'total': por_mes.get((a - 1, m), (0, 0, 0))[0] / 100}
+          serie.append({
+              'ano': a,
+              'mes': m,
+              'rotulo': f'{m:02d}/{a}',
+              'total': atual['total'],
+              'vendas': vendas,
+              'itens': itens,
+              'total_ano_anterior': anterior['total'],
+              **_variacao(atual, anterior),
+          })
+      return serie
+
+  return _em_cache(['serie', loja.id if loja else '-', ano, mes, meses], data_fim, calcular)
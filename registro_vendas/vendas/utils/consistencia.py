@@ -0,0 +1,318 @@
+# utils/consistencia.py
+"""Verificação dos agregados contra as vendas
+
+Os relatórios diários, os mensais e Produto.quantidade_vendidos são
+mantidos por caminhos diferentes (gerar_resumo, gerar_consolidacao,
+finalizar_venda e as devoluções). Aqui eles são recalculados das vendas
+com consultas agrupadas (vendas por loja e dia, itens por loja, dia e
+produto, itens por produto), sem percorrer relatório por relatório, e
+comparados com o que está gravado.
+
+Só entram dias e meses já encerrados: os de hoje ainda estão sendo
+atualizados. Itens arquivados entram pelo arquivo morto.
+"""
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import BigIntegerField, Count, Max, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from vendas.campos import de_centavos, para_centavos
+from . import arquivo, snapshots
+from .periodos import intervalo_de_datas, intervalo_do_mes, mes_fechado
+
+# Registros gravados por bulk_update/bulk_create
+LOTE = 1000
+
+
+@dataclass(frozen=True)
+class Divergencia:
+  """Um campo gravado que não bate com o recalculado das vendas"""
+  tipo: str
+  chave: tuple
+  campo: str
+  gravado: object
+  calculado: object
+
+  def __str__(self):
+      if self.tipo == 'produto':
+          descricao = f'Produto {self.chave[0]}'
+      else:
+          loja = f'loja {self.chave[0]}' if self.chave[0] else 'consolidado'
+          periodo = self.chave[1].strftime('%d/%m/%Y') if self.tipo == 'diario' else f'{self.chave[2]:02d}/{self.chave[1]}'
+          descricao = f'Relatório {"diário" if self.tipo == "diario" else "mensal"} {periodo} ({loja})'
+      if self.campo == 'relatorio':
+          return f'{descricao}: não gerado'
+      return f'{descricao}: {self.campo} gravado {self.gravado}, calculado {self.calculado}'
+
+
+@dataclass
+class _Dia:
+  centavos: int = 0
+  vendas: int = 0
+  itens: int = 0
+  ultima_venda: int = None
+  produtos: dict = field(default_factory=dict)
+
+  def somar_produto(self, nome, quantidade, centavos):
+      anterior = self.produtos.get(nome, (0, 0))
+      self.produtos[nome] = (anterior[0] + quantidade, anterior[1] + centavos)
+      self.itens += quantidade
+
+  def resumo(self):
+      """No formato de RelatorioDiario.resumo_produtos"""
+      return {
+          nome: {'quantidade': quantidade, 'total': centavos / 100}
+          for nome, (quantidade, centavos) in sorted(self.produtos.items())
+      }
+
+
+def intervalo_verificavel(data_inicio=None, data_fim=None):
+  """Intervalo ampliado para meses inteiros e limitado a ontem
+
+  Sem datas: do mês da primeira venda até ontem. None se não há vendas.
+  """
+  from vendas.models import Venda
+
+  ontem = timezone.localdate() - timedelta(days=1)
+  if data_inicio is None:
+      primeira = Venda.objects.order_by('data_venda').values_list('data_venda', flat=True).first()
+      if primeira is None:
+          return None
+      data_inicio = timezone.localdate(primeira)
+  data_fim = min(data_fim or ontem, ontem)
+  inicio = data_inicio.replace(day=1)
+  fim = min(intervalo_do_mes(data_fim.year, data_fim.month)[1], ontem)
+  if inicio > fim:
+      return None
+  return inicio, fim
+
+
+def _recalcular_dias(data_inicio, data_fim):
+  """{(loja_id, data): _Dia}, com loja None para o consolidado (3 consultas)"""
+  from vendas.models import ItemVenda, Venda
+
+  inicio, fim = intervalo_de_datas(data_inicio, data_fim)
+  dias = {}
+
+  def somar(loja_id, dia):
+      # A venda entra no relatório da loja e no consolidado
+      chaves = [(None, dia)] if loja_id is None else [(None, dia), (loja_id, dia)]
+      return [dias.setdefault(chave, _Dia()) for chave in chaves]
+
+  vendas = (
+      Venda.objects.filter(finalizada=True, data_venda__gte=inicio, data_venda__lt=fim)
+      .annotate(dia=TruncDate('data_venda'))
+      .values('loja_id', 'dia')
+      .annotate(centavos=Sum('total', output_field=BigIntegerField()), numero=Count('id'), ultima=Max('id'))
+      .values_list('loja_id', 'dia', 'centavos', 'numero', 'ultima')
+      .order_by()
+  )
+  for loja_id, dia, centavos, numero, ultima in vendas:
+      for agregado in somar(loja_id, dia):
+          agregado.centavos += centavos
+          agregado.vendas += numero
+          agregado.ultima_venda = max(agregado.ultima_venda or 0, ultima)
+
+  # Itens devolvidos por inteiro ficam com quantidade zero (como em gerar_resumo)
+  itens = (
+      ItemVenda.objects.filter(venda__finalizada=True, venda__data_venda__gte=inicio, venda__data_venda__lt=fim,
+                               quantidade__gt=0)
+      .annotate(dia=TruncDate('venda__data_venda'))
+      .values('venda__loja_id', 'dia', 'produto__nome')
+      .annotate(quantidade_total=Sum('quantidade'), centavos=Sum('subtotal', output_field=BigIntegerField()))
+      .values_list('venda__loja_id', 'dia', 'produto__nome', 'quantidade_total', 'centavos')
+      .order_by()
+  )
+  for loja_id, dia, nome, quantidade, centavos in [*itens, *arquivo.por_dia_e_produto(data_inicio, data_fim)]:
+      for agregado in somar(loja_id, dia):
+          agregado.somar_produto(nome, quantidade, centavos)
+
+  return dias
+
+
+def _recalcular_produtos():
+  """{produto_id: quantidade vendida} de todo o histórico (uma consulta)"""
+  from vendas.models import ItemVenda
+
+  vendidos = dict(
+      ItemVenda.objects.filter(venda__finalizada=True)
+      .values('produto_id')
+      .annotate(quantidade_total=Sum('quantidade'))
+      .values_list('produto_id', 'quantidade_total')
+      .order_by()
+  )
+  for produto_id, (_, quantidade, _) in arquivo.por_produto(date.min, date.max).items():
+      vendidos[produto_id] = vendidos.get(produto_id, 0) + quantidade
+  return vendidos
+
+
+def _verificar_dias(dias, inicio, fim, divergencias, correcoes):
+  from vendas.models import RelatorioDiario
+
+  gravados = {
+      (loja_id, data): (relatorio_id, para_centavos(total), numero, itens, resumo)
+      for relatorio_id, loja_id, data, total, numero, itens, resumo in
+      RelatorioDiario.objects.filter(data__gte=inicio, data__lte=fim)
+      .values_list('id', 'loja_id', 'data', 'total_vendido', 'numero_vendas', 'total_itens', 'resumo_produtos')
+  }
+  for chave in sorted(set(dias) | set(gravados), key=lambda chave: (chave[1], chave[0] or 0)):
+      calculado = dias.get(chave, _Dia())
+      gravado = gravados.get(chave)
+      if gravado is None:
+          if calculado.vendas:
+              divergencias.append(Divergencia('diario', chave, 'relatorio', None, 'ausente'))
+              correcoes[chave] = (None, calculado)
+          continue
+
+      relatorio_id, centavos, numero, itens, resumo = gravado
+      resumo = {nome: (dados['quantidade'], para_centavos(dados['total'])) for nome, dados in resumo.items()}
+      diferencas = [
+          (campo, valor_gravado, valor_calculado)
+          for campo, valor_gravado, valor_calculado in (
+              ('total_vendido', de_centavos(centavos), de_centavos(calculado.centavos)),
+              ('numero_vendas', numero, calculado.vendas),
+              ('total_itens', itens, calculado.itens),
+          )
+          if valor_gravado != valor_calculado
+      ]
+      if resumo != calculado.produtos:
+          nomes = sorted(set(resumo) ^ set(calculado.produtos) | {
+              nome for nome in set(resumo) & set(calculado.produtos) if resumo[nome] != calculado.produtos[nome]
+          })
+          diferencas.append(('resumo_produtos', f'{len(resumo)} produtos',
+                             f'{len(calculado.produtos)} produtos (diferem: {", ".join(nomes)})'))
+      for campo, valor_gravado, valor_calculado in diferencas:
+          divergencias.append(Divergencia('diario', chave, campo, valor_gravado, valor_calculado))
+      if diferencas:
+          correcoes[chave] = (relatorio_id, calculado)
+
+
+def _verificar_meses(dias, inicio, fim, divergencias, correcoes):
+  """Mensais: a soma dos dias com vendas de cada mês encerrado"""
+  from vendas.models import RelatorioMensal
+
+  meses = {}
+  for (loja_id, data), calculado in dias.items():
+      if calculado.vendas:
+          centavos, com_vendas = meses.get((loja_id, data.year, data.month), (0, 0))
+          meses[(loja_id, data.year, data.month)] = (centavos + calculado.centavos, com_vendas + 1)
+
+  gravados = {
+      (loja_id, ano, mes): (relatorio_id, para_centavos(total), com_vendas)
+      for relatorio_id, loja_id, ano, mes, total, com_vendas in
+      RelatorioMensal.objects.filter(ano__gte=inicio.year, ano__lte=fim.year)
+      .values_list('id', 'loja_id', 'ano', 'mes', 'total_mensal', 'dias_com_vendas')
+  }
+  for chave in sorted(set(meses) | set(gravados), key=lambda chave: (chave[1], chave[2], chave[0] or 0)):
+      _, ano, mes = chave
+      if not mes_fechado(ano, mes) or not inicio <= date(ano, mes, 1) <= fim:
+          continue
+      centavos, com_vendas = meses.get(chave, (0, 0))
+      gravado = gravados.get(chave)
+      if gravado is None:
+          divergencias.append(Divergencia('mensal', chave, 'relatorio', None, 'ausente'))
+          correcoes[chave] = (None, centavos, com_vendas)
+          continue
+
+      relatorio_id, centavos_gravados, com_vendas_gravados = gravado
+      diferencas = [
+          (campo, valor_gravado, valor_calculado)
+          for campo, valor_gravado, valor_calculado in (
+              ('total_mensal', de_centavos(centavos_gravados), de_centavos(centavos)),
+              ('dias_com_vendas', com_vendas_gravados, com_vendas),
+          )
+          if valor_gravado != valor_calculado
+      ]
+      for campo, valor_gravado, valor_calculado in diferencas:
+          divergencias.append(Divergencia('mensal', chave, campo, valor_gravado, valor_calculado))
+      if diferencas:
+          correcoes[chave] = (relatorio_id, centavos, com_vendas)
+
+
+def _verificar_produtos(divergencias, correcoes):
+  from vendas.models import Produto
+
+  vendidos = _recalcular_produtos()
+  for produto_id, quantidade in Produto.objects.order_by('id').values_list('id', 'quantidade_vendidos'):
+      calculado = vendidos.get(produto_id, 0)
+      if quantidade != calculado:
+          divergencias.append(Divergencia('produto', (produto_id,), 'quantidade_vendidos', quantidade, calculado))
+          correcoes[produto_id] = calculado
+
+
+def verificar(data_inicio=None, data_fim=None, produtos=True):
+  """Compara os agregados gravados com os recalculados das vendas
+
+  Devolve (divergências, correções), onde correções é o que `corrigir`
+  precisa para gravar os valores certos. Produto.quantidade_vendidos é
+  acumulado, então é conferido contra todo o histórico.
+  """
+  divergencias = []
+  correcoes = {'diarios': {}, 'mensais': {}, 'produtos': {}}
+
+  intervalo = intervalo_verificavel(data_inicio, data_fim)
+  if intervalo is not None:
+      dias = _recalcular_dias(*intervalo)
+      _verificar_dias(dias, *intervalo, divergencias, correcoes['diarios'])
+      _verificar_meses(dias, *intervalo, divergencias, correcoes['mensais'])
+  if produtos:
+      _verificar_produtos(divergencias, correcoes['produtos'])
+
+  return divergencias, correcoes
+
+
+def corrigir(correcoes):
+  """Grava os valores recalculados em lote (bulk_update/bulk_create)"""
+  from vendas.models import Produto, RelatorioDiario, RelatorioMensal
+
+  agora = timezone.now()
+  meses_alterados = set()
+  meses_novos = set()
+
+  with transaction.atomic():
+      novos, alterados = [], []
+      for (loja_id, data), (relatorio_id, calculado) in correcoes['diarios'].items():
+          relatorio = RelatorioDiario(
+              id=relatorio_id, loja_id=loja_id, data=data,
+              total_vendido=de_centavos(calculado.centavos), numero_vendas=calculado.vendas,
+              total_itens=calculado.itens, resumo_produtos=calculado.resumo(),
+              # bulk_update não passa pelo auto_now: a versão do cache HTTP muda aqui
+              gerado_em=agora, vendas_ate_id=calculado.ultima_venda
+          )
+          (alterados if relatorio_id else novos).append(relatorio)
+          meses_alterados.add((loja_id, data.replace(day=1)))
+          if not relatorio_id:
+              meses_novos.add(data.replace(day=1))
+      RelatorioDiario.objects.bulk_create(novos, batch_size=LOTE)
+      RelatorioDiario.objects.bulk_update(
+          alterados,
+          ['total_vendido', 'numero_vendas', 'total_itens', 'resumo_produtos', 'gerado_em', 'vendas_ate_id'],
+          batch_size=LOTE
+      )
+
+      novos, alterados = [], []
+      for (loja_id, ano, mes), (relatorio_id, centavos, com_vendas) in correcoes['mensais'].items():
+          relatorio = RelatorioMensal(id=relatorio_id, loja_id=loja_id, ano=ano, mes=mes,
+                                      total_mensal=de_centavos(centavos), dias_com_vendas=com_vendas)
+          (alterados if relatorio_id else novos).append(relatorio)
+          meses_alterados.add((loja_id, date(ano, mes, 1)))
+      RelatorioMensal.objects.bulk_create(novos, batch_size=LOTE)
+      RelatorioMensal.objects.bulk_update(alterados, ['total_mensal', 'dias_com_vendas'], batch_size=LOTE)
+
+      Produto.objects.bulk_update(
+          [Produto(id=produto_id, quantidade_vendidos=quantidade) for produto_id, quantidade in correcoes['produtos'].items()],
+          ['quantidade_vendidos'],
+          batch_size=LOTE
+      )
+
+      # Respostas do mês já materializadas saem; o próximo pedido as regrava
+      for loja_id, data in meses_alterados:
+          snapshots.descartar_mes(data, loja_id)
+      # Relatórios criados aqui têm vendas: o mês entra nos seletores
+      for data in meses_novos:
+          snapshots.registrar_periodo(data)
+
+  return {chave: len(valores) for chave, valores in correcoes.items()}
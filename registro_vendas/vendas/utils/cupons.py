@@ -0,0 +1,159 @@
+# utils/cupons.py
+"""Cupons de venda: texto para impressora térmica e PDF
+
+O layout de cada largura de bobina é montado uma vez (`layout`, em cache):
+as strings de formato já saem com as larguras das colunas calculadas, e
+montar um cupom é só preenchê-las. O PDF (utils/pdf.py) desenha as mesmas
+linhas em fonte monoespaçada, numa página da largura da bobina.
+
+Os itens chegam como (quantidade, nome, subtotal), o formato comum ao
+banco principal e ao arquivo morto (utils/arquivo.py).
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+
+from django.db.models import Q
+from django.utils import timezone
+
+# Colunas de uma bobina de 80 mm em fonte normal (as 40 do caderno)
+LARGURA = 40
+# 'R$ 99999.99'
+LARGURA_VALOR = 11
+
+
+@dataclass(frozen=True)
+class LayoutCupom:
+  largura: int
+  separador: str
+  centro: str
+  item: str
+
+  def par(self, esquerda, direita):
+      """Texto à esquerda e valor alinhado à direita na mesma linha"""
+      return esquerda + direita.rjust(self.largura - len(esquerda))
+
+
+@lru_cache(maxsize=None)
+def layout(largura=LARGURA):
+  """Layout compilado para `largura` colunas"""
+  # "02 Nome do produto          R$ 12.00"; nomes longos são cortados
+  largura_nome = largura - 3 - 1 - LARGURA_VALOR
+  return LayoutCupom(
+      largura=largura,
+      separador='-' * largura,
+      centro='{:^%d.%d}' % (largura, largura),
+      item='{:02d} {:<%d.%d} {:>%d}' % (largura_nome, largura_nome, LARGURA_VALOR),
+  )
+
+
+def texto(venda, itens, largura=LARGURA, segunda_via=False):
+  """Cupom da venda em texto; `itens` são (quantidade, nome, subtotal)"""
+  modelo = layout(largura)
+  linhas = [
+      modelo.centro.format(venda.loja.nome if venda.loja_id else 'Cupom de venda'),
+      modelo.par(f'Venda nº {venda.id}', timezone.localtime(venda.data_venda).strftime('%d/%m/%Y %H:%M')),
+  ]
+  if segunda_via:
+      linhas.append(modelo.centro.format('2ª via'))
+  linhas.append(modelo.separador)
+
+  total_itens = 0
+  soma = 0
+  for quantidade, nome, subtotal in itens:
+      linhas.append(modelo.item.format(quantidade, nome, f'R$ {subtotal:.2f}'))
+      total_itens += quantidade
+      soma += subtotal
+
+  linhas.append(modelo.separador)
+  # Devoluções parciais descontam do total da venda, não dos itens
+  if not venda.cancelada and soma > venda.total:
+      linhas.append(modelo.par('Devolvido', f'- R$ {soma - venda.total:.2f}'))
+  linhas.append(modelo.par('TOTAL', f'R$ {venda.total:.2f}'))
+  linhas.append(f'Itens: {total_itens}')
+  if venda.cancelada:
+      linhas.append(modelo.centro.format('VENDA CANCELADA'))
+  return '\n'.join(linhas)
+
+
+def _devolvidos(das_vendas):
+  """{item_id: (quantidade, valor)} devolvidos das vendas que passam no
+  filtro `das_vendas` (um Q sobre venda__...; uma consulta)
+
+  Devoluções descontam dos próprios itens; o cupom mostra o que foi vendido.
+  """
+  from django.db.models import BigIntegerField, Sum
+  from vendas.campos import de_centavos
+  from vendas.models import Devolucao
+
+  linhas = (
+      Devolucao.objects.filter(das_vendas)
+      .values('item_id')
+      .annotate(quantidade_total=Sum('quantidade'), centavos=Sum('valor', output_field=BigIntegerField()))
+      .values_list('item_id', 'quantidade_total', 'centavos')
+      .order_by()
+  )
+  return {item_id: (quantidade, de_centavos(centavos)) for item_id, quantidade, centavos in linhas}
+
+
+def _como_vendido(item_id, quantidade, nome, subtotal, devolvidos):
+  quantidade_devolvida, valor_devolvido = devolvidos.get(item_id, (0, 0))
+  return quantidade + quantidade_devolvida, nome, subtotal + valor_devolvido
+
+
+def da_venda(venda, largura=LARGURA, segunda_via=True):
+  """Cupom de uma venda gravada (itens do banco principal ou do arquivo)"""
+  from .arquivo import itens_da_venda
+
+  # Vendas com devolução nunca vão para o arquivo
+  devolvidos = {} if venda.itens_arquivados else _devolvidos(Q(venda_id=venda.id))
+  itens = [
+      _como_vendido(item.id, item.quantidade, item.produto_nome, item.subtotal, devolvidos)
+      for item in itens_da_venda(venda)
+  ]
+  return texto(venda, itens, largura, segunda_via)
+
+
+def do_intervalo(data_inicio, data_fim, loja=None, largura=LARGURA):
+  """Cupons (2ª via) das vendas do intervalo, em ordem de venda (as
+  canceladas também, marcadas)
+
+  Três consultas no banco principal (vendas, itens e devoluções) e uma no
+  arquivo para as vendas com itens arquivados, qualquer que seja o número
+  de vendas. Itens e devoluções repetem o filtro das vendas num join, em
+  vez de uma lista de ids que passaria do limite de parâmetros do SQLite.
+  """
+  from vendas.models import ItemVenda, Venda
+  from .arquivo import itens_das_vendas
+  from .periodos import intervalo_de_datas
+
+  inicio, fim = intervalo_de_datas(data_inicio, data_fim)
+  vendas = Venda.objects.filter(Q(finalizada=True) | Q(cancelada=True), data_venda__gte=inicio, data_venda__lt=fim)
+  if loja is not None:
+      vendas = vendas.filter(loja=loja)
+  vendas = list(vendas.select_related('loja').order_by('data_venda', 'id'))
+
+  itens = itens_das_vendas(venda.id for venda in vendas if venda.itens_arquivados)
+  # As mesmas vendas, vistas dos itens: só as que ainda têm itens aqui
+  no_banco = (
+      (Q(venda__finalizada=True) | Q(venda__cancelada=True))
+      & Q(venda__data_venda__gte=inicio, venda__data_venda__lt=fim, venda__itens_arquivados=False)
+  )
+  if loja is not None:
+      no_banco &= Q(venda__loja=loja)
+  devolvidos = _devolvidos(no_banco)
+  linhas = (
+      ItemVenda.objects.filter(no_banco)
+      .order_by('id')
+      .values_list('id', 'venda_id', 'quantidade', 'produto__nome', 'subtotal')
+  )
+  for item_id, venda_id, quantidade, nome, subtotal in linhas:
+      itens.setdefault(venda_id, []).append(_como_vendido(item_id, quantidade, nome, subtotal, devolvidos))
+
+  return [texto(venda, itens.get(venda.id, []), largura, segunda_via=True) for venda in vendas]
+
+
+def em_pdf(cupons):
+  """PDF dos cupons, um por página (o ReportLab só é carregado aqui)"""
+  from .pdf import pdf_cupons
+
+  return pdf_cupons(cupons)
@@ -0,0 +1,159 @@
+# utils/devolucoes.py
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from vendas.campos import para_centavos, somar_centavos
+from .ao_vivo import publicar_venda
+from .comparativos import invalidar_cache_comparativos
+from .ranking import invalidar_cache_ranking
+from .snapshots import descartar_mes
+
+
+def cancelar_venda(venda_id, motivo=''):
+  """Cancela a venda inteira: devolve o estoque e tira a venda dos relatórios"""
+  return _estornar(venda_id, None, motivo)
+
+
+def devolver_itens(venda_id, quantidades, motivo=''):
+  """Devolve parte dos itens de uma venda ({item_id: quantidade})
+
+  Se tudo o que restava for devolvido, a venda é cancelada.
+  """
+  if not quantidades:
+      raise ValueError('Nenhum item para devolver')
+  return _estornar(venda_id, quantidades, motivo)
+
+
+def _estornar(venda_id, quantidades, motivo):
+  """Aplica a devolução como deltas negativos em tudo que foi somado na venda
+
+  Estoque, vendidos do produto, relatórios diário e mensal (consolidado e da
+  loja), vendas por hora e turno de caixa (se ainda aberto) recebem só a
+  diferença, sem regenerar nada. Tudo na mesma transação, com a venda
+  travada.
+  """
+  from vendas.models import (
+    Devolucao, EstoqueLoja, ItemVenda, Produto, RelatorioDiario, RelatorioMensal, SessaoCaixa, Venda,
+    VendasPorHora
+  )
+
+  with transaction.atomic():
+      venda = Venda.objects.select_for_update().get(id=venda_id)
+      if not venda.finalizada:
+          raise ValueError(f'A venda {venda.id} não está finalizada ou já foi cancelada')
+      if venda.itens_arquivados:
+          # Os itens estão no arquivo morto (utils/arquivo.py) e Devolucao
+          # aponta para o ItemVenda; sem eles não há o que descontar
+          raise ValueError(f'Os itens da venda {venda.id} foram arquivados; ela não pode mais ser devolvida')
+
+      itens = {item.id: item for item in venda.itens.select_related('produto')}
+      if quantidades is None:
+          quantidades = {item.id: item.quantidade for item in itens.values() if item.quantidade > 0}
+
+      devolvidos = []
+      for item_id, quantidade in quantidades.items():
+          item = itens.get(int(item_id))
+          quantidade = int(quantidade)
+          if item is None:
+              raise ValueError(f'Item {item_id} não pertence à venda {venda.id}')
+          if not 0 < quantidade <= item.quantidade:
+              raise ValueError(f'Quantidade inválida para {item.produto.nome}. Vendido: {item.quantidade}')
+          devolvidos.append((item, quantidade, quantidade * item.preco_unitario))
+
+      total_itens = sum(quantidade for _, quantidade, _ in devolvidos)
+      cancelada = total_itens == sum(item.quantidade for item in itens.values())
+      total = sum(valor for _, _, valor in devolvidos)
+
+      # Venda, itens e estoque
+      for item, quantidade, valor in devolvidos:
+          ItemVenda.objects.filter(id=item.id).update(
+              quantidade=F('quantidade') - quantidade,
+              subtotal=somar_centavos('subtotal', -valor)
+          )
+          Produto.objects.filter(id=item.produto_id).update(
+              quantidade_estoque=F('quantidade_estoque') + quantidade,
+              quantidade_vendidos=F('quantidade_vendidos') - quantidade
+          )
+          if venda.loja_id:
+              EstoqueLoja.objects.filter(loja_id=venda.loja_id, produto_id=item.produto_id).update(
+                  quantidade=F('quantidade') + quantidade
+              )
+
+      Devolucao.objects.bulk_create([
+          Devolucao(venda=venda, item=item, quantidade=quantidade, valor=valor,
+                    cancelamento=cancelada, motivo=motivo)
+          for item, quantidade, valor in devolvidos
+      ])
+
+      if cancelada:
+          # O total fica como estava, para histórico; a venda só sai dos relatórios
+          venda.finalizada = False
+          venda.cancelada = True
+          venda.save(update_fields=['finalizada', 'cancelada'])
+      else:
+          venda.total -= total
+          venda.save(update_fields=['total'])
+
+      # Rollups: só a diferença
+      vendas = -1 if cancelada else 0
+      VendasPorHora.registrar(venda, -total_itens, total=-total, vendas=vendas)
+      if venda.sessao_id:
+          # Turno já fechado não muda depois do fechamento: o estorno fica só
+          # na Devolucao, que reconciliar() soma de volta
+          sessao = SessaoCaixa.objects.select_for_update().get(id=venda.sessao_id)
+          if sessao.aberta:
+              sessao.registrar_venda(-total, -total_itens, vendas=vendas)
+
+      # Relatórios já gerados do dia e do mês: consolidado e o da loja
+      data = timezone.localdate(venda.data_venda)
+      da_venda = Q(loja__isnull=True)
+      if venda.loja_id:
+          da_venda |= Q(loja_id=venda.loja_id)
+
+      for relatorio in RelatorioDiario.objects.select_for_update().filter(da_venda, data=data):
+          if _descontar_do_relatorio(relatorio, venda, devolvidos, total, total_itens, cancelada):
+              # O mensal é a soma dos diários: desconta o mesmo valor (e o
+              # dia, se o cancelamento levou a última venda dele)
+              RelatorioMensal.objects.filter(loja_id=relatorio.loja_id, ano=data.year, mes=data.month).update(
+                  total_mensal=somar_centavos('total_mensal', -total),
+                  dias_com_vendas=F('dias_com_vendas') - (1 if relatorio.numero_vendas == 0 else 0)
+              )
+
+  invalidar_cache_ranking()
+  invalidar_cache_comparativos()
+  transaction.on_commit(lambda: publicar_venda(venda.loja_id))
+
+  return {
+      'venda_id': venda.id,
+      'cancelada': cancelada,
+      'itens_devolvidos': total_itens,
+      'valor_devolvido': total,
+  }
+
+
+def _descontar_do_relatorio(relatorio, venda, devolvidos, total, total_itens, cancelada):
+  """Tira a devolução dos totais e do resumo por produto de um relatório diário"""
+  if not relatorio.contem_venda(venda):
+      # Relatório gerado antes da venda: a próxima regeneração já sai certa
+      return False
+
+  # O resumo é por nome de produto com total em reais (float); a conta é
+  # feita em centavos para bater com a regeneração
+  resumo = relatorio.resumo_produtos
+  for item, quantidade, valor in devolvidos:
+      dados = resumo.get(item.produto.nome)
+      if dados is None:
+          continue
+      dados['quantidade'] -= quantidade
+      dados['total'] = (para_centavos(dados['total']) - para_centavos(valor)) / 100
+      if dados['quantidade'] <= 0:
+          del resumo[item.produto.nome]
+
+  relatorio.total_vendido -= total
+  relatorio.total_itens -= total_itens
+  if cancelada:
+      relatorio.numero_vendas -= 1
+  relatorio.save()
+  descartar_mes(relatorio.data, relatorio.loja_id)
+  return True
@@ -0,0 +1,224 @@
+# utils/extrato.py
+"""Extrato de vendas com paginação por chave (keyset)
+
+As páginas andam por (data_venda, id), da venda mais recente para a mais
+antiga: a próxima página começa logo depois da última venda da atual
+(data_venda <= d AND (data_venda < d OR id < i)), e o índice
+(data_venda, id) chega lá direto. Com OFFSET o banco percorre e descarta
+todas as vendas das páginas anteriores; aqui a página 10.000 custa o mesmo
+que a primeira. O cursor é opaco para o cliente (data e id em base64).
+
+Cada página são duas consultas (vendas com a loja, itens com o produto) e,
+se houver vendas com itens arquivados, uma no arquivo morto. O filtro por
+produto só enxerga itens do banco principal (utils/arquivo.py); um período
+que alcança meses arquivados é recusado com FiltroArquivado em vez de
+devolver um extrato incompleto.
+"""
+import base64
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import Exists, OuterRef, Prefetch, Q, prefetch_related_objects
+from django.utils import timezone
+
+from vendas.campos import MAXIMO_BIGINT
+from .periodos import intervalo_do_dia, intervalo_do_mes
+
+TAMANHO_PAGINA = 50
+MAXIMO_PAGINA = 200
+
+
+class FiltroArquivado(ValueError):
+  """Filtro por produto num período com itens no arquivo morto (a mensagem
+  diz a partir de quando filtrar)"""
+
+
+def codificar_cursor(venda):
+  texto = f'{venda.data_venda.isoformat()}|{venda.id}'
+  return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+  """(data_venda, id) do cursor; ValueError se ele não for válido"""
+  try:
+      texto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+      momento, venda_id = texto.split('|')
+      momento, venda_id = datetime.fromisoformat(momento), int(venda_id)
+      if not 0 < venda_id <= MAXIMO_BIGINT:
+          raise ValueError
+      return momento, venda_id
+  except (UnicodeDecodeError, ValueError):
+      raise ValueError('Cursor inválido')
+
+
+@dataclass(frozen=True)
+class Filtros:
+  data_inicio: date = None
+  data_fim: date = None
+  produto_id: int = None
+  valor_minimo: Decimal = None
+  valor_maximo: Decimal = None
+  loja_id: int = None
+
+  @classmethod
+  def da_requisicao(cls, parametros):
+      """Filtros a partir de request.GET (inicio, fim, produto ou codigo do
+      produto, valor_min, valor_max e loja); ValueError se algum for inválido"""
+      from vendas.models import Produto, Venda
+
+      def valor(nome, converter):
+          texto = (parametros.get(nome) or '').strip()
+          return converter(texto) if texto else None
+
+      def identificador(texto):
+          numero = int(texto)
+          if not 0 < numero <= MAXIMO_BIGINT:
+              raise ValueError('Identificador inválido')
+          return numero
+
+      def reais(texto):
+          # Como o filtro vai para a coluna: centavos que cabem num BIGINT
+          try:
+              return Venda._meta.get_field('total').to_python(texto.replace(',', '.'))
+          except ValidationError:
+              raise ValueError('Valor inválido')
+
+      def dia(texto):
+          data = date.fromisoformat(texto)
+          # O intervalo do dia vai até a meia-noite seguinte
+          if not date.min < data < date.max:
+              raise ValueError('Data fora do intervalo')
+          return data
+
+      def codigo(texto):
+          produto_id = Produto.objects.filter(codigo=texto).values_list('id', flat=True).first()
+          if produto_id is None:
+              raise ValueError(f'Produto {texto} não encontrado')
+          return produto_id
+
+      filtros = cls(
+          data_inicio=valor('inicio', dia),
+          data_fim=valor('fim', dia),
+          produto_id=valor('produto', identificador) or valor('codigo', codigo),
+          valor_minimo=valor('valor_min', reais),
+          valor_maximo=valor('valor_max', reais),
+          loja_id=valor('loja', identificador),
+      )
+      if filtros.data_inicio and filtros.data_fim and filtros.data_inicio > filtros.data_fim:
+          raise ValueError('Início depois do fim')
+      return filtros
+
+  def conferir_arquivo(self):
+      """FiltroArquivado se o filtro por produto alcança meses arquivados"""
+      from .arquivo import meses_arquivados
+
+      if self.produto_id is None:
+          return
+      alcancados = [
+          (ano, mes) for ano, mes, _, _ in meses_arquivados()
+          if (self.data_inicio is None or intervalo_do_mes(ano, mes)[1] >= self.data_inicio)
+          and (self.data_fim is None or intervalo_do_mes(ano, mes)[0] <= self.data_fim)
+      ]
+      if alcancados:
+          ano, mes = max(alcancados)
+          depois = date(ano + mes // 12, mes % 12 + 1, 1)
+          raise FiltroArquivado(
+              f'Os itens das vendas até {mes:02d}/{ano} estão no arquivo morto; '
+              f'filtre por produto a partir de {depois:%d/%m/%Y}'
+          )
+
+  def vendas(self):
+      """Vendas finalizadas e canceladas que passam nos filtros (sem ordem)"""
+      from vendas.models import ItemVenda, Venda
+
+      self.conferir_arquivo()
+
+      vendas = Venda.objects.filter(Q(finalizada=True) | Q(cancelada=True))
+      if self.data_inicio:
+          vendas = vendas.filter(data_venda__gte=intervalo_do_dia(self.data_inicio)[0])
+      if self.data_fim:
+          vendas = vendas.filter(data_venda__lt=intervalo_do_dia(self.data_fim)[1])
+      if self.produto_id is not None:
+          vendas = vendas.filter(Exists(ItemVenda.objects.filter(venda=OuterRef('pk'), produto_id=self.produto_id)))
+      if self.valor_minimo is not None:
+          vendas = vendas.filter(total__gte=self.valor_minimo)
+      if self.valor_maximo is not None:
+          vendas = vendas.filter(total__lte=self.valor_maximo)
+      if self.loja_id is not None:
+          vendas = vendas.filter(loja_id=self.loja_id)
+      return vendas
+
+
+def pagina(filtros, depois=None, antes=None, tamanho=TAMANHO_PAGINA):
+  """Uma página do extrato, das mais recentes para as mais antigas
+
+  `depois` (próxima página) e `antes` (página anterior) são cursores
+  devolvidos numa página anterior. Retorna as vendas (com `linhas`:
+  (quantidade, produto, subtotal) de cada item) e os cursores vizinhos.
+  """
+  from vendas.models import ItemVenda
+  from .arquivo import itens_das_vendas
+
+  vendas = filtros.vendas().select_related('loja')
+  if antes:
+      momento, venda_id = decodificar_cursor(antes)
+      vendas = (
+          vendas.filter(data_venda__gte=momento)
+          .filter(Q(data_venda__gt=momento) | Q(id__gt=venda_id))
+          .order_by('data_venda', 'id')
+      )
+  else:
+      if depois:
+          momento, venda_id = decodificar_cursor(depois)
+          vendas = vendas.filter(data_venda__lte=momento).filter(Q(data_venda__lt=momento) | Q(id__lt=venda_id))
+      vendas = vendas.order_by('-data_venda', '-id')
+
+  # Uma venda a mais diz se há outra página nessa direção
+  lista = list(vendas[:tamanho + 1])
+  mais = len(lista) > tamanho
+  lista = lista[:tamanho]
+  if antes:
+      lista.reverse()
+
+  prefetch_related_objects(
+      [venda for venda in lista if not venda.itens_arquivados],
+      Prefetch('itens', queryset=ItemVenda.objects.select_related('produto').order_by('id'))
+  )
+  arquivados = itens_das_vendas(venda.id for venda in lista if venda.itens_arquivados)
+  for venda in lista:
+      if venda.itens_arquivados:
+          venda.linhas = arquivados.get(venda.id, [])
+      else:
+          venda.linhas = [(item.quantidade, item.produto.nome, item.subtotal) for item in venda.itens.all()]
+
+  if antes:
+      anterior = codificar_cursor(lista[0]) if mais else None
+      proximo = codificar_cursor(lista[-1]) if lista else None
+  else:
+      anterior = codificar_cursor(lista[0]) if depois and lista else None
+      proximo = codificar_cursor(lista[-1]) if mais else None
+  return {'vendas': lista, 'anterior': anterior, 'proximo': proximo}
+
+
+def como_json(resultado):
+  """Página no formato da API buscar-vendas"""
+  return {
+      'vendas': [
+          {
+              'id': venda.id,
+              'data_venda': timezone.localtime(venda.data_venda).isoformat(),
+              'loja': venda.loja.nome if venda.loja_id else None,
+              'total': float(venda.total),
+              'cancelada': venda.cancelada,
+              'itens': [
+                  {'quantidade': quantidade, 'produto': nome, 'subtotal': float(subtotal)}
+                  for quantidade, nome, subtotal in venda.linhas
+              ],
+          }
+          for venda in resultado['vendas']
+      ],
+      'anterior': resultado['anterior'],
+      'proximo': resultado['proximo'],
+  }
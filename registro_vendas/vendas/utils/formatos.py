@@ -0,0 +1,287 @@
+# utils/formatos.py
+"""Relatórios em PDF, XLSX, CSV e texto a partir de uma única agregação
+
+`dados_diario` e `dados_mensal` leem (ou geram) o relatório uma vez e o
+convertem num modelo tipado (DadosDia, DadosMes). Os renderizadores,
+registrados com `@renderizador(formato, tipo)`, recebem esse modelo e
+devolvem bytes: pedir vários formatos do mesmo período custa uma consulta,
+e cada formato pode ser medido sozinho (cenário 'formatos' do benchmark).
+"""
+import csv
+import io
+import re
+import zipfile
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+MESES = ['', 'Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
+         'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
+
+TIPOS_CONTEUDO = {
+    'pdf': 'application/pdf',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv; charset=utf-8',
+    'txt': 'text/plain; charset=utf-8',
+}
+
+RENDERIZADORES = {}
+
+# Texto que o Excel abriria como fórmula (nomes de produto vêm do cadastro)
+INICIO_DE_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+# Caracteres de controle que o XML não aceita nem escapados
+CONTROLE_INVALIDO_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+
+@dataclass(frozen=True)
+class LinhaProduto:
+  quantidade: int
+  nome: str
+  total: Decimal
+
+
+@dataclass(frozen=True)
+class DadosDia:
+  """Relatório diário pronto para qualquer formato"""
+  data: date
+  loja: str
+  produtos: tuple
+  total: Decimal
+  numero_vendas: int
+  total_itens: int
+
+  @classmethod
+  def do_relatorio(cls, relatorio, loja=None):
+      return cls(
+          data=relatorio.data,
+          loja=loja.nome if loja is not None else '',
+          # total no JSON é float de centavos/100; duas casas o tornam exato
+          produtos=tuple(
+              LinhaProduto(dados['quantidade'], nome, Decimal(f"{dados['total']:.2f}"))
+              for nome, dados in relatorio.resumo_produtos.items()
+          ),
+          total=relatorio.total_vendido,
+          numero_vendas=relatorio.numero_vendas,
+          total_itens=relatorio.total_itens,
+      )
+
+  @property
+  def nome_arquivo(self):
+      return f'relatorio_diario_{self.data.strftime("%d_%m_%Y")}'
+
+  def planilha(self):
+      """Linhas para CSV e XLSX (cabeçalho, produtos e total)"""
+      return [
+          ['Quantidade', 'Produto', 'Total'],
+          *([produto.quantidade, produto.nome, produto.total] for produto in self.produtos),
+          [self.total_itens, 'TOTAL', self.total],
+      ]
+
+
+@dataclass(frozen=True)
+class LinhaDia:
+  data: date
+  total: Decimal
+  numero_vendas: int
+
+
+@dataclass(frozen=True)
+class DadosMes:
+  """Relatório mensal pronto para qualquer formato"""
+  ano: int
+  mes: int
+  loja: str
+  dias: tuple
+  total: Decimal
+  dias_com_vendas: int
+
+  @property
+  def nome_arquivo(self):
+      return f'relatorio_mensal_{MESES[self.mes].lower()}_{self.ano}'
+
+  def planilha(self):
+      return [
+          ['Data', 'Total do Dia', 'Nº Vendas'],
+          *([dia.data.strftime('%d/%m/%Y'), dia.total, dia.numero_vendas] for dia in self.dias),
+          ['TOTAL MENSAL', self.total, f'{self.dias_com_vendas} dias'],
+      ]
+
+
+def dados_diario(data, loja=None):
+  """Gera (se preciso) o relatório do dia e devolve o modelo tipado"""
+  from .relatorios import GeradorRelatorios
+
+  return DadosDia.do_relatorio(GeradorRelatorios.gerar_relatorio_diario(data, loja), loja)
+
+
+def dados_mensal(ano, mes, loja=None):
+  """Consolida o mês e devolve o modelo tipado (com os dias em ordem)"""
+  from .perfil import fase
+  from .relatorios import GeradorRelatorios
+
+  relatorio = GeradorRelatorios.gerar_relatorio_mensal(ano, mes, loja)
+  with fase('consulta'):
+      dias = tuple(
+          LinhaDia(data, total, numero_vendas)
+          for data, total, numero_vendas in relatorio.relatorios_diarios.order_by('data')
+          .values_list('data', 'total_vendido', 'numero_vendas')
+      )
+  return DadosMes(
+      ano=ano,
+      mes=mes,
+      loja=loja.nome if loja is not None else '',
+      dias=dias,
+      total=relatorio.total_mensal,
+      dias_com_vendas=relatorio.dias_com_vendas,
+  )
+
+
+def renderizador(formato, *tipos):
+  """Registra uma função (dados) -> bytes para o formato e os tipos de relatório"""
+  def registrar(funcao):
+      for tipo in tipos:
+          RENDERIZADORES[formato, tipo] = funcao
+      return funcao
+  return registrar
+
+
+def renderizar(dados, formato):
+  """Bytes do relatório no formato pedido"""
+  try:
+      funcao = RENDERIZADORES[formato, type(dados)]
+  except KeyError:
+      raise ValueError(f'Formato inválido: {formato}')
+  return funcao(dados)
+
+
+def exportar(dados, formatos):
+  """(bytes, content type, nome do arquivo): o arquivo do formato pedido ou,
+  com vários formatos, um zip com um arquivo de cada"""
+  if len(formatos) == 1:
+      formato = formatos[0]
+      return renderizar(dados, formato), TIPOS_CONTEUDO[formato], f'{dados.nome_arquivo}.{formato}'
+
+  buffer = io.BytesIO()
+  with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as arquivo:
+      for formato in formatos:
+          arquivo.writestr(f'{dados.nome_arquivo}.{formato}', renderizar(dados, formato))
+  return buffer.getvalue(), 'application/zip', f'{dados.nome_arquivo}.zip'
+
+
+@renderizador('txt', DadosDia)
+def texto_diario(dados):
+  """Formato do caderno"""
+  linhas = [f"Em {dados.data.strftime('%d de %B de %Y')}", "-" * 40]
+  for produto in dados.produtos:
+      linhas.append(f"{produto.quantidade:02d} {produto.nome}  total - R$ {produto.total:.2f}")
+  linhas.append("-" * 40)
+  linhas.append(f"TOTAL DO DIA: R$ {dados.total:.2f}")
+  linhas.append(f"Número de vendas: {dados.numero_vendas}")
+  return "\n".join(linhas).encode('utf-8')
+
+
+@renderizador('txt', DadosMes)
+def texto_mensal(dados):
+  titulo = f"Relatório Mensal - {MESES[dados.mes]} {dados.ano}"
+  linhas = [f"{titulo} - {dados.loja}" if dados.loja else titulo, "-" * 40]
+  for dia in dados.dias:
+      linhas.append(f"{dia.data.strftime('%d/%m/%Y')}  R$ {dia.total:>10.2f}  {dia.numero_vendas} vendas")
+  linhas.append("-" * 40)
+  linhas.append(f"TOTAL MENSAL: R$ {dados.total:.2f} ({dados.dias_com_vendas} dias)")
+  return "\n".join(linhas).encode('utf-8')
+
+
+@renderizador('csv', DadosDia, DadosMes)
+def planilha_csv(dados):
+  """CSV com ponto e vírgula e BOM, como o Excel em português abre direto"""
+  buffer = io.StringIO()
+  escritor = csv.writer(buffer, delimiter=';', lineterminator='\r\n')
+  escritor.writerows([_valor_csv(valor) for valor in linha] for linha in dados.planilha())
+  return buffer.getvalue().encode('utf-8-sig')
+
+
+def _valor_csv(valor):
+  if isinstance(valor, Decimal):
+      return f'{valor:.2f}'.replace('.', ',')
+  if isinstance(valor, str) and valor.startswith(INICIO_DE_FORMULA):
+      # O apóstrofo faz o Excel mostrar o texto em vez de calcular
+      return f"'{valor}"
+  return valor
+
+
+# Partes fixas de um XLSX de uma planilha (sem estilos: datas vão como texto)
+_XLSX_FIXOS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Relatório" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _celula(coluna, linha, valor):
+  referencia = f'{"ABCDEFGHIJKLMNOPQRSTUVWXYZ"[coluna]}{linha}'
+  if isinstance(valor, (int, Decimal)) and not isinstance(valor, bool):
+      return f'<c r="{referencia}"><v>{valor}</v></c>'
+  texto = escape(CONTROLE_INVALIDO_XML.sub('', str(valor)))
+  return f'<c r="{referencia}" t="inlineStr"><is><t>{texto}</t></is></c>'
+
+
+@renderizador('xlsx', DadosDia, DadosMes)
+def planilha_xlsx(dados):
+  """XLSX montado direto em XML (sem openpyxl): números como números"""
+  linhas = ''.join(
+      f'<row r="{numero}">{"".join(_celula(coluna, numero, valor) for coluna, valor in enumerate(linha))}</row>'
+      for numero, linha in enumerate(dados.planilha(), start=1)
+  )
+  planilha = (
+      '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+      '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+      f'<sheetData>{linhas}</sheetData></worksheet>'
+  )
+  buffer = io.BytesIO()
+  with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as arquivo:
+      for nome, conteudo in _XLSX_FIXOS.items():
+          arquivo.writestr(nome, conteudo)
+      arquivo.writestr('xl/worksheets/sheet1.xml', planilha)
+  return buffer.getvalue()
+
+
+@renderizador('pdf', DadosDia)
+def pdf_diario(dados):
+  # ReportLab só é carregado quando um PDF é pedido (utils/pdf.py)
+  from .pdf import desenhar_diario
+  return desenhar_diario(dados).getvalue()
+
+
+@renderizador('pdf', DadosMes)
+def pdf_mensal(dados):
+  from .pdf import desenhar_mensal
+  return desenhar_mensal(dados).getvalue()
@@ -0,0 +1,181 @@
+# utils/importacao.py
+import csv
+import io
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from .precos import registrar_precos
+
+
+class ImportadorProdutos:
+  """Importação em massa do catálogo de produtos a partir de CSV
+
+  O arquivo precisa das colunas codigo, nome, preco e estoque (separadas por
+  vírgula ou ponto e vírgula). Cada lote é validado e aplicado em uma única
+  transação com bulk_create(update_conflicts=True), usando o código como chave.
+  """
+
+  COLUNAS = ('codigo', 'nome', 'preco', 'estoque')
+  TAMANHO_LOTE = 2000
+  # Códigos por consulta codigo__in: abaixo do limite de parâmetros do SQLite
+  CODIGOS_POR_CONSULTA = 500
+  # Mensagens guardadas; além delas os erros só são contados
+  MAXIMO_ERROS = 100
+
+  def __init__(self, tamanho_lote=None, somar_estoque=False):
+    self.tamanho_lote = tamanho_lote or self.TAMANHO_LOTE
+    # Com somar_estoque a coluna estoque é uma entrada (ou saída, se negativa)
+    # somada ao estoque atual em vez de substituí-lo
+    self.somar_estoque = somar_estoque
+
+  @staticmethod
+  def converter_preco(valor):
+    """Aceita '12.50', '12,50' e '1.234,56'"""
+    valor = valor.strip().replace('R$', '').strip()
+    if ',' in valor:
+        valor = valor.replace('.', '').replace(',', '.')
+    preco = Decimal(valor)
+    if preco < 0:
+        raise InvalidOperation
+    return preco.quantize(Decimal('0.01'))
+
+  def validar_linha(self, numero, linha):
+    """Converte uma linha do CSV; retorna (dados, erro)"""
+    codigo = (linha.get('codigo') or '').strip()
+    nome = (linha.get('nome') or '').strip()
+
+    if not codigo:
+        return None, f'Linha {numero}: código vazio'
+    if not nome or len(nome) > 100:
+        return None, f'Linha {numero}: nome inválido'
+
+    try:
+        preco = self.converter_preco(linha.get('preco') or '')
+    except (InvalidOperation, ValueError):
+        return None, f'Linha {numero}: preço inválido'
+
+    try:
+        estoque = int((linha.get('estoque') or '0').strip())
+    except ValueError:
+        return None, f'Linha {numero}: estoque inválido'
+    if estoque < 0 and not self.somar_estoque:
+        return None, f'Linha {numero}: estoque negativo'
+
+    return {'codigo': codigo, 'nome': nome, 'preco': preco, 'estoque': estoque}, None
+
+  def aplicar_lote(self, lote):
+    """Grava um lote validado; retorna (criados, atualizados)"""
+    from vendas.models import Produto
+
+    # Códigos repetidos no mesmo lote: a última linha vence (ou soma, no modo entrada)
+    por_codigo = {}
+    for dados in lote:
+        anterior = por_codigo.get(dados['codigo'])
+        if anterior is not None and self.somar_estoque:
+            dados['estoque'] += anterior['estoque']
+        por_codigo[dados['codigo']] = dados
+
+    with transaction.atomic():
+        # Uma consulta por lote para saber o que já existe (estoque e preço atuais)
+        existentes = {
+            codigo: (estoque, preco)
+            for parte in self._em_partes(list(por_codigo))
+            for codigo, estoque, preco in Produto.objects.select_for_update()
+            .filter(codigo__in=parte)
+            .values_list('codigo', 'quantidade_estoque', 'preco')
+        }
+
+        produtos = []
+        for codigo, dados in por_codigo.items():
+            estoque = dados['estoque']
+            if self.somar_estoque:
+                estoque = max(existentes.get(codigo, (0, None))[0] + estoque, 0)
+            produtos.append(Produto(
+                codigo=codigo,
+                nome=dados['nome'],
+                preco=dados['preco'],
+                quantidade_estoque=estoque,
+            ))
+
+        Produto.objects.bulk_create(
+            produtos,
+            batch_size=self.tamanho_lote,
+            update_conflicts=True,
+            unique_fields=['codigo'],
+            update_fields=['nome', 'preco', 'quantidade_estoque'],
+        )
+
+        # Produtos novos e preços alterados entram no histórico de preços
+        mudaram = [
+            codigo for codigo, dados in por_codigo.items()
+            if codigo not in existentes or existentes[codigo][1] != dados['preco']
+        ]
+        for parte in self._em_partes(mudaram):
+            registrar_precos(dict(Produto.objects.filter(codigo__in=parte).values_list('id', 'preco')))
+
+    atualizados = len(existentes)
+    return len(produtos) - atualizados, atualizados
+
+  def _em_partes(self, codigos):
+    for inicio in range(0, len(codigos), self.CODIGOS_POR_CONSULTA):
+        yield codigos[inicio:inicio + self.CODIGOS_POR_CONSULTA]
+
+  def importar(self, arquivo):
+    """Importa um arquivo (texto ou binário) e retorna o resumo da operação"""
+    if isinstance(arquivo, (bytes, bytearray)):
+        arquivo = io.BytesIO(arquivo)
+    if not isinstance(arquivo, io.TextIOBase):
+        arquivo = io.TextIOWrapper(arquivo, encoding='utf-8-sig', newline='')
+
+    inicio = time.perf_counter()
+
+    primeira_linha = arquivo.readline()
+    delimitador = ';' if primeira_linha.count(';') > primeira_linha.count(',') else ','
+    cabecalho = [coluna.strip().lower() for coluna in next(csv.reader([primeira_linha], delimiter=delimitador), [])]
+
+    faltando = [coluna for coluna in self.COLUNAS if coluna not in cabecalho]
+    if faltando:
+        raise ValueError(f'Colunas obrigatórias ausentes: {", ".join(faltando)}')
+
+    leitor = csv.DictReader(arquivo, fieldnames=cabecalho, delimiter=delimitador)
+
+    resultado = {
+        'linhas': 0,
+        'criados': 0,
+        'atualizados': 0,
+        'total_erros': 0,
+        # Só as primeiras MAXIMO_ERROS mensagens: um arquivo todo errado de
+        # 100 mil linhas não vira uma resposta de 100 mil mensagens
+        'erros': [],
+    }
+    lote = []
+
+    for numero, linha in enumerate(leitor, start=2):
+        resultado['linhas'] += 1
+        dados, erro = self.validar_linha(numero, linha)
+
+        if erro:
+            resultado['total_erros'] += 1
+            if len(resultado['erros']) < self.MAXIMO_ERROS:
+                resultado['erros'].append(erro)
+            continue
+
+        lote.append(dados)
+        if len(lote) >= self.tamanho_lote:
+            criados, atualizados = self.aplicar_lote(lote)
+            resultado['criados'] += criados
+            resultado['atualizados'] += atualizados
+            lote = []
+
+    if lote:
+        criados, atualizados = self.aplicar_lote(lote)
+        resultado['criados'] += criados
+        resultado['atualizados'] += atualizados
+
+    duracao = time.perf_counter() - inicio
+    resultado['segundos'] = round(duracao, 3)
+    resultado['linhas_por_segundo'] = round(resultado['linhas'] / duracao) if duracao else resultado['linhas']
+
+    return resultado
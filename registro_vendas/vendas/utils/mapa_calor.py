@@ -0,0 +1,121 @@
+# utils/mapa_calor.py
+from django.db import models, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractHour, TruncDate
+
+from vendas.campos import de_centavos
+from .comparativos import invalidar_cache_comparativos
+
+HORAS = range(24)
+
+
+def reconstruir_vendas_por_hora(data_inicio=None, data_fim=None):
+  """Recalcula os baldes por hora a partir das vendas (backfill ou correção)
+
+  Sem datas reconstrói tudo. São duas consultas agrupadas por (loja, dia,
+  hora) no fuso local: uma para vendas/total e outra para os itens (somados
+  aos itens de meses já arquivados).
+  """
+  from vendas.models import ItemVenda, Venda, VendasPorHora
+  from .arquivo import quantidades_por_hora
+  from .periodos import intervalo_de_datas
+
+  vendas = Venda.objects.filter(finalizada=True)
+  itens = ItemVenda.objects.filter(venda__finalizada=True)
+  baldes = VendasPorHora.objects.all()
+  if data_inicio and data_fim:
+      inicio, fim = intervalo_de_datas(data_inicio, data_fim)
+      vendas = vendas.filter(data_venda__gte=inicio, data_venda__lt=fim)
+      itens = itens.filter(venda__data_venda__gte=inicio, venda__data_venda__lt=fim)
+      baldes = baldes.filter(data__gte=data_inicio, data__lte=data_fim)
+
+  linhas = (
+      vendas
+      .annotate(dia=TruncDate('data_venda'), hora=ExtractHour('data_venda'))
+      .values('loja_id', 'dia', 'hora')
+      .annotate(numero=Count('id'), centavos=Sum('total', output_field=models.BigIntegerField()))
+      .order_by()
+  )
+  quantidades = {
+      (linha['venda__loja_id'], linha['dia'], linha['hora']): linha['quantidade']
+      for linha in (
+          itens
+          .annotate(dia=TruncDate('venda__data_venda'), hora=ExtractHour('venda__data_venda'))
+          .values('venda__loja_id', 'dia', 'hora')
+          .annotate(quantidade=Sum('quantidade'))
+          .order_by()
+      )
+  }
+  for chave, quantidade in quantidades_por_hora(data_inicio, data_fim).items():
+      quantidades[chave] = quantidades.get(chave, 0) + quantidade
+
+  novos = []
+  for linha in linhas:
+      chave = (linha['loja_id'], linha['dia'], linha['hora'])
+      balde = VendasPorHora(
+          loja_id=linha['loja_id'],
+          data=linha['dia'],
+          hora=linha['hora'],
+          dia_semana=linha['dia'].weekday(),
+          numero_vendas=linha['numero'],
+          total_itens=quantidades.get(chave) or 0,
+      )
+      balde.total = de_centavos(linha['centavos'])
+      novos.append(balde)
+
+  with transaction.atomic():
+      baldes.delete()
+      VendasPorHora.objects.bulk_create(novos, batch_size=2000)
+
+  # Os comparativos em cache foram calculados a partir destes baldes
+  invalidar_cache_comparativos()
+
+  return len(novos)
+
+
+def mapa_calor(data_inicio, data_fim, loja=None):
+  """Vendas por dia da semana × hora e por hora no período, lidas dos baldes
+
+  Uma consulta agrupada sobre VendasPorHora devolve no máximo 7 × 24
+  linhas; o custo depende só do número de dias do período, não de vendas.
+  """
+  from vendas.models import VendasPorHora
+
+  baldes = VendasPorHora.objects.filter(data__gte=data_inicio, data__lte=data_fim)
+  if loja is not None:
+      baldes = baldes.filter(loja=loja)
+
+  linhas = (
+      baldes
+      .values('dia_semana', 'hora')
+      .annotate(
+          vendas=Sum('numero_vendas'),
+          itens=Sum('total_itens'),
+          centavos=Sum('total', output_field=models.BigIntegerField()),
+      )
+      .order_by()
+  )
+
+  # Matrizes [dia_semana][hora] (0 = segunda)
+  vendas = [[0] * 24 for _ in range(7)]
+  totais = [[0] * 24 for _ in range(7)]
+  for linha in linhas:
+      vendas[linha['dia_semana']][linha['hora']] = linha['vendas']
+      totais[linha['dia_semana']][linha['hora']] = linha['centavos']
+
+  totais_por_hora = [sum(totais[dia][hora] for dia in range(7)) for hora in HORAS]
+  vendas_por_hora = [sum(vendas[dia][hora] for dia in range(7)) for hora in HORAS]
+  pico = max(HORAS, key=lambda hora: totais_por_hora[hora]) if any(totais_por_hora) else None
+
+  return {
+      'inicio': data_inicio.strftime('%d/%m/%Y'),
+      'fim': data_fim.strftime('%d/%m/%Y'),
+      'dias_semana': VendasPorHora.DIAS_SEMANA,
+      'vendas': vendas,
+      'totais': [[centavos / 100 for centavos in dia] for dia in totais],
+      'por_hora': {
+          'vendas': vendas_por_hora,
+          'totais': [centavos / 100 for centavos in totais_por_hora],
+      },
+      'hora_pico': pico,
+  }
@@ -0,0 +1,318 @@
+# utils/pdf.py
+"""PDFs dos relatórios e cupons (ReportLab)
+
+Só é importado quando um PDF é pedido: GeradorRelatorios.pdf_* e os
+renderizadores 'pdf' de utils/formatos.py importam este módulo na chamada,
+para que workers e comandos que não geram PDF não carreguem o ReportLab.
+"""
+import io
+from functools import lru_cache
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import cm, mm
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, LongTable
+
+from .formatos import MESES, dados_diario, dados_mensal
+from .perfil import fase
+
+# Altura fixa das linhas da tabela do caderno (Courier 12 + padding): com
+# rowHeights definido o ReportLab não mede célula por célula
+ALTURA_LINHA = 0.72 * cm
+COLUNAS_CADERNO = [2*cm, 10*cm, 3*cm]
+
+# Estilos de tabela montados uma vez e reaproveitados em todos os PDFs
+ESTILO_PRODUTOS = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('ALIGN', (2, 0), (2, -1), 'RIGHT'),
+    ('FONTNAME', (0, 0), (-1, -1), 'Courier'),
+    ('FONTSIZE', (0, 0), (-1, -1), 12),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+])
+ESTILO_TOTAL_CADERNO = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('ALIGN', (2, 0), (2, -1), 'RIGHT'),
+    ('FONTNAME', (0, 0), (-1, -1), 'Courier'),
+    ('LINEBELOW', (0, 0), (-1, 0), 2, colors.black),
+    ('FONTNAME', (0, -1), (-1, -1), 'Courier-Bold'),
+    ('FONTSIZE', (0, -1), (-1, -1), 14),
+])
+ESTILO_MENSAL = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('GRID', (0, 0), (-1, -2), 0.5, colors.black),
+    ('LINEBELOW', (0, -2), (-1, -2), 2, colors.black),
+    ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, -1), (-1, -1), 12),
+])
+ESTILO_FECHAMENTO = TableStyle([
+    ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+    ('FONTNAME', (0, 0), (-1, -1), 'Courier'),
+    ('FONTSIZE', (0, 0), (-1, -1), 12),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+    ('FONTNAME', (0, -1), (-1, -1), 'Courier-Bold'),
+])
+
+
+@lru_cache(maxsize=None)
+def estilos():
+  """Estilos de parágrafo dos relatórios, criados uma vez por processo
+
+  getSampleStyleSheet() monta a folha de estilos inteira a cada chamada.
+  """
+  styles = getSampleStyleSheet()
+  return {
+      'titulo': ParagraphStyle('CustomTitle', parent=styles['Title'], fontSize=16, spaceAfter=30, alignment=TA_CENTER),
+      'titulo_mensal': ParagraphStyle('CustomTitleMensal', parent=styles['Title'], fontSize=18, spaceAfter=30,
+                                      alignment=TA_CENTER),
+      # Fonte monoespaçada como caderno
+      'caderno': ParagraphStyle('CustomNormal', parent=styles['Normal'], fontSize=12, spaceAfter=12, fontName='Courier'),
+  }
+
+
+def _altura_ocupada(doc, content):
+  """Altura que os flowables já adicionados ocupam no topo da primeira página
+
+  Mesma conta do Frame: o spaceAfter é descontado logo após cada flowable e
+  o spaceBefore do seguinte só conta no que passar dele.
+  """
+  altura = 0
+  espaco_depois = 0
+  for posicao, flowable in enumerate(content):
+      if posicao:
+          altura += max(flowable.getSpaceBefore() - espaco_depois, 0)
+      altura += flowable.wrap(doc.width, doc.height)[1]
+      espaco_depois = flowable.getSpaceAfter()
+      altura += espaco_depois
+  return altura
+
+
+def tabela_em_blocos(doc, content, cabecalho, linhas):
+  """Divide uma tabela longa em LongTables do tamanho de uma página
+
+  Uma única Table com milhares de linhas é dividida página a página pelo
+  ReportLab, recriando a tabela com todas as linhas restantes a cada quebra.
+  Em blocos que cabem exatamente numa página cada quebra é barata; o
+  cabeçalho se repete no topo de cada página (repeatRows cobre o caso de um
+  bloco ainda precisar ser quebrado).
+  """
+  # O Frame tem 6pt de padding em cima e embaixo
+  disponivel = doc.height - 12
+  por_pagina = max(int(disponivel // ALTURA_LINHA) - 1, 1)
+  primeira = int((disponivel - _altura_ocupada(doc, content)) // ALTURA_LINHA) - 1
+  if primeira < 1:
+      primeira = por_pagina
+
+  blocos = []
+  inicio = 0
+  tamanho = primeira
+  while inicio < len(linhas):
+      bloco = [cabecalho] + linhas[inicio:inicio + tamanho]
+      blocos.append(LongTable(bloco, colWidths=COLUNAS_CADERNO, rowHeights=ALTURA_LINHA,
+                              style=ESTILO_PRODUTOS, repeatRows=1))
+      inicio += tamanho
+      tamanho = por_pagina
+  return blocos
+
+
+def pdf_diario(data_escolhida, loja=None):
+  """Gera PDF do relatório diário - formato caderno"""
+  return desenhar_diario(dados_diario(data_escolhida, loja))
+
+
+def desenhar_diario(dados):
+  """PDF de um DadosDia (utils/formatos.py)"""
+  with fase('layout'):
+      # Criar buffer
+      buffer = io.BytesIO()
+  
+      # Configurar documento
+      doc = SimpleDocTemplate(
+          buffer,
+          pagesize=A4,
+          rightMargin=2*cm,
+          leftMargin=2*cm,
+          topMargin=2*cm,
+          bottomMargin=2*cm
+      )
+  
+      # Estilos
+      title_style = estilos()['titulo']
+      normal_style = estilos()['caderno']
+  
+      # Conteúdo
+      content = []
+  
+      # Título
+      titulo = f"Relatório de Vendas - {dados.data.strftime('%d de %B de %Y')}"
+      if dados.loja:
+          titulo += f" - {dados.loja}"
+      content.append(Paragraph(titulo, title_style))
+      content.append(Spacer(1, 20))
+  
+      # Lista de produtos (formato caderno)
+      if dados.produtos:
+          linhas = [
+              [f"{produto.quantidade:02d}", produto.nome, f"R$ {produto.total:.2f}"]
+              for produto in dados.produtos
+          ]
+          content.extend(tabela_em_blocos(doc, content, ['Qtd', 'Produto', 'Total'], linhas))
+      
+          # Linha de total
+          table = Table(
+              [['', '', ''], ['TOTAL', '', f"R$ {dados.total:.2f}"]],
+              colWidths=COLUNAS_CADERNO,
+              style=ESTILO_TOTAL_CADERNO
+          )
+          content.append(table)
+      
+      else:
+          content.append(Paragraph("Nenhuma venda registrada neste dia.", normal_style))
+  
+      # Resumo
+      content.append(Spacer(1, 30))
+      resumo_text = f"""
+      <b>Resumo do Dia:</b><br/>
+      Número de vendas: {dados.numero_vendas}<br/>
+      Total de itens vendidos: {dados.total_itens}<br/>
+      Valor total: R$ {dados.total:.2f}
+      """
+      content.append(Paragraph(resumo_text, normal_style))
+  
+      # Gerar PDF
+      doc.build(content)
+      buffer.seek(0)
+  
+  return buffer
+
+
+def pdf_mensal(ano, mes, loja=None):
+  """Gera PDF do relatório mensal"""
+  return desenhar_mensal(dados_mensal(ano, mes, loja))
+
+
+def desenhar_mensal(dados):
+  """PDF de um DadosMes (utils/formatos.py)"""
+  with fase('layout'):
+      buffer = io.BytesIO()
+      doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=2*cm, leftMargin=2*cm, topMargin=2*cm, bottomMargin=2*cm)
+  
+      title_style = estilos()['titulo_mensal']
+  
+      content = []
+  
+      # Título
+      titulo = f"Relatório Mensal - {MESES[dados.mes]} {dados.ano}"
+      if dados.loja:
+          titulo += f" - {dados.loja}"
+      content.append(Paragraph(titulo, title_style))
+      content.append(Spacer(1, 20))
+  
+      # Tabela com dias
+      data_table = [['Data', 'Total do Dia', 'Nº Vendas']]
+  
+      for dia in dados.dias:
+          data_table.append([
+              dia.data.strftime('%d/%m/%Y'),
+              f"R$ {dia.total:.2f}",
+              str(dia.numero_vendas)
+          ])
+  
+      # Total mensal
+      data_table.append(['', '', ''])
+      data_table.append(['TOTAL MENSAL', f"R$ {dados.total:.2f}", str(dados.dias_com_vendas) + ' dias'])
+  
+      table = Table(data_table, colWidths=[4*cm, 4*cm, 3*cm], style=ESTILO_MENSAL)
+  
+      content.append(table)
+  
+      doc.build(content)
+      buffer.seek(0)
+  
+  return buffer
+
+
+def pdf_fechamento_caixa(sessao):
+  """Gera PDF do fechamento de caixa a partir dos totais acumulados do turno"""
+  dados = sessao.fechamento()
+  
+  buffer = io.BytesIO()
+  doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=2*cm, leftMargin=2*cm, topMargin=2*cm, bottomMargin=2*cm)
+  
+  title_style = estilos()['titulo']
+  normal_style = estilos()['caderno']
+  
+  content = []
+  
+  titulo = f"Fechamento de Caixa {dados['caixa']}"
+  if dados['loja']:
+      titulo += f" - {dados['loja']}"
+  content.append(Paragraph(titulo, title_style))
+  content.append(Paragraph(
+      f"Operador: {dados['operador']}<br/>"
+      f"Abertura: {dados['aberta_em']}<br/>"
+      f"Fechamento: {dados['fechada_em'] or 'em aberto'}",
+      normal_style
+  ))
+  content.append(Spacer(1, 20))
+  
+  data_table = [
+      ['Número de vendas', str(dados['numero_vendas'])],
+      ['Itens vendidos', str(dados['total_itens'])],
+      ['Total vendido', f"R$ {dados['total_vendido']:.2f}"],
+      ['Troco inicial', f"R$ {dados['valor_abertura']:.2f}"],
+      ['Esperado no caixa', f"R$ {dados['valor_esperado']:.2f}"],
+  ]
+  if dados['valor_contado'] is not None:
+      data_table.append(['Contado no caixa', f"R$ {dados['valor_contado']:.2f}"])
+      data_table.append(['DIFERENÇA', f"R$ {dados['diferenca_caixa']:.2f}"])
+  
+  table = Table(data_table, colWidths=[9*cm, 6*cm], style=ESTILO_FECHAMENTO)
+  content.append(table)
+  
+  doc.build(content)
+  buffer.seek(0)
+  
+  return buffer
+
+
+# Bobina térmica de 80 mm; margem lateral de 4 mm
+LARGURA_BOBINA = 80 * mm
+MARGEM_BOBINA = 4 * mm
+
+
+@lru_cache(maxsize=None)
+def _pagina_cupom(colunas):
+  """Corpo e entrelinha da Courier para `colunas` caberem na bobina"""
+  # Na Courier todo caractere tem 0,6 do corpo de largura
+  corpo = (LARGURA_BOBINA - 2 * MARGEM_BOBINA) / (0.6 * colunas)
+  return corpo, corpo * 1.2
+
+
+def pdf_cupons(cupons):
+  """Um cupom (texto de utils/cupons.py) por página, na largura da bobina
+
+  Desenha as linhas prontas direto no canvas, sem o layout do platypus:
+  a altura da página acompanha o número de linhas do cupom.
+  """
+  from reportlab.pdfgen import canvas
+
+  buffer = io.BytesIO()
+  pdf = canvas.Canvas(buffer, pageCompression=1)
+  for cupom in cupons:
+      linhas = cupom.split('\n')
+      corpo, entrelinha = _pagina_cupom(max(len(linha) for linha in linhas))
+      altura = len(linhas) * entrelinha + 2 * MARGEM_BOBINA
+      pdf.setPageSize((LARGURA_BOBINA, altura))
+      texto = pdf.beginText(MARGEM_BOBINA, altura - MARGEM_BOBINA - corpo)
+      texto.setFont('Courier', corpo, entrelinha)
+      for linha in linhas:
+          texto.textLine(linha)
+      pdf.drawText(texto)
+      pdf.showPage()
+  pdf.save()
+  buffer.seek(0)
+  return buffer
@@ -0,0 +1,193 @@
+# utils/perfil.py
+"""Perfil de geração de relatórios, por fase
+
+O código de relatórios marca suas fases com `fase('consulta')`,
+`fase('agregacao')`, `fase('layout')` e `fase('serializacao')`. Fora de um
+`PerfilRelatorio` isso não faz nada; dentro dele cada fase acumula tempo
+próprio (sem contar as fases internas), número e tempo de consultas SQL, e
+entra como raiz das pilhas amostradas, que saem no formato "colapsado"
+(uma pilha por linha, frames separados por ';' e a contagem no final),
+aceito por flamegraph.pl, speedscope e inferno. O cProfile roda junto.
+"""
+import io
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.db import connection
+from django.http import HttpResponse, JsonResponse
+
+_perfil_atual = ContextVar('perfil_relatorio', default=None)
+
+
+@contextmanager
+def fase(nome):
+  """Marca um trecho como uma fase do perfil ativo (sem perfil, não faz nada)"""
+  perfil = _perfil_atual.get()
+  if perfil is None:
+      yield
+      return
+
+  perfil._entrar(nome)
+  try:
+      yield
+  finally:
+      perfil._sair()
+
+
+class PerfilRelatorio:
+  """Coleta tempos por fase, cProfile e pilhas amostradas de um trecho
+
+      with PerfilRelatorio() as perfil:
+          GeradorRelatorios.pdf_mensal(2025, 8)
+      perfil.resumo(), perfil.colapsado(), perfil.estatisticas()
+  """
+
+  def __init__(self, intervalo=0.001):
+      self.intervalo = intervalo
+      self.fases = {}
+      self.amostras = Counter()
+      self.total_ms = 0
+      self._pilha = []
+      self._marco = 0
+      # cProfile/pstats só entram quando há um perfil (não no import de views)
+      import cProfile
+
+      self._profile = cProfile.Profile()
+      self._parar = threading.Event()
+      self._thread_id = None
+      self._amostrador = None
+      self._token = None
+      self._consultas = None
+
+  # --- ciclo de vida ---
+
+  def __enter__(self):
+      self._thread_id = threading.get_ident()
+      self._token = _perfil_atual.set(self)
+      self._consultas = connection.execute_wrapper(self._medir_consulta)
+      self._consultas.__enter__()
+
+      self._amostrador = threading.Thread(target=self._amostrar, name='perfil-relatorio', daemon=True)
+      self._amostrador.start()
+
+      self._inicio = self._marco = time.perf_counter()
+      self._pilha = ['outros']
+      self._profile.enable()
+      return self
+
+  def __exit__(self, *exc):
+      self._profile.disable()
+      self._acumular()
+      self.total_ms = (time.perf_counter() - self._inicio) * 1000
+
+      self._parar.set()
+      self._amostrador.join()
+      self._consultas.__exit__(*exc)
+      _perfil_atual.reset(self._token)
+      return False
+
+  # --- fases ---
+
+  def _dados_fase(self, nome):
+      return self.fases.setdefault(nome, {'ms': 0.0, 'consultas': 0, 'ms_consultas': 0.0})
+
+  def _acumular(self):
+      agora = time.perf_counter()
+      self._dados_fase(self._pilha[-1])['ms'] += (agora - self._marco) * 1000
+      self._marco = agora
+
+  def _entrar(self, nome):
+      self._acumular()
+      self._pilha.append(nome)
+
+  def _sair(self):
+      self._acumular()
+      self._pilha.pop()
+
+  def _medir_consulta(self, execute, sql, params, many, context):
+      inicio = time.perf_counter()
+      try:
+          return execute(sql, params, many, context)
+      finally:
+          dados = self._dados_fase(self._pilha[-1])
+          dados['consultas'] += 1
+          dados['ms_consultas'] += (time.perf_counter() - inicio) * 1000
+
+  # --- amostragem ---
+
+  def _amostrar(self):
+      """Lê a pilha da thread perfilada a cada intervalo (roda em outra thread)"""
+      while not self._parar.wait(self.intervalo):
+          frame = sys._current_frames().get(self._thread_id)
+          if frame is None:
+              continue
+          frames = []
+          while frame is not None:
+              codigo = frame.f_code
+              frames.append(f'{os.path.basename(codigo.co_filename)}:{codigo.co_name}')
+              frame = frame.f_back
+          frames.append(self._pilha[-1])
+          self.amostras[';'.join(reversed(frames))] += 1
+
+  # --- saídas ---
+
+  def resumo(self):
+      """Tempo próprio e consultas de cada fase, em ms"""
+      return {
+          'total_ms': round(self.total_ms, 2),
+          'amostras': sum(self.amostras.values()),
+          'fases': {
+              nome: {
+                  'ms': round(dados['ms'], 2),
+                  'consultas': dados['consultas'],
+                  'ms_consultas': round(dados['ms_consultas'], 2),
+              }
+              for nome, dados in sorted(self.fases.items(), key=lambda item: -item[1]['ms'])
+          },
+      }
+
+  def colapsado(self):
+      """Pilhas amostradas no formato colapsado (flamegraph.pl, speedscope)"""
+      return ''.join(f'{pilha} {contagem}\n' for pilha, contagem in sorted(self.amostras.items()))
+
+  def estatisticas(self, limite=30, ordem='cumulative'):
+      """Relatório texto do cProfile (as `limite` funções mais caras)"""
+      import pstats
+
+      saida = io.StringIO()
+      pstats.Stats(self._profile, stream=saida).sort_stats(ordem).print_stats(limite)
+      return saida.getvalue()
+
+  def salvar_cprofile(self, caminho):
+      """Grava o cProfile em formato pstats (snakeviz, gprof2dot)"""
+      self._profile.dump_stats(caminho)
+
+
+def perfilavel(view):
+  """Decorator de view: com ?perfil= (só staff) devolve o perfil em vez da resposta
+
+  ?perfil=1 traz o resumo por fase em JSON, ?perfil=colapsado as pilhas
+  para flamegraph e ?perfil=cprofile o relatório do cProfile.
+  """
+  @wraps(view)
+  def wrapper(request, *args, **kwargs):
+      modo = request.GET.get('perfil')
+      if not modo or not request.user.is_staff:
+          return view(request, *args, **kwargs)
+
+      with PerfilRelatorio() as perfil:
+          resposta = view(request, *args, **kwargs)
+
+      if modo == 'colapsado':
+          return HttpResponse(perfil.colapsado(), content_type='text/plain; charset=utf-8')
+      if modo == 'cprofile':
+          return HttpResponse(perfil.estatisticas(), content_type='text/plain; charset=utf-8')
+      return JsonResponse({'status': resposta.status_code, 'bytes': len(resposta.content), **perfil.resumo()})
+
+  return wrapper
@@ -0,0 +1,36 @@
+# utils/periodos.py
+from calendar import monthrange
+from datetime import date, datetime, time, timedelta
+
+from django.utils import timezone
+
+
+def intervalo_do_dia(data):
+  """Início e fim (exclusivo) do dia no fuso local, como datetimes com fuso
+
+  Filtrar com data_venda__gte/__lt usa o índice de data_venda, ao contrário
+  de data_venda__date, que aplica uma função sobre a coluna.
+  """
+  inicio = timezone.make_aware(datetime.combine(data, time.min))
+  fim = timezone.make_aware(datetime.combine(data + timedelta(days=1), time.min))
+  return inicio, fim
+
+
+def intervalo_de_datas(data_inicio, data_fim):
+  """Início do primeiro dia e fim (exclusivo) do último dia, inclusive"""
+  return intervalo_do_dia(data_inicio)[0], intervalo_do_dia(data_fim)[1]
+
+
+def intervalo_do_mes(ano, mes):
+  """Primeiro e último dia do mês"""
+  return date(ano, mes, 1), date(ano, mes, monthrange(ano, mes)[1])
+
+
+def dia_fechado(data):
+  """Um dia está fechado quando já terminou no fuso local"""
+  return data < timezone.localdate()
+
+
+def mes_fechado(ano, mes):
+  hoje = timezone.localdate()
+  return (ano, mes) < (hoje.year, hoje.month)
@@ -0,0 +1,178 @@
+# utils/precos.py
+"""Histórico de preços de tabela (HistoricoPreco)
+
+Produto.preco é só o preço vigente; cada mudança fecha o intervalo aberto
+do produto e abre outro a partir do mesmo instante. As mudanças entram em
+lote (`registrar_precos`): uma consulta pelos intervalos abertos, um UPDATE
+para fechá-los e um bulk_create, qualquer que seja o número de produtos.
+
+A evolução de preços de um produto cruza os intervalos com os relatórios
+diários consolidados, então não percorre os itens de venda.
+"""
+from bisect import bisect_right
+from datetime import date, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.fields.json import KeyTransform
+from django.utils import timezone
+
+from vendas.campos import CENTAVO, de_centavos, para_centavos
+from .periodos import intervalo_de_datas, intervalo_do_dia
+
+# Produtos por consulta (__in) e por bulk_create/bulk_update
+LOTE = 1000
+
+
+def _lotes(valores):
+  valores = list(valores)
+  for posicao in range(0, len(valores), LOTE):
+      yield valores[posicao:posicao + LOTE]
+
+
+def registrar_precos(precos, momento=None):
+  """Grava no histórico os preços {produto_id: preço} que mudaram
+
+  Retorna quantos produtos ganharam um novo intervalo. Não altera
+  Produto.preco (quem chama já gravou ou grava junto, na mesma transação).
+  """
+  from vendas.models import HistoricoPreco
+
+  momento = momento or timezone.now()
+  novos = {produto_id: para_centavos(preco) for produto_id, preco in precos.items()}
+  mudaram = []
+  with transaction.atomic():
+      for lote in _lotes(novos):
+          vigentes = dict(
+              HistoricoPreco.objects.filter(produto_id__in=lote, fim__isnull=True)
+              .values_list('produto_id', 'preco')
+          )
+          mudaram.extend(
+              produto_id for produto_id in lote
+              if produto_id not in vigentes or para_centavos(vigentes[produto_id]) != novos[produto_id]
+          )
+      for lote in _lotes(mudaram):
+          HistoricoPreco.objects.filter(produto_id__in=lote, fim__isnull=True).update(fim=momento)
+      HistoricoPreco.objects.bulk_create(
+          [HistoricoPreco(produto_id=produto_id, preco=de_centavos(novos[produto_id]), inicio=momento)
+           for produto_id in mudaram],
+          batch_size=LOTE,
+      )
+  return len(mudaram)
+
+
+def reajustar_precos(produtos, percentual, momento=None):
+  """Reajusta em `percentual` (ex.: Decimal('5') ou Decimal('-10')) o
+  preço dos produtos do queryset; retorna quantos mudaram de preço"""
+  from vendas.models import Produto
+
+  fator = 1 + Decimal(percentual) / 100
+  with transaction.atomic():
+      alterados = []
+      for produto_id, preco in produtos.select_for_update().values_list('id', 'preco').order_by('id'):
+          novo = max((preco * fator).quantize(CENTAVO, rounding=ROUND_HALF_UP), Decimal('0.00'))
+          if novo != preco:
+              alterados.append(Produto(id=produto_id, preco=novo))
+      Produto.objects.bulk_update(alterados, ['preco'], batch_size=LOTE)
+      registrar_precos({produto.id: produto.preco for produto in alterados}, momento)
+  return len(alterados)
+
+
+def preco_em(produto_id, momento):
+  """Preço de tabela do produto no instante `momento` (None antes do histórico)"""
+  from vendas.models import HistoricoPreco
+
+  return (
+      HistoricoPreco.objects.filter(produto_id=produto_id, inicio__lte=momento)
+      .order_by('-inicio')
+      .values_list('preco', flat=True)
+      .first()
+  )
+
+
+def vigentes_em(momento):
+  """Intervalos do histórico vigentes no instante `momento` (um por produto)
+
+  Queryset: quem precisa de dados do produto faz o join (produto__nome)
+  em vez de montar uma lista de ids.
+  """
+  from vendas.models import HistoricoPreco
+
+  return HistoricoPreco.objects.filter(inicio__lte=momento).filter(Q(fim__isnull=True) | Q(fim__gt=momento))
+
+
+def precos_em(momento, produto_ids=None):
+  """{produto_id: preço} da tabela vigente no instante `momento` (uma consulta)"""
+  intervalos = vigentes_em(momento)
+  if produto_ids is not None:
+      intervalos = intervalos.filter(produto_id__in=produto_ids)
+  return dict(intervalos.values_list('produto_id', 'preco'))
+
+
+def evolucao_precos(produto, data_inicio, data_fim):
+  """Mudanças de preço do produto e, mês a mês, o preço de tabela no fim do
+  mês, a quantidade vendida, a receita e o preço médio realizado
+
+  As vendas vêm dos relatórios diários consolidados (chave: nome do
+  produto); o preço médio abaixo da tabela mostra descontos e vendas a
+  preços antigos. Não há custo cadastrado, então não há margem.
+  """
+  from vendas.models import HistoricoPreco, RelatorioDiario
+
+  inicio, fim = intervalo_de_datas(data_inicio, data_fim)
+  intervalos = list(
+      HistoricoPreco.objects.filter(produto=produto, inicio__lt=fim)
+      .filter(Q(fim__isnull=True) | Q(fim__gt=inicio))
+      .order_by('inicio')
+      .values_list('inicio', 'fim', 'preco')
+  )
+  inicios = [intervalo[0] for intervalo in intervalos]
+
+  def vigente(momento):
+      posicao = bisect_right(inicios, momento) - 1
+      return intervalos[posicao][2] if posicao >= 0 else None
+
+  # Só a chave do produto sai do JSON de cada dia
+  vendas_por_dia = (
+      RelatorioDiario.objects.filter(loja__isnull=True, data__gte=data_inicio, data__lte=data_fim,
+                                     resumo_produtos__has_key=produto.nome)
+      .annotate(vendido=KeyTransform(produto.nome, 'resumo_produtos'))
+      .values_list('data', 'vendido')
+  )
+  por_mes = {}
+  for dia, vendido in vendas_por_dia:
+      soma = por_mes.setdefault((dia.year, dia.month), [0, 0])
+      soma[0] += vendido['quantidade']
+      soma[1] += round(vendido['total'] * 100)
+
+  meses = []
+  ano, mes = data_inicio.year, data_inicio.month
+  while (ano, mes) <= (data_fim.year, data_fim.month):
+      proximo = (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+      # Preço no último instante do mês (ou do período)
+      limite = min(intervalo_do_dia(date(*proximo, 1))[0], fim)
+      preco = vigente(limite - timedelta(microseconds=1))
+      quantidade, centavos = por_mes.get((ano, mes), (0, 0))
+      meses.append({
+          'ano': ano,
+          'mes': mes,
+          'preco_tabela': float(preco) if preco is not None else None,
+          'quantidade': quantidade,
+          'receita': centavos / 100,
+          'preco_medio': round(centavos / quantidade / 100, 2) if quantidade else None,
+      })
+      ano, mes = proximo
+
+  return {
+      'produto': {'id': produto.id, 'nome': produto.nome, 'preco': float(produto.preco)},
+      'alteracoes': [
+          {
+              'inicio': timezone.localtime(comeco).isoformat(),
+              'fim': timezone.localtime(termino).isoformat() if termino else None,
+              'preco': float(preco),
+          }
+          for comeco, termino, preco in intervalos
+      ],
+      'meses': meses,
+  }
@@ -0,0 +1,124 @@
+# utils/ranking.py
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import BigIntegerField, Sum
+
+from .periodos import dia_fechado, intervalo_de_datas
+
+CRITERIOS = ('receita', 'quantidade')
+
+# Curva ABC: classe A até 80% do acumulado, B até 95%, C o restante
+LIMITES_ABC = (('A', 0.80), ('B', 0.95), ('C', 1.0))
+
+
+def invalidar_cache_ranking():
+  """Descarta rankings em cache (usado quando vendas passadas mudam)
+
+  A versão fica no cache compartilhado (settings.CACHES), então vale para
+  todos os workers. É um valor novo a cada invalidação, não um contador:
+  não depende de incr atômico e, se o cache descartar a chave, a versão
+  recriada não reaproveita rankings antigos.
+  """
+  cache.set('ranking:versao', time.time_ns(), None)
+
+
+def _agregar_por_produto(data_inicio, data_fim, criterio, loja=None):
+  """Quantidade e receita por produto no período, ordenados pelo critério
+
+  Meses cujos itens já foram arquivados entram pelo arquivo morto.
+  """
+  from vendas.models import ItemVenda
+  from .arquivo import por_produto
+
+  inicio, fim = intervalo_de_datas(data_inicio, data_fim)
+  itens = ItemVenda.objects.filter(
+      venda__finalizada=True, venda__data_venda__gte=inicio, venda__data_venda__lt=fim
+  )
+  if loja is not None:
+      itens = itens.filter(venda__loja=loja)
+
+  linhas = (
+      itens
+      .values('produto_id', 'produto__nome')
+      .annotate(quantidade=Sum('quantidade'), centavos=Sum('subtotal', output_field=BigIntegerField()))
+      .order_by()
+  )
+  produtos = {
+      linha['produto_id']: [linha['produto__nome'], linha['quantidade'], linha['centavos']]
+      for linha in linhas
+  }
+  for produto_id, (nome, quantidade, centavos) in por_produto(data_inicio, data_fim, loja.id if loja else None).items():
+      soma = produtos.setdefault(produto_id, [nome, 0, 0])
+      soma[1] += quantidade
+      soma[2] += centavos
+
+  resultado = [
+      {
+          'produto_id': produto_id,
+          'nome': nome,
+          'quantidade': quantidade,
+          'receita': centavos / 100,
+      }
+      for produto_id, (nome, quantidade, centavos) in produtos.items()
+  ]
+  resultado.sort(key=lambda produto: (-produto[criterio], produto['nome']))
+  return resultado
+
+
+def classificar_abc(produtos, criterio):
+  """Marca cada produto (já ordenado) com participação e classe ABC"""
+  total = sum(produto[criterio] for produto in produtos)
+  acumulado = 0
+  resumo = {classe: {'produtos': 0, 'participacao': 0.0} for classe, _ in LIMITES_ABC}
+
+  for posicao, produto in enumerate(produtos, start=1):
+      participacao = produto[criterio] / total if total else 0
+      # A classe é decidida pelo acumulado antes do produto, para que o
+      # item que cruza o limite ainda fique na classe de cima
+      classe = next(classe for classe, limite in LIMITES_ABC if acumulado < limite or limite == 1.0)
+      acumulado += participacao
+
+      produto['posicao'] = posicao
+      produto['participacao'] = round(participacao * 100, 2)
+      produto['classe'] = classe
+      resumo[classe]['produtos'] += 1
+      resumo[classe]['participacao'] += participacao * 100
+
+  for dados in resumo.values():
+      dados['participacao'] = round(dados['participacao'], 2)
+
+  return total, resumo
+
+
+def ranking_produtos(data_inicio, data_fim, criterio='receita', limite=10, loja=None):
+  """Top-N produtos do período (de todas as lojas ou de uma) e curva ABC completa
+
+  Períodos já encerrados ficam em cache (o resultado não muda mais).
+  """
+  if criterio not in CRITERIOS:
+      raise ValueError(f'Critério inválido: {criterio}')
+
+  versao = cache.get_or_set('ranking:versao', time.time_ns, None)
+  chave = f'ranking:{versao}:{loja.id if loja else "-"}:{data_inicio.isoformat()}:{data_fim.isoformat()}:{criterio}'
+  dados = cache.get(chave)
+
+  if dados is None:
+      produtos = _agregar_por_produto(data_inicio, data_fim, criterio, loja)
+      total, resumo_abc = classificar_abc(produtos, criterio)
+      dados = {'total': total, 'abc': resumo_abc, 'produtos': produtos}
+
+      if dia_fechado(data_fim):
+          timeout = getattr(settings, 'RELATORIOS_CACHE_PERIODO_FECHADO', 60 * 60 * 24 * 30)
+          cache.set(chave, dados, timeout)
+
+  return {
+      'inicio': data_inicio.strftime('%d/%m/%Y'),
+      'fim': data_fim.strftime('%d/%m/%Y'),
+      'criterio': criterio,
+      'total': dados['total'],
+      'total_produtos': len(dados['produtos']),
+      'abc': dados['abc'],
+      'produtos': dados['produtos'][:limite],
+  }
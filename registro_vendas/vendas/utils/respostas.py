@@ -0,0 +1,23 @@
+# utils/respostas.py
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+try:
+    # Opcional: orjson serializa várias vezes mais rápido que o json da stdlib
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def serializar_json(dados):
+  """Serializa para bytes JSON compacto (sem espaços após separadores)"""
+  if orjson is not None:
+      return orjson.dumps(dados, default=DjangoJSONEncoder().default, option=orjson.OPT_NON_STR_KEYS)
+  return json.dumps(dados, cls=DjangoJSONEncoder, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def resposta_json(dados, status=200):
+  """Equivalente ao JsonResponse usando o serializador mais rápido disponível"""
+  return HttpResponse(serializar_json(dados), status=status, content_type='application/json')
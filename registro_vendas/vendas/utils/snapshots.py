@@ -0,0 +1,155 @@
+# utils/snapshots.py
+"""Modelos de leitura da página de relatórios, guardados em SnapshotLeitura
+
+- 'periodos': anos e meses com vendas (os seletores da página), atualizado
+  quando um relatório diário com vendas é gerado.
+- 'mes:<loja>:<ano>:<mes>:<formato>': a resposta de buscar_relatorios_mes,
+  gravada quando o relatório mensal é gerado e descartada quando um
+  relatório diário do mês muda.
+"""
+import json
+from calendar import monthrange
+from datetime import date
+
+from .respostas import serializar_json
+
+MESES = ['', 'Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
+         'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
+FORMATOS = ('completo', 'compacto')
+CHAVE_PERIODOS = 'periodos'
+
+
+def chave_mes(ano, mes, loja_id=None, formato='completo'):
+  return f'mes:{loja_id or "-"}:{ano}:{mes}:{formato}'
+
+
+def dias_formato_completo(ano, mes, relatorios):
+  """Um objeto por dia do mês, inclusive os dias sem vendas"""
+  relatorios_diarios = []
+
+  for dia in range(1, monthrange(ano, mes)[1] + 1):
+      data_dia = date(ano, mes, dia)
+      relatorio_dia = relatorios.get(data_dia)
+
+      if relatorio_dia is not None:
+          relatorios_diarios.append({
+              'dia': dia,
+              'data': data_dia.strftime('%d/%m/%Y'),
+              'total': float(relatorio_dia.total_vendido),
+              'numero_vendas': relatorio_dia.numero_vendas,
+              'tem_vendas': relatorio_dia.numero_vendas > 0,
+              'produtos_resumo': relatorio_dia.resumo_produtos
+          })
+      else:
+          relatorios_diarios.append({
+              'dia': dia,
+              'data': data_dia.strftime('%d/%m/%Y'),
+              'total': 0.0,
+              'numero_vendas': 0,
+              'tem_vendas': False,
+              'produtos_resumo': {}
+          })
+
+  return {'relatorios_diarios': relatorios_diarios}
+
+
+def dias_formato_compacto(ano, mes, relatorios):
+  """Arrays por coluna (posição = dia - 1); resumo de produtos só nos dias com
+  vendas, como listas [nome, quantidade, total] em vez de objetos"""
+  dias_no_mes = monthrange(ano, mes)[1]
+  totais = [0.0] * dias_no_mes
+  vendas = [0] * dias_no_mes
+  produtos = {}
+
+  for data_dia, relatorio_dia in relatorios.items():
+      indice = data_dia.day - 1
+      totais[indice] = float(relatorio_dia.total_vendido)
+      vendas[indice] = relatorio_dia.numero_vendas
+      if relatorio_dia.numero_vendas > 0:
+          produtos[data_dia.day] = [
+              [nome, dados['quantidade'], dados['total']]
+              for nome, dados in relatorio_dia.resumo_produtos.items()
+          ]
+
+  return {
+      'formato': 'compacto',
+      'dias': dias_no_mes,
+      'totais': totais,
+      'vendas': vendas,
+      'produtos': produtos
+  }
+
+
+def materializar_mes(relatorio_mensal, relatorios=None):
+  """Grava as respostas do mês nos dois formatos; devolve {formato: bytes}
+
+  `relatorios` são os diários do mês já lidos pela consolidação; sem eles,
+  uma consulta.
+  """
+  from vendas.models import SnapshotLeitura
+
+  ano, mes = relatorio_mensal.ano, relatorio_mensal.mes
+  if relatorios is None:
+      relatorios = relatorio_mensal.relatorios_diarios
+  por_data = {relatorio.data: relatorio for relatorio in relatorios}
+
+  cabecalho = {
+      'mes_nome': MESES[mes],
+      'ano': ano,
+      'loja': relatorio_mensal.loja.nome if relatorio_mensal.loja_id else None,
+      'total_mensal': float(relatorio_mensal.total_mensal),
+      'dias_com_vendas': relatorio_mensal.dias_com_vendas,
+      'sucesso': True
+  }
+  conteudos = {
+      'completo': serializar_json({**cabecalho, **dias_formato_completo(ano, mes, por_data)}),
+      'compacto': serializar_json({**cabecalho, **dias_formato_compacto(ano, mes, por_data)}),
+  }
+  for formato, conteudo in conteudos.items():
+      SnapshotLeitura.gravar(chave_mes(ano, mes, relatorio_mensal.loja_id, formato), conteudo)
+  return conteudos
+
+
+def descartar_mes(data, loja_id=None):
+  """O relatório diário de `data` mudou: as respostas do mês saem"""
+  from vendas.models import SnapshotLeitura
+
+  SnapshotLeitura.descartar(f'mes:{loja_id or "-"}:{data.year}:{data.month}:')
+
+
+def periodos():
+  """{'anos': [...], 'meses': {ano: [...]}} com vendas (anos do mais recente)
+
+  Lê o snapshot; só na primeira vez (banco sem snapshot) percorre as vendas.
+  """
+  from vendas.models import SnapshotLeitura, Venda
+
+  conteudo = SnapshotLeitura.ler(CHAVE_PERIODOS)
+  if conteudo is not None:
+      return json.loads(conteudo)
+
+  meses = {}
+  for mes in Venda.objects.filter(finalizada=True).dates('data_venda', 'month'):
+      meses.setdefault(str(mes.year), []).append(mes.month)
+  dados = _montar_periodos(meses)
+  SnapshotLeitura.gravar(CHAVE_PERIODOS, serializar_json(dados))
+  return dados
+
+
+def registrar_periodo(data):
+  """Inclui o mês de `data` nos períodos com vendas (grava só se for novo)"""
+  from vendas.models import SnapshotLeitura
+
+  dados = periodos()
+  meses = dados['meses'].setdefault(str(data.year), [])
+  if data.month in meses:
+      return
+  meses.append(data.month)
+  SnapshotLeitura.gravar(CHAVE_PERIODOS, serializar_json(_montar_periodos(dados['meses'])))
+
+
+def _montar_periodos(meses):
+  return {
+      'anos': sorted((int(ano) for ano in meses), reverse=True),
+      'meses': {ano: sorted(lista) for ano, lista in meses.items()},
+  }
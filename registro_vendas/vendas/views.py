@@ -1,24 +1,99 @@
+import asyncio
 import json
+from functools import wraps
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, get_object_or_404
-from django.http import HttpResponse, JsonResponse
+from django.urls import reverse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.utils import timezone
-from datetime import date
+from datetime import date, timedelta
 from calendar import monthrange
 from django.core import serializers
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count, F, Q, Sum
 
-from .models import Produto, Venda, ItemVenda, RelatorioDiario, RelatorioMensal
+from .models import (
+  Produto, Venda, ItemVenda, RelatorioDiario, RelatorioMensal, AlertaEstoque, Loja, EstoqueLoja,
+  SessaoCaixa, SnapshotLeitura, VendasPorHora
+)
 from .utils.relatorios import GeradorRelatorios
+from .utils.importacao import ImportadorProdutos
+from .utils.respostas import resposta_json
+from .utils.ranking import ranking_produtos as calcular_ranking
+from .utils.mapa_calor import mapa_calor
+from .utils import ao_vivo, comparativos, cupons, extrato, precos, snapshots
+from .utils import formatos as formatos_relatorio
+from .utils.devolucoes import cancelar_venda as estornar_venda, devolver_itens as estornar_itens
+from .utils.periodos import intervalo_de_datas, intervalo_do_dia, intervalo_do_mes
+from .utils.cache_http import cache_por_versao, versao_relatorio_diario, versao_relatorio_mensal
+from .utils.perfil import fase, perfilavel
+
+# Reimpressão de cupons em lote: períodos de até um mês
+MAXIMO_DIAS_REIMPRESSAO = 31
+
+def _loja_da_requisicao(request):
+  """Loja do parâmetro ?loja=<id>; None consolida todas as lojas"""
+  loja_id = request.GET.get('loja')
+  if not loja_id:
+      return None
+  try:
+      return Loja.objects.get(id=int(loja_id))
+  except Loja.DoesNotExist:
+      raise ValueError(f'Loja {loja_id} não encontrada')
+
+def _exige_login(view):
+  """401 em JSON (e não o redirecionamento do login_required) para quem
+  não está autenticado"""
+  @wraps(view)
+  def protegida(request, *args, **kwargs):
+      if not request.user.is_authenticated:
+          return JsonResponse({'erro': True, 'mensagem': 'Faça login para operar o caixa'}, status=401)
+      return view(request, *args, **kwargs)
+  return protegida
 
 def home(request):
   return render(request, 'base.html')
 
+@require_http_methods(["GET"])
+def saude(request):
+  """Verificação do balanceador: responde 503 se o banco não atende"""
+  try:
+      with connection.cursor() as cursor:
+          cursor.execute('SELECT 1')
+  except DatabaseError:
+      return JsonResponse({'status': 'erro', 'banco': False}, status=503)
+  return JsonResponse({'status': 'ok', 'banco': True})
+
 def produtos(request):
   produtos = Produto.objects.all().order_by('-data_cadastro')
   return render(request, 'vendas/produtos.html', {'produtos': produtos})
 
+@staff_member_required
+@require_http_methods(["POST"])
+def importar_produtos(request):
+  """Importação em massa de produtos via upload de CSV (campo 'arquivo')"""
+  arquivo = request.FILES.get('arquivo')
+  if arquivo is None:
+      return JsonResponse({'erro': 'Envie o CSV no campo "arquivo"'}, status=400)
+
+  importador = ImportadorProdutos(
+      somar_estoque=request.POST.get('somar_estoque') in ('1', 'true', 'on')
+  )
+
+  try:
+      resultado = importador.importar(arquivo.file)
+  except (ValueError, UnicodeDecodeError) as e:
+      return JsonResponse({'erro': f'Arquivo inválido: {e}'}, status=400)
+
+  resultado['sucesso'] = True
+  return JsonResponse(resultado)
+
 def registrar_vendas(request):
   produtos = Produto.objects.filter(quantidade_estoque__gt=0)
 
@@ -31,16 +106,68 @@ def registrar_vendas(request):
   
   return render(request, 'vendas/registrar_vendas.html', {'produtos': produtos_json})
 
+def _pagina_extrato(request):
+  """Página do extrato pedida em request.GET; ValueError se algo for inválido"""
+  filtros = extrato.Filtros.da_requisicao(request.GET)
+  tamanho = int(request.GET.get('tamanho', extrato.TAMANHO_PAGINA))
+  if not 1 <= tamanho <= extrato.MAXIMO_PAGINA:
+      raise ValueError('Tamanho de página inválido')
+  return extrato.pagina(filtros, request.GET.get('depois'), request.GET.get('antes'), tamanho)
+
+def extrato_vendas(request):
+  """Extrato de vendas com filtros e navegação por cursor (utils/extrato.py)"""
+  erro = None
+  try:
+      resultado = _pagina_extrato(request)
+  except extrato.FiltroArquivado as e:
+      erro = str(e)
+      resultado = {'vendas': [], 'anterior': None, 'proximo': None}
+  except (ValueError, OverflowError):
+      erro = 'Filtros inválidos'
+      resultado = {'vendas': [], 'anterior': None, 'proximo': None}
+
+  # Os links de navegação mantêm os filtros e trocam só o cursor
+  parametros = request.GET.copy()
+  parametros.pop('depois', None)
+  parametros.pop('antes', None)
+  navegacao = {}
+  for direcao, chave in (('anterior', 'antes'), ('proximo', 'depois')):
+      if resultado[direcao]:
+          parametros[chave] = resultado[direcao]
+          navegacao[direcao] = parametros.urlencode()
+          del parametros[chave]
+
+  return render(request, 'vendas/extrato.html', {
+      'vendas': resultado['vendas'],
+      'navegacao': navegacao,
+      'erro': erro,
+      'filtros': request.GET,
+      'lojas': Loja.objects.values_list('id', 'nome'),
+  })
+
+@require_http_methods(["GET"])
+def buscar_vendas(request):
+  """Extrato de vendas em JSON
+
+  Parâmetros: inicio e fim (AAAA-MM-DD), produto (id) ou codigo,
+  valor_min, valor_max, loja, tamanho (padrão 50, até 200) e o cursor depois ou antes devolvido
+  em 'proximo'/'anterior' pela página atual.
+  """
+  try:
+      resultado = _pagina_extrato(request)
+  except extrato.FiltroArquivado as e:
+      return JsonResponse({'erro': str(e)}, status=400)
+  except (ValueError, TypeError, OverflowError):
+      return JsonResponse({'erro': 'Parâmetros inválidos'}, status=400)
+  return resposta_json({'sucesso': True, **extrato.como_json(resultado)})
+
 def visualizar_relatorios(request):
   """Página principal de visualização de relatórios"""
   ano_atual = date.today().year
   mes_atual = date.today().month
   
-  # Buscar anos disponíveis
-  anos_disponiveis = []
-  vendas_anos = Venda.objects.dates('data_venda', 'year', order='DESC')
-  for venda_ano in vendas_anos:
-      anos_disponiveis.append(venda_ano.year)
+  # Anos com vendas, do snapshot (sem consultar as vendas)
+  anos_disponiveis = snapshots.periodos()['anos']
   
   # Se não há vendas, adicionar ano atual
   if not anos_disponiveis:
@@ -69,188 +196,394 @@ def visualizar_relatorios(request):
   return render(request, 'vendas/visualizar_relatorios.html', context)
 
 @require_http_methods(["GET"])
+def periodos_disponiveis(request):
+  """Anos e meses com vendas ({'anos': [...], 'meses': {ano: [...]}})"""
+  return resposta_json(snapshots.periodos())
+
+@require_http_methods(["GET"])
+@perfilavel
+@cache_por_versao(versao_relatorio_mensal)
 def buscar_relatorios_mes(request):
-  """API para buscar relatórios de um mês específico"""
+  """API para buscar relatórios de um mês específico
+
+  Com ?formato=compacto os dias vêm em arrays por coluna em vez de um
+  objeto por dia, reduzindo bastante o tamanho da resposta. Com ?loja=<id>
+  traz só os relatórios daquela loja.
+  """
   try:
       ano = int(request.GET.get('ano'))
       mes = int(request.GET.get('mes'))
+      loja = _loja_da_requisicao(request)
       
       # Validar dados
       if not (1 <= mes <= 12):
           return JsonResponse({'erro': 'Mês inválido'}, status=400)
       
-      # Processar relatório mensal (gera se não existir)
-      relatorio_mensal = GeradorRelatorios.processar_vendas_do_mes(ano, mes)
-      
-      # Buscar relatórios diários do mês
-      dias_no_mes = monthrange(ano, mes)[1]
-      relatorios_diarios = []
-      
-      for dia in range(1, dias_no_mes + 1):
-          data_dia = date(ano, mes, dia)
-          
-          try:
-              relatorio_dia = RelatorioDiario.objects.get(data=data_dia)
-              relatorios_diarios.append({
-                  'dia': dia,
-                  'data': data_dia.strftime('%d/%m/%Y'),
-                  'total': float(relatorio_dia.total_vendido),
-                  'numero_vendas': relatorio_dia.numero_vendas,
-                  'tem_vendas': relatorio_dia.numero_vendas > 0,
-                  'produtos_resumo': relatorio_dia.resumo_produtos
-              })
-          except RelatorioDiario.DoesNotExist:
-              relatorios_diarios.append({
-                  'dia': dia,
-                  'data': data_dia.strftime('%d/%m/%Y'),
-                  'total': 0.0,
-                  'numero_vendas': 0,
-                  'tem_vendas': False,
-                  'produtos_resumo': {}
-              })
+      # Resposta pronta, gravada quando o relatório mensal foi gerado
+      formato = 'compacto' if request.GET.get('formato') == 'compacto' else 'completo'
+      chave = snapshots.chave_mes(ano, mes, loja.id if loja else None, formato)
+      with fase('consulta'):
+          conteudo = SnapshotLeitura.ler(chave)
+      if conteudo is None:
+          # Ainda não gerado (ou um dia do mês mudou): gera e grava
+          GeradorRelatorios.processar_vendas_do_mes(ano, mes, loja)
+          conteudo = SnapshotLeitura.ler(chave)
       
-      # Dados do mês
-      meses_nomes = ['', 'Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
-                    'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
-      
-      response_data = {
-          'mes_nome': meses_nomes[mes],
-          'ano': ano,
-          'total_mensal': float(relatorio_mensal.total_mensal),
-          'dias_com_vendas': relatorio_mensal.dias_com_vendas,
-          'relatorios_diarios': relatorios_diarios,
-          'sucesso': True
-      }
-      
-      return JsonResponse(response_data)
+      return HttpResponse(conteudo, content_type='application/json')
       
   except (ValueError, TypeError) as e:
       return JsonResponse({'erro': 'Parâmetros inválidos'}, status=400)
   except Exception as e:
       return JsonResponse({'erro': 'Erro interno do servidor'}, status=500)
 
+@require_http_methods(["GET"])
+def ranking_produtos(request):
+  """Top-N produtos por receita ou quantidade e curva ABC de um período
+
+  Parâmetros: inicio e fim (AAAA-MM-DD, padrão: mês atual), criterio
+  (receita ou quantidade) e limite (padrão 10).
+  """
+  try:
+      hoje = date.today()
+      inicio = request.GET.get('inicio')
+      fim = request.GET.get('fim')
+      data_inicio = date.fromisoformat(inicio) if inicio else hoje.replace(day=1)
+      data_fim = date.fromisoformat(fim) if fim else hoje
+      limite = int(request.GET.get('limite', 10))
+      criterio = request.GET.get('criterio', 'receita')
+
+      if data_inicio > data_fim or not (1 <= limite <= 1000):
+          return JsonResponse({'erro': 'Parâmetros inválidos'}, status=400)
+
+      dados = calcular_ranking(data_inicio, data_fim, criterio, limite, _loja_da_requisicao(request))
+      dados['sucesso'] = True
+      return resposta_json(dados)
+
+  except (ValueError, TypeError) as e:
+      return JsonResponse({'erro': 'Parâmetros inválidos'}, status=400)
+  except Exception as e:
+      return JsonResponse({'erro': 'Erro ao calcular ranking'}, status=500)
+
+@require_http_methods(["GET"])
+def mapa_calor_vendas(request):
+  """Vendas por dia da semana × hora (mapa de calor) de um período
+
+  Parâmetros: inicio e fim (AAAA-MM-DD, padrão: últimos 12 meses) e loja.
+  Lê só os baldes de VendasPorHora, então um ano inteiro custa o mesmo
+  que um mês movimentado.
+  """
+  try:
+      hoje = timezone.localdate()
+      inicio = request.GET.get('inicio')
+      fim = request.GET.get('fim')
+      data_fim = date.fromisoformat(fim) if fim else hoje
+      data_inicio = date.fromisoformat(inicio) if inicio else data_fim - timedelta(days=364)
+      if data_inicio > data_fim:
+          return JsonResponse({'erro': 'Parâmetros inválidos'}, status=400)
+
+      dados = mapa_calor(data_inicio, data_fim, _loja_da_requisicao(request))
+      dados['sucesso'] = True
+      return resposta_json(dados)
+
+  # OverflowError: datas nos extremos (0001-01-01, 9999-12-31) saem do
+  # intervalo de date ao somar ou subtrair dias
+  except (ValueError, TypeError, OverflowError):
+      return JsonResponse({'erro': 'Parâmetros inválidos'}, status=400)
+
+@require_http_methods(["GET"])
+def comparativo_vendas(request):
+  """Comparativos de vendas entre períodos
+
+  ?tipo=dia&data=AAAA-MM-DD: dia anterior e mesmo dia da semana passada
+  ?tipo=mes&ano=&mes=: mês anterior e mesmo mês do ano anterior
+  ?tipo=janela&dias=7|30&fim=AAAA-MM-DD: janela anterior e a de 52 semanas antes
+  ?tipo=serie&ano=&mes=&meses=24: série mensal com o ano anterior (gráfico)
+  Todos aceitam ?loja=<id>. Sem data, usa hoje / o mês atual.
+  """
+  try:
+      hoje = timezone.localdate()
+      loja = _loja_da_requisicao(request)
+      tipo = request.GET.get('tipo', 'mes')
+      ano = int(request.GET.get('ano', hoje.year))
+      mes = int(request.GET.get('mes', hoje.month))
+      
+      if tipo == 'dia':
+          data = date.fromisoformat(request.GET['data']) if request.GET.get('data') else hoje
+          dados = comparativos.comparar_dia(data, loja)
+      elif tipo == 'mes':
+          dados = comparativos.comparar_mes(ano, mes, loja)
+      elif tipo == 'janela':
+          fim = date.fromisoformat(request.GET['fim']) if request.GET.get('fim') else hoje
+          dados = comparativos.comparar_janela(fim, int(request.GET.get('dias', 7)), loja)
+      elif tipo == 'serie':
+          dados = {'meses': comparativos.serie_mensal(ano, mes, int(request.GET.get('meses', 24)), loja)}
+      else:
+          return JsonResponse({'erro': 'Tipo de comparativo inválido'}, status=400)
+      
+      return resposta_json({'sucesso': True, 'tipo': tipo, **dados})
+      
+  # Períodos de comparação antes de 0001-01-01 ou depois de 9999-12-31
+  except (ValueError, TypeError, OverflowError):
+      return JsonResponse({'erro': 'Parâmetros inválidos'}, status=400)
+
+@require_http_methods(["GET"])
+def evolucao_precos(request, produto_id):
+  """Mudanças de preço do produto e, mês a mês, preço de tabela, quantidade,
+  receita e preço médio realizado
+
+  Parâmetros: inicio e fim (AAAA-MM-DD, padrão: últimos 12 meses). Lê o
+  histórico de preços e os relatórios diários, não os itens de venda.
+  """
+  produto = get_object_or_404(Produto, id=produto_id)
+  try:
+      hoje = timezone.localdate()
+      inicio = request.GET.get('inicio')
+      fim = request.GET.get('fim')
+      data_fim = date.fromisoformat(fim) if fim else hoje
+      data_inicio = date.fromisoformat(inicio) if inicio else (data_fim - timedelta(days=364)).replace(day=1)
+      if data_inicio > data_fim:
+          return JsonResponse({'erro': 'Parâmetros inválidos'}, status=400)
+      # O fim de 9999-12-31 cai fora do calendário (OverflowError)
+      intervalo_de_datas(data_inicio, data_fim)
+  except (ValueError, TypeError, OverflowError):
+      return JsonResponse({'erro': 'Parâmetros inválidos'}, status=400)
+
+  dados = precos.evolucao_precos(produto, data_inicio, data_fim)
+  dados['sucesso'] = True
+  return resposta_json(dados)
+
+@require_http_methods(["GET"])
+def tabela_precos(request):
+  """Tabela de preços vigente num dia (?data=AAAA-MM-DD, ao fim do dia;
+  padrão: agora), em uma consulta ao histórico"""
+  try:
+      data = request.GET.get('data')
+      momento = intervalo_do_dia(date.fromisoformat(data))[1] - timedelta(microseconds=1) if data else timezone.now()
+  except (ValueError, OverflowError):
+      # OverflowError: o fim de 9999-12-31 cai fora do calendário
+      return JsonResponse({'erro': 'Parâmetros inválidos'}, status=400)
+
+  # Um join com o produto: sem lista de ids (limite de parâmetros do SQLite)
+  produtos = (
+      precos.vigentes_em(momento)
+      .order_by('produto__nome')
+      .values_list('produto_id', 'produto__codigo', 'produto__nome', 'preco')
+  )
+  return resposta_json({
+      'sucesso': True,
+      'momento': timezone.localtime(momento).isoformat(),
+      'produtos': [
+          {'id': produto_id, 'codigo': codigo, 'nome': nome, 'preco': float(preco)}
+          for produto_id, codigo, nome, preco in produtos
+      ],
+  })
+
+@require_http_methods(["GET"])
+def resumo_lojas(request):
+  """Totais do mês lado a lado por loja, em uma única consulta agrupada"""
+  try:
+      ano = int(request.GET.get('ano'))
+      mes = int(request.GET.get('mes'))
+      inicio, fim = intervalo_de_datas(*intervalo_do_mes(ano, mes))
+  except (ValueError, TypeError):
+      return JsonResponse({'erro': 'Parâmetros inválidos'}, status=400)
+
+  linhas = (
+      Venda.objects
+      .filter(finalizada=True, data_venda__gte=inicio, data_venda__lt=fim)
+      .values('loja_id', 'loja__nome')
+      .annotate(total=Sum('total'), numero_vendas=Count('id'))
+      .order_by('-total')
+  )
+
+  lojas = [{
+      'loja_id': linha['loja_id'],
+      'loja': linha['loja__nome'] or 'Sem loja',
+      'total': float(linha['total']),
+      'numero_vendas': linha['numero_vendas']
+  } for linha in linhas]
+
+  return JsonResponse({
+      'sucesso': True,
+      'ano': ano,
+      'mes': mes,
+      'total_geral': sum(loja['total'] for loja in lojas),
+      'lojas': lojas
+  })
+
+@require_http_methods(["GET"])
+def alertas_estoque(request):
+  """Alertas de ruptura de estoque gravados pelo cálculo em lote"""
+  try:
+      limite = int(request.GET.get('limite', 50))
+      if not (1 <= limite <= 1000):
+          raise ValueError
+  except ValueError:
+      return JsonResponse({'erro': 'Parâmetros inválidos'}, status=400)
+
+  alertas = AlertaEstoque.objects.select_related('produto')[:limite]
+
+  return JsonResponse({
+      'sucesso': True,
+      'alertas': [{
+          'produto_id': alerta.produto_id,
+          'produto': alerta.produto.nome,
+          'nivel': alerta.nivel,
+          'estoque_atual': alerta.estoque_atual,
+          'vendas_por_dia': alerta.vendas_por_dia,
+          'dias_ate_ruptura': alerta.dias_ate_ruptura,
+          'quantidade_sugerida': alerta.quantidade_sugerida,
+          'gerado_em': alerta.gerado_em.strftime('%d/%m/%Y %H:%M')
+      } for alerta in alertas]
+  })
+
+def _formatos_da_requisicao(request):
+  """?formato=pdf (padrão), xlsx, csv, txt ou vários separados por vírgula (zip)"""
+  formatos = list(dict.fromkeys(f.strip() for f in request.GET.get('formato', 'pdf').split(',') if f.strip()))
+  if not formatos or any(formato not in formatos_relatorio.TIPOS_CONTEUDO for formato in formatos):
+      raise ValueError('Formato inválido')
+  return formatos
+
+def _resposta_arquivo(dados, formatos):
+  with fase('layout'):
+      conteudo, tipo, nome = formatos_relatorio.exportar(dados, formatos)
+  with fase('serializacao'):
+      response = HttpResponse(conteudo, content_type=tipo)
+  response['Content-Disposition'] = f'attachment; filename="{nome}"'
+  return response
+
+@perfilavel
+@cache_por_versao(versao_relatorio_diario)
 def download_relatorio_diario(request, ano, mes, dia):
-  """Download do relatório diário em PDF"""
+  """Download do relatório diário (PDF ou ?formato=xlsx,csv,txt)
+
+  O relatório é lido uma vez e cada formato é desenhado a partir dele.
+  """
   try:
       data_escolhida = date(ano, mes, dia)
+      loja = _loja_da_requisicao(request)
+      formatos = _formatos_da_requisicao(request)
       
       # Verificar se há vendas neste dia
-      relatorio = GeradorRelatorios.processar_vendas_do_dia(data_escolhida)
+      dados = formatos_relatorio.dados_diario(data_escolhida, loja)
       
-      if relatorio.numero_vendas == 0:
+      if dados.numero_vendas == 0:
           messages.warning(request, f'Não há vendas registradas para {data_escolhida.strftime("%d/%m/%Y")}')
           return JsonResponse({'erro': 'Sem vendas neste dia'}, status=404)
       
-      # Gerar PDF
-      buffer = GeradorRelatorios.pdf_diario(data_escolhida)
-      
-      # Preparar resposta
-      response = HttpResponse(buffer, content_type='application/pdf')
-      filename = f'relatorio_diario_{data_escolhida.strftime("%d_%m_%Y")}.pdf'
-      response['Content-Disposition'] = f'attachment; filename="{filename}"'
-      
-      return response
+      return _resposta_arquivo(dados, formatos)
       
   except ValueError:
-      messages.error(request, 'Data inválida fornecida')
-      return JsonResponse({'erro': 'Data inválida'}, status=400)
+      messages.error(request, 'Data, loja ou formato inválido')
+      return JsonResponse({'erro': 'Data, loja ou formato inválido'}, status=400)
   except Exception as e:
       messages.error(request, 'Erro ao gerar relatório')
       return JsonResponse({'erro': 'Erro ao gerar PDF'}, status=500)
 
+@perfilavel
+@cache_por_versao(versao_relatorio_mensal)
 def download_relatorio_mensal(request, ano, mes):
-  """Download do relatório mensal em PDF"""
+  """Download do relatório mensal (PDF ou ?formato=xlsx,csv,txt)"""
   try:
+      loja = _loja_da_requisicao(request)
+      formatos = _formatos_da_requisicao(request)
+      
       # Verificar se há vendas neste mês
-      relatorio_mensal = GeradorRelatorios.processar_vendas_do_mes(ano, mes)
+      dados = formatos_relatorio.dados_mensal(ano, mes, loja)
       
-      if relatorio_mensal.dias_com_vendas == 0:
-          meses_nomes = ['', 'Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
-                        'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
-          messages.warning(request, f'Não há vendas registradas para {meses_nomes[mes]} de {ano}')
+      if dados.dias_com_vendas == 0:
+          messages.warning(request, f'Não há vendas registradas para {formatos_relatorio.MESES[mes]} de {ano}')
           return JsonResponse({'erro': 'Sem vendas neste mês'}, status=404)
       
-      # Gerar PDF
-      buffer = GeradorRelatorios.pdf_mensal(ano, mes)
-      
-      # Preparar resposta
-      response = HttpResponse(buffer, content_type='application/pdf')
-      meses_nomes = ['', 'Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
-                    'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
-      filename = f'relatorio_mensal_{meses_nomes[mes].lower()}_{ano}.pdf'
-      response['Content-Disposition'] = f'attachment; filename="{filename}"'
-      
-      return response
+      return _resposta_arquivo(dados, formatos)
       
+  except ValueError:
+      return JsonResponse({'erro': 'Loja ou formato inválido'}, status=400)
   except Exception as e:
       messages.error(request, 'Erro ao gerar relatório mensal')
       return JsonResponse({'erro': 'Erro ao gerar PDF'}, status=500)
 
+@perfilavel
+@cache_por_versao(versao_relatorio_diario)
 def preview_relatorio_diario(request, ano, mes, dia):
   """Preview do relatório diário sem download"""
   try:
       data_escolhida = date(ano, mes, dia)
-      relatorio = GeradorRelatorios.processar_vendas_do_dia(data_escolhida)
+      relatorio = GeradorRelatorios.processar_vendas_do_dia(data_escolhida, _loja_da_requisicao(request))
       
       # Formato texto como no caderno
       texto_formatado = relatorio.formato_caderno()
       
-      return JsonResponse({
-          'sucesso': True,
-          'data': data_escolhida.strftime('%d/%m/%Y'),
-          'texto_formatado': texto_formatado,
-          'total_vendido': float(relatorio.total_vendido),
-          'numero_vendas': relatorio.numero_vendas,
-          'produtos': relatorio.resumo_produtos
-      })
+      with fase('serializacao'):
+          return JsonResponse({
+              'sucesso': True,
+              'data': data_escolhida.strftime('%d/%m/%Y'),
+              'texto_formatado': texto_formatado,
+              'total_vendido': float(relatorio.total_vendido),
+              'numero_vendas': relatorio.numero_vendas,
+              'produtos': relatorio.resumo_produtos
+          })
       
+  except ValueError:
+      return JsonResponse({'erro': 'Data ou loja inválida'}, status=400)
   except Exception as e:
       return JsonResponse({'erro': 'Erro ao gerar preview'}, status=500)
 
 def estatisticas_rapidas(request):
-  """Estatísticas rápidas para dashboard"""
+  """Estatísticas rápidas para dashboard (de todas as lojas ou de ?loja=<id>)"""
   try:
-      hoje = date.today()
-      
-      # Relatório de hoje
-      relatorio_hoje = GeradorRelatorios.processar_vendas_do_dia(hoje)
-      
-      # Relatório do mês atual
-      relatorio_mes = GeradorRelatorios.processar_vendas_do_mes(hoje.year, hoje.month)
-      
-      # Comparativo com ontem
-      ontem = date(hoje.year, hoje.month, hoje.day - 1) if hoje.day > 1 else None
-      vendas_ontem = 0
-      if ontem:
-          try:
-              relatorio_ontem = RelatorioDiario.objects.get(data=ontem)
-              vendas_ontem = float(relatorio_ontem.total_vendido)
-          except RelatorioDiario.DoesNotExist:
-              vendas_ontem = 0
-      
-      return JsonResponse({
-          'hoje': {
-              'total': float(relatorio_hoje.total_vendido),
-              'vendas': relatorio_hoje.numero_vendas,
-              'itens': relatorio_hoje.total_itens
-          },
-          'mes_atual': {
-              'total': float(relatorio_mes.total_mensal),
-              'dias_vendas': relatorio_mes.dias_com_vendas
-          },
-          'comparativo': {
-              'ontem': vendas_ontem,
-              'diferenca': float(relatorio_hoje.total_vendido) - vendas_ontem
-          }
-      })
-      
+      loja = _loja_da_requisicao(request)
+      return JsonResponse(ao_vivo.estatisticas_do_dia(loja))
+  except ValueError:
+      return JsonResponse({'erro': 'Loja inválida'}, status=400)
   except Exception as e:
       return JsonResponse({'erro': 'Erro ao buscar estatísticas'}, status=500)
   
+async def eventos_estatisticas(request):
+  """Estatísticas do dashboard por Server-Sent Events (?loja=<id>)
+
+  Envia o resumo atual ao conectar e um novo a cada venda. Só funciona
+  servido pelo ASGI (asgi.py); no WSGI responde 204, que faz o EventSource
+  desistir e a página voltar a consultar estatisticas-rapidas.
+  """
+  if not isinstance(request, ASGIRequest):
+      return HttpResponse(status=204)
+  try:
+      loja = await sync_to_async(_loja_da_requisicao)(request)
+  except ValueError:
+      return JsonResponse({'erro': 'Loja inválida'}, status=400)
+
+  resposta = StreamingHttpResponse(_fluxo_estatisticas(loja.id if loja else None), content_type='text/event-stream')
+  resposta['Cache-Control'] = 'no-cache'
+  # Sem buffer no nginx, senão os eventos só chegam em blocos
+  resposta['X-Accel-Buffering'] = 'no'
+  return resposta
+
+async def _fluxo_estatisticas(loja_id):
+  fila = ao_vivo.transmissor.assinar(loja_id)
+  try:
+      enviada = await sync_to_async(ao_vivo.versao)(loja_id)
+      yield await sync_to_async(ao_vivo.transmissor.payload)(loja_id, enviada)
+      while True:
+          try:
+              versao, evento = await asyncio.wait_for(fila.get(), ao_vivo.INTERVALO_PING)
+          except asyncio.TimeoutError:
+              # Vendas de outros processos (ou a virada do dia) só mudam a versão no cache
+              versao = await sync_to_async(ao_vivo.versao)(loja_id)
+              if versao == enviada:
+                  yield b': ping\n\n'
+                  continue
+              evento = await sync_to_async(ao_vivo.transmissor.payload)(loja_id, versao)
+          if versao != enviada:
+              enviada = versao
+              yield evento
+  finally:
+      ao_vivo.transmissor.cancelar(loja_id, fila)
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def finalizar_venda(request):
-    """Finaliza uma venda recebendo os itens via JSON"""
+    """Finaliza uma venda recebendo os itens via JSON (e, opcionalmente, loja_id e sessao_id)"""
     try:
         # Receber dados JSON do frontend
         dados = json.loads(request.body)
@@ -263,6 +596,36 @@ def finalizar_venda(request):
                 'mensagem': 'Nenhum item na venda para finalizar'
             }, status=400)
         
+        # Turno de caixa em que a venda é registrada (opcional)
+        sessao = None
+        if dados.get('sessao_id'):
+            try:
+                sessao = SessaoCaixa.objects.select_related('loja').get(id=dados['sessao_id'])
+            except (SessaoCaixa.DoesNotExist, ValueError):
+                sessao = None
+            if sessao is None or not sessao.aberta:
+                return JsonResponse({
+                    'erro': True,
+                    'mensagem': 'Sessão de caixa não encontrada ou já fechada'
+                }, status=400)
+        
+        # Loja da venda (vendas sem loja são da loja única)
+        loja = sessao.loja if sessao else None
+        estoques_loja = {}
+        if dados.get('loja_id') and loja is None:
+            try:
+                loja = Loja.objects.get(id=dados['loja_id'])
+            except (Loja.DoesNotExist, ValueError):
+                return JsonResponse({
+                    'erro': True,
+                    'mensagem': f'Loja com ID {dados["loja_id"]} não encontrada'
+                }, status=400)
+        if loja is not None:
+            estoques_loja = {
+                estoque.produto_id: estoque
+                for estoque in EstoqueLoja.objects.filter(loja=loja)
+            }
+        
         # Calcular total
         total_calculado = 0
         itens_validados = []
@@ -279,6 +642,14 @@ def finalizar_venda(request):
                         'mensagem': f'Estoque insuficiente para {produto.nome}. Disponível: {produto.quantidade_estoque}'
                     }, status=400)
                 
+                # Produtos com estoque controlado na loja também são conferidos nela
+                estoque_loja = estoques_loja.get(produto.id)
+                if estoque_loja is not None and estoque_loja.quantidade < quantidade:
+                    return JsonResponse({
+                        'erro': True,
+                        'mensagem': f'Estoque insuficiente para {produto.nome} em {loja.nome}. Disponível: {estoque_loja.quantidade}'
+                    }, status=400)
+                
                 subtotal = quantidade * produto.preco
                 total_calculado += subtotal
                 
@@ -300,42 +671,68 @@ def finalizar_venda(request):
                     'mensagem': 'Dados inválidos na venda'
                 }, status=400)
         
-        # Criar a venda
-        venda = Venda.objects.create(
-            data_venda=timezone.now(),
-            total=total_calculado,
-            finalizada=True
-        )
-        
-        # Criar os itens da venda e atualizar estoque
-        for item_data in itens_validados:
-            # Criar item da venda
-            ItemVenda.objects.create(
-                venda=venda,
-                produto=item_data['produto'],
-                quantidade=item_data['quantidade'],
-                preco_unitario=item_data['preco_unitario'],
-                subtotal=item_data['subtotal']
+        # Venda, itens, estoque e turno de caixa são gravados juntos
+        with transaction.atomic():
+            # Criar a venda
+            venda = Venda.objects.create(
+                loja=loja,
+                sessao=sessao,
+                data_venda=timezone.now(),
+                total=total_calculado,
+                finalizada=True
             )
             
-            # Atualizar estoque
-            produto = item_data['produto']
-            produto.quantidade_estoque -= item_data['quantidade']
-            produto.quantidade_vendidos += item_data['quantidade']
-            produto.save()
+            # Criar os itens da venda e atualizar estoque
+            for item_data in itens_validados:
+                # Criar item da venda
+                ItemVenda.objects.create(
+                    venda=venda,
+                    produto=item_data['produto'],
+                    quantidade=item_data['quantidade'],
+                    preco_unitario=item_data['preco_unitario'],
+                    subtotal=item_data['subtotal']
+                )
+            
+                # Atualizar estoque
+                produto = item_data['produto']
+                produto.quantidade_estoque -= item_data['quantidade']
+                produto.quantidade_vendidos += item_data['quantidade']
+                produto.save()
+            
+                if produto.id in estoques_loja:
+                    EstoqueLoja.objects.filter(id=estoques_loja[produto.id].id).update(
+                        quantidade=F('quantidade') - item_data['quantidade']
+                    )
+            
+            total_itens = sum(item['quantidade'] for item in itens_validados)
+            VendasPorHora.registrar(venda, total_itens)
+            if sessao is not None:
+                sessao.registrar_venda(venda.total, total_itens)
+            # Painéis abertos recebem os novos totais assim que a venda é gravada
+            transaction.on_commit(lambda: ao_vivo.publicar_venda(venda.loja_id))
         
-        # Processar relatório do dia
+        # Processar relatório do dia (consolidado e, se houver, da loja)
         try:
-            GeradorRelatorios.processar_vendas_do_dia(venda.data_venda.date())
+            data_local = timezone.localdate(venda.data_venda)
+            GeradorRelatorios.processar_vendas_do_dia(data_local)
+            if loja is not None:
+                GeradorRelatorios.processar_vendas_do_dia(data_local, loja)
         except Exception as e:
             # Não falhar a venda se der erro no relatório
             print(f"Erro ao processar relatório: {e}")
         
+        # Cupom montado com os itens já em memória (sem reler a venda)
+        cupom = cupons.texto(venda, [
+            (item['quantidade'], item['produto'].nome, item['subtotal']) for item in itens_validados
+        ])
+        
         return JsonResponse({
             'sucesso': True,
             'venda_id': venda.id,
             'total': float(venda.total),
             'data_venda': venda.data_venda.strftime('%d/%m/%Y %H:%M'),
+            'cupom': cupom,
+            'cupom_pdf': reverse('cupom_venda', args=[venda.id]) + '?formato=pdf',
             'mensagem': f'Venda finalizada com sucesso! Total: R$ {venda.total:.2f}'
         })
         
@@ -348,4 +745,187 @@ def finalizar_venda(request):
         return JsonResponse({
             'erro': True,
             'mensagem': f'Erro interno: {str(e)}'
-        }, status=500)
\ No newline at end of file
+        }, status=500)
+
+@staff_member_required
+@csrf_exempt
+@require_http_methods(["POST"])
+def cancelar_venda(request, venda_id):
+    """Cancela a venda inteira (JSON opcional: motivo)"""
+    venda = get_object_or_404(Venda, id=venda_id)
+    try:
+        dados = json.loads(request.body or '{}')
+        resultado = estornar_venda(venda.id, motivo=dados.get('motivo', ''))
+    except json.JSONDecodeError:
+        return JsonResponse({'erro': True, 'mensagem': 'Dados JSON inválidos'}, status=400)
+    except ValueError as e:
+        return JsonResponse({'erro': True, 'mensagem': str(e)}, status=400)
+    
+    return JsonResponse({
+        'sucesso': True,
+        **resultado,
+        'valor_devolvido': float(resultado['valor_devolvido']),
+        'mensagem': f'Venda {venda.id} cancelada. Estornado: R$ {resultado["valor_devolvido"]:.2f}'
+    })
+
+@staff_member_required
+@csrf_exempt
+@require_http_methods(["POST"])
+def devolver_itens(request, venda_id):
+    """Devolução parcial (JSON: itens [{item_id, quantidade}] e motivo opcional)"""
+    venda = get_object_or_404(Venda, id=venda_id)
+    try:
+        dados = json.loads(request.body)
+        quantidades = {}
+        for item in dados.get('itens', []):
+            item_id = int(item['item_id'])
+            quantidades[item_id] = quantidades.get(item_id, 0) + int(item['quantidade'])
+        resultado = estornar_itens(venda.id, quantidades, motivo=dados.get('motivo', ''))
+    except json.JSONDecodeError:
+        return JsonResponse({'erro': True, 'mensagem': 'Dados JSON inválidos'}, status=400)
+    except (ValueError, KeyError, TypeError) as e:
+        mensagem = str(e) if isinstance(e, ValueError) else 'Dados inválidos na devolução'
+        return JsonResponse({'erro': True, 'mensagem': mensagem}, status=400)
+    
+    return JsonResponse({
+        'sucesso': True,
+        **resultado,
+        'valor_devolvido': float(resultado['valor_devolvido']),
+        'mensagem': f'Devolução registrada. Estornado: R$ {resultado["valor_devolvido"]:.2f}'
+    })
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@_exige_login
+def abrir_caixa(request):
+    """Abre um turno de caixa (JSON: operador, caixa, loja_id, valor_abertura)
+
+    Sem operador, o turno fica no nome do usuário logado.
+    """
+    try:
+        dados = json.loads(request.body)
+        operador = str(dados.get('operador') or request.user.get_username()).strip()
+        if not operador:
+            return JsonResponse({'erro': True, 'mensagem': 'Informe o operador'}, status=400)
+        
+        loja = Loja.objects.get(id=dados['loja_id']) if dados.get('loja_id') else None
+        caixa = str(dados.get('caixa') or '1').strip()
+        
+        # O SQLite não confere max_length
+        for campo, valor in (('operador', operador), ('caixa', caixa)):
+            if len(valor) > SessaoCaixa._meta.get_field(campo).max_length:
+                return JsonResponse({'erro': True, 'mensagem': f'{campo.capitalize()} muito longo'}, status=400)
+        
+        valor_abertura = SessaoCaixa._meta.get_field('valor_abertura').to_python(dados.get('valor_abertura') or 0)
+        if valor_abertura < 0:
+            return JsonResponse({'erro': True, 'mensagem': 'O valor de abertura não pode ser negativo'}, status=400)
+        
+        if SessaoCaixa.objects.filter(loja=loja, caixa=caixa, fechada_em__isnull=True).exists():
+            return JsonResponse({'erro': True, 'mensagem': f'O caixa {caixa} já está aberto'}, status=400)
+        
+        sessao = SessaoCaixa.objects.create(
+            loja=loja,
+            caixa=caixa,
+            operador=operador,
+            valor_abertura=valor_abertura
+        )
+        
+        return JsonResponse({'sucesso': True, 'sessao_id': sessao.id, 'mensagem': f'Caixa {caixa} aberto'})
+        
+    except (json.JSONDecodeError, Loja.DoesNotExist, ValueError, ValidationError):
+        return JsonResponse({'erro': True, 'mensagem': 'Dados inválidos'}, status=400)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@_exige_login
+def fechar_caixa(request, sessao_id):
+    """Fecha o turno (JSON opcional: valor_contado) e devolve o fechamento conferido
+
+    Só o operador do turno (pelo nome de usuário) ou alguém da equipe fecha.
+    """
+    sessao = get_object_or_404(SessaoCaixa, id=sessao_id)
+    if not request.user.is_staff and sessao.operador != request.user.get_username():
+        return JsonResponse({'erro': True, 'mensagem': 'Este turno é de outro operador'}, status=403)
+    if not sessao.aberta:
+        return JsonResponse({'erro': True, 'mensagem': 'Este caixa já foi fechado'}, status=400)
+    
+    try:
+        dados = json.loads(request.body or '{}')
+        valor_contado = sessao._meta.get_field('valor_contado').to_python(dados.get('valor_contado'))
+        if valor_contado is not None and valor_contado < 0:
+            return JsonResponse({'erro': True, 'mensagem': 'O valor contado não pode ser negativo'}, status=400)
+        sessao.fechar(valor_contado)
+    except (json.JSONDecodeError, ValidationError):
+        return JsonResponse({'erro': True, 'mensagem': 'Dados inválidos'}, status=400)
+    
+    return JsonResponse({
+        'sucesso': True,
+        'fechamento': sessao.fechamento(),
+        'conferencia': sessao.reconciliar()
+    })
+
+@require_http_methods(["GET"])
+def fechamento_caixa(request, sessao_id):
+    """Fechamento do turno (leitura dos contadores); ?conferir=1 reconcilia com as vendas"""
+    sessao = get_object_or_404(SessaoCaixa.objects.select_related('loja'), id=sessao_id)
+    dados = {'sucesso': True, 'fechamento': sessao.fechamento()}
+    if request.GET.get('conferir'):
+        dados['conferencia'] = sessao.reconciliar()
+    return JsonResponse(dados)
+
+@require_http_methods(["GET"])
+def pdf_fechamento_caixa(request, sessao_id):
+    """Download do fechamento de caixa em PDF"""
+    sessao = get_object_or_404(SessaoCaixa.objects.select_related('loja'), id=sessao_id)
+    buffer = GeradorRelatorios.pdf_fechamento_caixa(sessao)
+    
+    response = HttpResponse(buffer, content_type='application/pdf')
+    filename = f'fechamento_caixa_{sessao.caixa}_{timezone.localtime(sessao.aberta_em).strftime("%d_%m_%Y_%H%M")}.pdf'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+def _resposta_cupons(textos, formato, nome):
+  if formato == 'pdf':
+      response = HttpResponse(cupons.em_pdf(textos), content_type='application/pdf')
+      response['Content-Disposition'] = f'inline; filename="{nome}.pdf"'
+      return response
+  # Texto puro para a impressora térmica; cupons separados por linhas em branco
+  return HttpResponse('\n\n\n'.join(textos) + '\n', content_type='text/plain; charset=utf-8')
+
+@require_http_methods(["GET"])
+def cupom_venda(request, venda_id):
+  """Cupom (2ª via) de uma venda: ?formato=texto (padrão) ou pdf e ?largura= colunas"""
+  venda = get_object_or_404(Venda.objects.select_related('loja').filter(Q(finalizada=True) | Q(cancelada=True)), id=venda_id)
+  try:
+      largura = int(request.GET.get('largura', cupons.LARGURA))
+      if not (24 <= largura <= 80):
+          raise ValueError
+  except ValueError:
+      return JsonResponse({'erro': 'Largura inválida'}, status=400)
+  
+  return _resposta_cupons([cupons.da_venda(venda, largura)], request.GET.get('formato'), f'cupom_{venda.id}')
+
+@require_http_methods(["GET"])
+def reimprimir_cupons(request):
+  """Reimpressão em lote dos cupons de um período
+
+  Parâmetros: inicio e fim (AAAA-MM-DD, padrão: hoje; no máximo
+  MAXIMO_DIAS_REIMPRESSAO dias), formato (texto ou pdf), largura e loja.
+  """
+  try:
+      hoje = timezone.localdate()
+      inicio = request.GET.get('inicio')
+      fim = request.GET.get('fim')
+      data_inicio = date.fromisoformat(inicio) if inicio else hoje
+      data_fim = date.fromisoformat(fim) if fim else data_inicio
+      largura = int(request.GET.get('largura', cupons.LARGURA))
+      if data_inicio > data_fim or (data_fim - data_inicio).days >= MAXIMO_DIAS_REIMPRESSAO or not (24 <= largura <= 80):
+          return JsonResponse({'erro': 'Parâmetros inválidos'}, status=400)
+      
+      textos = cupons.do_intervalo(data_inicio, data_fim, _loja_da_requisicao(request), largura)
+  except (ValueError, TypeError):
+      return JsonResponse({'erro': 'Parâmetros inválidos'}, status=400)
+  
+  if not textos:
+      return JsonResponse({'erro': 'Sem vendas no período'}, status=404)
+  return _resposta_cupons(textos, request.GET.get('formato'), f'cupons_{data_inicio:%d_%m_%Y}_{data_fim:%d_%m_%Y}')